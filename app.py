@@ -1,267 +1,458 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Response
+from fastapi import FastAPI, Depends, HTTPException, status, Response, BackgroundTasks
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from typing import List, Optional, Union, Dict, Any, Tuple
+from typing import List, Optional, Union, Dict, Any, Tuple, Set
 import os
+import asyncio
 from dotenv import load_dotenv
 from bson import ObjectId
-import requests
 import numpy as np
 import time
 import re
 
 from utils.models import *
+from utils.embeddings import EmbeddingClient
+from utils.embedding_cache import EmbeddingCache
+from utils.embedding_queue import EmbeddingQueue, TEXT_BUILDERS
+from utils.scoring import select_top_k, reciprocal_rank_fusion
+from utils.vector_index import VectorIndexes
+from utils.lexical_index import BM25Index
+from utils.ann_index import AnnIndexes
+from utils.vector_search import create_backend, search_score, LocalVectorSearch, VECTOR_SEARCH_BACKEND
+from pymongo.errors import OperationFailure
+from utils.skills import SkillVocabulary, split_skills, skill_overlap, required_skill_names, required_skill_ids, candidate_skill_ids
+from utils.streaming import validate_stream, respond
+from utils.reranker import rerank_scores, RERANK_RECALL_SIZE
+from utils.recommendation_store import save_recommendations, delete_recommendations_for, RECOMMENDATION_STORE_THRESHOLD
+from utils.materialized_recommendations import MaterializedRecommendations, MATERIALIZED_KINDS, MATERIALIZED_TOP_K
+from utils.searchable_text import build_job_text, build_project_text, build_candidate_text
+from utils.repository import Repository, LIST_VIEW, SUMMARY_VIEW, DETAIL_VIEW, AUTH_VIEW, CREDENTIALS_VIEW, INDEX_VIEW
 from utils.database import Database, USERS_COLLECTION, JOBS_COLLECTION, RECOMMENDATIONS_COLLECTION, CANDIDATES_COLLECTION, EMPLOYERS_COLLECTION, PROJECTS_COLLECTION, JOB_APPLICATIONS_COLLECTION, SAVED_JOBS_COLLECTION, init_db
 
 load_dotenv()
 
-# Groq API configuration
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_EMBEDDING_MODEL = os.getenv("GROQ_EMBEDDING_MODEL", "llama3-embed-8b")
-GROQ_API_BASE = os.getenv("GROQ_API_BASE", "https://api.groq.com/v1")
-
-# Function to get embeddings from Groq
-def get_embedding(text: str) -> List[float]:
-    """Get embedding from Groq API"""
-    try:
-        if not GROQ_API_KEY:
-            raise ValueError("GROQ_API_KEY environment variable is not set")
-        
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.post(
-            f"{GROQ_API_BASE}/embeddings",
-            headers=headers,
-            json={
-                "model": GROQ_EMBEDDING_MODEL,
-                "input": text
-            }
+# Function to get embeddings from the configured provider
+async def get_embedding(text: str) -> List[float]:
+    """Get embedding from the configured provider without blocking the event loop.
+
+    Concurrent calls are coalesced into a single list-input request.
+    """
+    return await EmbeddingClient.embed(text)
+
+async def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Get embeddings for several texts with as few provider requests as possible"""
+    return await EmbeddingClient.embed_many(texts)
+
+def build_match_explanation(job_info: Dict, candidate_info: Dict, score: float) -> str:
+    """Explain a vector match score in terms of matching and missing skills"""
+    matched_skills, missing_skills = split_skills(required_skill_names(job_info), candidate_info.get("skills"))
+    
+    explanation = f"Match score: {score:.1f}. "
+    if matched_skills:
+        explanation += f"Matching skills: {', '.join(matched_skills)}. "
+    if missing_skills:
+        explanation += f"Missing skills: {', '.join(missing_skills)}. "
+    
+    return explanation
+
+def project_as_job(project: Dict) -> Dict:
+    """Convert project format to job-like format for the recommender.
+    
+    The stored embedding is carried over so matching a project never has
+    to embed its text again.
+    """
+    return {
+        "id": project.get("id"),
+        "title": project.get("title", ""),
+        "required_skills": project.get("skills_required", []),  # Map project skills to required_skills
+        "skill_ids": project.get("skill_ids"),
+        "description": project.get("description", ""),
+        "location": project.get("location"),
+        "project_type": project.get("project_type"),
+        "embedding": project.get("embedding"),
+    }
+
+def explain_match(job_info: Dict, candidate_info: Dict, score: float, method: str) -> str:
+    """Explain one ranked match, by skills for vector matches or by keywords for fallback ones"""
+    if method == "keyword":
+        return calculate_fallback_score(job_info, candidate_info)[1]
+    return build_match_explanation(job_info, candidate_info, score)
+
+def keyword_scores(query_info: Dict, docs: List[Dict], query_is_job: bool, overlap: np.ndarray, doc_skill_counts: np.ndarray) -> np.ndarray:
+    """Keyword fallback scores of many documents at once.
+    
+    Same formula as ``calculate_fallback_score``, but the matching skills
+    of every document come from the vector index's skill posting lists
+    instead of one set intersection per document.
+    """
+    if query_is_job:
+        required = np.full(len(docs), len(required_skill_ids(query_info)))
+    else:
+        required = doc_skill_counts
+    skill_match = np.where(required > 0, overlap / np.maximum(required, 1) * 100.0, 50.0)
+    location = query_info.get("location")
+    location_match = np.array([10.0 if doc.get("location") == location else 0.0 for doc in docs])
+    return np.minimum(100.0, skill_match + location_match)
+
+def rank_matches(query_vector, query_info: Dict, collection_name: str, query_is_job: bool,
+                 limit: Optional[int] = None, offset: int = 0, min_score: Optional[float] = None,
+                 min_skill_overlap: Optional[int] = None) -> List[Dict]:
+    """Rank the indexed documents of a collection against one job, project or candidate.
+    
+    Ranking is a cascade: one matrix-vector product recalls the best
+    ``RERANK_RECALL_SIZE`` documents by cosine (or keyword) score, and only
+    those are re-ranked on skill overlap, location, recency and job
+    preferences with ``rerank_scores``. Returns ``{"id", "score", "method"}``
+    items, best first, where method is "vector" or "keyword" depending on
+    how the recall score was obtained. With ``min_skill_overlap``, documents
+    sharing fewer skills with the query are filtered out through the skill
+    index before anything is scored.
+    """
+    index = VectorIndexes.get(collection_name)
+    query_skills = required_skill_ids(query_info) if query_is_job else candidate_skill_ids(query_info)
+    mask = overlap = None
+    if min_skill_overlap:
+        overlap = index.overlap_counts(query_skills)
+        mask = overlap >= min_skill_overlap
+        overlap = overlap[mask]
+    docs, scores = index.search(query_vector, mask)
+    
+    keyword = np.isnan(scores)
+    fallback_rows = np.flatnonzero(keyword)
+    if len(fallback_rows):
+        if overlap is None:
+            overlap = index.overlap_counts(query_skills)
+        fallback_docs = [docs[row] for row in fallback_rows]
+        if collection_name == PROJECTS_COLLECTION:
+            fallback_docs = [project_as_job(doc) for doc in fallback_docs]
+        scores[fallback_rows] = keyword_scores(
+            query_info, fallback_docs, query_is_job,
+            overlap[fallback_rows], index.document_skill_counts(mask)[fallback_rows]
         )
-        
-        response.raise_for_status()  # Raise exception for HTTP errors
-        data = response.json()
-        
-        # Extract embedding from the response
-        if "data" in data and len(data["data"]) > 0 and "embedding" in data["data"][0]:
-            return data["data"][0]["embedding"]
-        else:
-            print("Unexpected response format from Groq API")
-            return []
-    except Exception as e:
-        print(f"Error getting embedding from Groq: {e}")
-        # Return empty embedding in case of error
-        return []
-
-def create_job_embedding(job_data: Dict[str, Any]) -> List[float]:
-    """Create a searchable text from job data and get its embedding"""
-    searchable_text = f"{job_data.get('title', '')} {job_data.get('company', '')} {job_data.get('description', '')} {' '.join(job_data.get('requirements', []))} {job_data.get('location', '')}"
-    return get_embedding(searchable_text)
-
-def create_project_embedding(project_data: Dict[str, Any]) -> List[float]:
-    """Create a searchable text from project data and get its embedding"""
-    searchable_text = f"{project_data.get('title', '')} {project_data.get('company', '')} {project_data.get('description', '')} {' '.join(project_data.get('requirements', []))} {' '.join(project_data.get('skills_required', []))} {project_data.get('project_type', '')} {project_data.get('location', '')}"
-    return get_embedding(searchable_text)
-
-def create_candidate_embedding(candidate_data: Dict[str, Any]) -> List[float]:
-    """Create a searchable text from candidate data and get its embedding"""
-    # Combine relevant candidate fields into a searchable text
-    skills_text = ' '.join(candidate_data.get('skills', []))
-    searchable_text = f"{candidate_data.get('full_name', '')} {skills_text} {candidate_data.get('experience', '')} {candidate_data.get('education', '')} {candidate_data.get('location', '')} {candidate_data.get('bio', '')}"
-    return get_embedding(searchable_text)
-
-# MongoDB Vector Search Recommender Functions
-async def get_match_score(job_info: Dict, candidate_info: Dict) -> Tuple[float, str]:
-    """Calculate match score between a job and candidate using MongoDB vector search"""
-    try:
-        # Create vectors for comparison
-        job_text = f"{job_info.get('title', '')} {job_info.get('company', '')} {job_info.get('description', '')} {' '.join(job_info.get('requirements', []))}"
-        candidate_text = f"{candidate_info.get('full_name', '')} {' '.join(candidate_info.get('skills', []))} {candidate_info.get('experience', '')} {candidate_info.get('education', '')}"
-        
-        # Get embeddings
-        job_embedding = job_info.get('embedding') or get_embedding(job_text)
-        candidate_embedding = candidate_info.get('embedding') or get_embedding(candidate_text)
-        
-        if not job_embedding or not candidate_embedding:
-            return calculate_fallback_score(job_info, candidate_info)
-        
-        # Calculate cosine similarity manually since we're directly comparing two vectors
-        # In a full implementation with many candidates/jobs, we'd use MongoDB's $vectorSearch
-        score = cosine_similarity(job_embedding, candidate_embedding) * 100
-        
-        # Generate explanation
-        required_skills = set(job_info.get("requirements", []))
-        if not required_skills:
-            required_skills = set(job_info.get("skills_required", []))
-            
-        candidate_skills = set(candidate_info.get("skills", []))
-        matched_skills = required_skills.intersection(candidate_skills)
-        
-        explanation = f"Match score: {score:.1f}. "
-        if matched_skills:
-            explanation += f"Matching skills: {', '.join(matched_skills)}. "
-        if required_skills - matched_skills:
-            explanation += f"Missing skills: {', '.join(required_skills - matched_skills)}. "
-        
-        return score, explanation
-    except Exception as e:
-        print(f"Error in get_match_score: {str(e)}")
-        return calculate_fallback_score(job_info, candidate_info)
-
-def cosine_similarity(vec1, vec2):
-    """Calculate cosine similarity between two vectors"""
-    if not vec1 or not vec2:
-        return 0.0
     
+    # Recall stage; a page deeper than the recall size widens it
+    recall = RERANK_RECALL_SIZE if limit is None else max(RERANK_RECALL_SIZE, offset + limit)
+    survivors = select_top_k(scores, recall)
+    if overlap is None:
+        overlap = index.overlap_counts(query_skills, mask)
+    recalled = [docs[row] for row in survivors]
+    jobs, candidates = ([query_info] * len(recalled), recalled) if query_is_job else (recalled, [query_info] * len(recalled))
+    final = rerank_scores(jobs, candidates, scores[survivors], ranked_is_job=not query_is_job, overlap=overlap[survivors])
+    
+    rows = select_top_k(final, limit, offset, min_score)
+    return [
+        {
+            "id": recalled[row]["id"],
+            "score": float(final[row]),
+            "method": "keyword" if keyword[survivors[row]] else "vector",
+        }
+        for row in rows
+    ]
+
+# Recommendation invalidation
+# Besides the rankings that already contain a changed document, this many of
+# its nearest neighbours are checked for whether it now enters their top-k
+RANKING_REFRESH_NEIGHBORS = int(os.getenv("RANKING_REFRESH_NEIGHBORS", "200"))
+
+# Field naming each collection's documents in stored recommendations
+RECOMMENDATION_ID_FIELDS = {
+    JOBS_COLLECTION: "job_id",
+    PROJECTS_COLLECTION: "project_id",
+    CANDIDATES_COLLECTION: "candidate_id",
+}
+
+ranking_refresh_tasks: Set[asyncio.Task] = set()
+
+def schedule_ranking_refresh(collection_name: str, doc_id: str):
+    """Refresh the stored rankings affected by a document change in the background"""
+    task = asyncio.create_task(refresh_rankings(collection_name, doc_id))
+    ranking_refresh_tasks.add(task)
+    task.add_done_callback(ranking_refresh_tasks.discard)
+
+async def refresh_rankings(collection_name: str, doc_id: str):
+    """Bring the materialized rankings up to date after one document changed.
+    
+    Work is proportional to the change: the document's own rankings are
+    rescored, and the document is re-ranked only inside rankings that
+    contain it (found through the reverse index) or that it is now close
+    enough to enter. Documents that can no longer be recommended are
+    removed from every ranking and from the stored recommendations.
+    """
     try:
-        vec1 = np.array(vec1)
-        vec2 = np.array(vec2)
-        
-        dot_product = np.dot(vec1, vec2)
-        norm_vec1 = np.linalg.norm(vec1)
-        norm_vec2 = np.linalg.norm(vec2)
-        
-        if norm_vec1 == 0 or norm_vec2 == 0:
-            return 0.0
+        index = VectorIndexes.get(collection_name)
+        doc = index.get(doc_id)
+        
+        if doc is None:
+            await MaterializedRecommendations.remove_entity(doc_id)
+            for kind, (_, ranked_collection) in MATERIALIZED_KINDS.items():
+                if ranked_collection == collection_name:
+                    await MaterializedRecommendations.remove_item(kind, doc_id)
+            await delete_recommendations_for(RECOMMENDATION_ID_FIELDS[collection_name], doc_id)
+            return
+        
+        vector = index.vector(doc_id)
+        if vector is None:
+            # Nothing to rank with until the embedding queue delivers a vector
+            return
+        
+        query_is_job = collection_name != CANDIDATES_COLLECTION
+        query_info = project_as_job(doc) if collection_name == PROJECTS_COLLECTION else doc
+        
+        # The document's own rankings, if any have been materialized
+        for kind in await MaterializedRecommendations.ranked_kinds(doc_id):
+            if kind not in MATERIALIZED_KINDS:
+                continue
+            items = rank_matches(vector, query_info, MATERIALIZED_KINDS[kind][1], query_is_job, MATERIALIZED_TOP_K)
+            await MaterializedRecommendations.store(kind, doc_id, items)
+        
+        # Its place in the rankings of others
+        for kind, (entity_collection, ranked_collection) in MATERIALIZED_KINDS.items():
+            if ranked_collection != collection_name:
+                continue
+            entities, scores = VectorIndexes.get(entity_collection).search(vector)
+            rows = {entity["id"]: row for row, entity in enumerate(entities)}
+            affected = set(await MaterializedRecommendations.entities_containing(kind, doc_id))
+            affected.update(entities[row]["id"] for row in select_top_k(scores, RANKING_REFRESH_NEIGHBORS))
             
-        return dot_product / (norm_vec1 * norm_vec2)
+            scored = []
+            for entity_id in affected:
+                row = rows.get(entity_id)
+                if row is not None and not np.isnan(scores[row]):
+                    scored.append(row)
+                else:
+                    # The entity itself is gone or lost its vector, so its ranking is stale too
+                    await MaterializedRecommendations.remove_entity(entity_id)
+            # Score the document the way rank_matches does from each entity's side
+            queries = [project_as_job(entities[row]) if entity_collection == PROJECTS_COLLECTION else entities[row] for row in scored]
+            jobs, candidates = (queries, [doc] * len(scored)) if collection_name == CANDIDATES_COLLECTION else ([doc] * len(scored), queries)
+            final = rerank_scores(jobs, candidates, scores[scored], ranked_is_job=collection_name != CANDIDATES_COLLECTION)
+            new_scores = {entities[row]["id"]: float(score) for row, score in zip(scored, final)}
+            await MaterializedRecommendations.rerank_item(kind, doc_id, new_scores)
     except Exception as e:
-        print(f"Error in cosine similarity calculation: {str(e)}")
-        return 0.0
+        print(f"Error refreshing rankings for {collection_name}/{doc_id}: {str(e)}")
 
-def calculate_fallback_score(job_info: Dict, candidate_info: Dict) -> Tuple[float, str]:
-    """Simple keyword matching algorithm as a fallback"""
-    job_requirements = set(job_info.get("requirements", []))
-    if not job_requirements and "required_skills" in job_info:
-        job_requirements = set(job_info.get("required_skills", []))
-        
-    candidate_skills = set(candidate_info.get("skills", []))
+def keyword_match(job_info: Dict, candidate_info: Dict) -> Tuple[float, int, int]:
+    """Simple keyword matching algorithm as a fallback: (score, matched skills, required skills)"""
+    matched_skills, required_skills = skill_overlap(job_info, candidate_info)
     
     # Calculate skill match percentage
-    if not job_requirements:
+    if not required_skills:
         skill_match = 50.0  # Default if no requirements specified
     else:
-        matched_skills = job_requirements.intersection(candidate_skills)
-        skill_match = (len(matched_skills) / max(1, len(job_requirements))) * 100
+        skill_match = (matched_skills / max(1, required_skills)) * 100
     
     # Add location match bonus
     location_match = 0
     if job_info.get("location") == candidate_info.get("location"):
         location_match = 10
     
-    # Create explanation
-    explanation = f"Keyword match: Found {len(job_requirements.intersection(candidate_skills))} matching skills out of {len(job_requirements)} required skills."
-    
     # Simple score calculation (primarily based on matching skills)
     score = min(100, skill_match + location_match)
     
-    return score, explanation
+    return score, matched_skills, required_skills
 
-async def get_job_candidate_matches(job_info: Dict, candidates: List[Dict]) -> List[Dict]:
-    """Match a job to multiple candidates using vector similarity"""
-    try:
-        matches = []
-        for candidate in candidates:
-            try:
-                candidate_id = candidate.get("id") if "id" in candidate else str(candidate.get("_id", "unknown"))
-                score, explanation = await get_match_score(job_info, candidate)
-                matches.append({
-                    "candidate_id": candidate_id,
-                    "match_score": score,
-                    "explanation": explanation
-                })
-            except Exception as e:
-                print(f"Error matching candidate {candidate.get('id', 'unknown')}: {str(e)}")
-                matches.append({
-                    "candidate_id": candidate.get("id", "unknown"),
-                    "match_score": 0.0,
-                    "explanation": f"Error occurred during matching: {str(e)}"
-                })
-        return sorted(matches, key=lambda x: x["match_score"], reverse=True)
-    except Exception as e:
-        print(f"Unexpected error in get_job_candidate_matches: {str(e)}")
-        return []
+def calculate_fallback_score(job_info: Dict, candidate_info: Dict) -> Tuple[float, str]:
+    """Keyword match score with its explanation"""
+    score, matched_skills, required_skills = keyword_match(job_info, candidate_info)
+    explanation = f"Keyword match: Found {matched_skills} matching skills out of {required_skills} required skills."
+    return score, explanation
 
-async def get_candidate_job_matches(candidate_info: Dict, jobs: List[Dict]) -> List[Dict]:
-    """Match a candidate to multiple jobs using vector similarity"""
+async def search_vector_collection(collection_name, query_vector, top_k=5, filter_query=None, query_text=None):
+    """Generic vector search function, run by the backend selected with VECTOR_SEARCH_BACKEND.
+    
+    When Atlas cannot answer, the local backend searches the collection's
+    embeddings in-process instead; only if that fails too is the search
+    answered lexically.
+    """
     try:
-        matches = []
-        for job in jobs:
-            try:
-                job_id = job.get("id") if "id" in job else str(job.get("_id", "unknown"))
-                score, explanation = await get_match_score(job, candidate_info)
-                matches.append({
-                    "job_id": job_id,
-                    "match_score": score,
-                    "explanation": explanation
-                })
-            except Exception as e:
-                print(f"Error matching job {job.get('id', 'unknown')}: {str(e)}")
-                matches.append({
-                    "job_id": job.get("id", "unknown"),
-                    "match_score": 0.0,
-                    "explanation": f"Error occurred during matching: {str(e)}"
-                })
-        return sorted(matches, key=lambda x: x["match_score"], reverse=True)
+        return await vector_search.search(collection_name, query_vector, top_k, filter_query)
+    except OperationFailure as e:
+        # Usually a missing or outdated index; see utils/create_vector_indexes.py
+        print(f"Atlas vector search failed on {collection_name} (code {e.code}): {str(e)}")
     except Exception as e:
-        print(f"Unexpected error in get_candidate_job_matches: {str(e)}")
-        return []
-
-async def search_vector_collection(collection_name, query_vector, top_k=5, filter_query=None):
-    """Generic vector search function using MongoDB Atlas Search"""
-    try:
-        pipeline = [
-            {
-                "$search": {
-                    "index": f"{collection_name}_vector_index",
-                    "vectorSearch": {
-                        "queryVector": query_vector,
-                        "path": "embedding",
-                        "numCandidates": 100,
-                        "limit": top_k
-                    }
-                }
-            }
-        ]
-        
-        # Add any additional filtering
-        if filter_query:
-            pipeline.append({"$match": filter_query})
-            
-        # Exclude the embedding vector from results to reduce data size
-        pipeline.append({
-            "$project": {
-                "_id": 0,
-                "embedding": 0
-            }
-        })
-        
-        results = await Database.get_collection(collection_name).aggregate(pipeline).to_list(length=top_k)
-        return results
-    except Exception as e:
-        print(f"Vector search error: {str(e)}")
-        # Fall back to text-based search if vector search fails
-        return await fallback_text_search(collection_name, query_vector, top_k, filter_query)
+        print(f"Vector search error on {collection_name} ({vector_search.name}): {str(e)}")
+    
+    if vector_search.name != LocalVectorSearch.name:
+        try:
+            return await local_vector_search.search(collection_name, query_vector, top_k, filter_query)
+        except Exception as e:
+            print(f"Local vector search error on {collection_name}: {str(e)}")
+    
+    # Fall back to text-based search if vector search fails
+    print(f"Answering the {collection_name} search lexically")
+    return await fallback_text_search(collection_name, query_text, top_k, filter_query)
 
-async def fallback_text_search(collection_name, query_vector, top_k=5, filter_query=None):
+async def fallback_text_search(collection_name, query_text, top_k=5, filter_query=None):
     """Fallback text search when vector search fails"""
-    # This is a simplified version, in production you'd implement more sophisticated text search
+    if query_text:
+        return await lexical_search(collection_name, query_text, top_k, filter_query)
+    
+    # Without a query (or an index) there is nothing to rank by
     base_query = filter_query or {}
     base_query["is_active"] = True
     
-    results = await Database.get_collection(collection_name).find(base_query).limit(top_k).to_list(length=top_k)
+    return await Repository.find(collection_name, base_query, LIST_VIEW, limit=top_k)
+
+def index_covers(collection_name, filter_query) -> bool:
+    """Whether the resident index holds every document the filter allows"""
+    index = VectorIndexes.indexes.get(collection_name)
+    return index is not None and LocalVectorSearch.covers(index.query, filter_query)
+
+async def stored_lexical_search(collection_name, query_text, top_k=5, filter_query=None) -> List[Dict]:
+    """Lexical search of the documents matching a filter the resident index does not cover.
     
-    # Remove _id and embedding fields
-    for result in results:
-        if "_id" in result:
-            result.pop("_id")
-        if "embedding" in result:
-            result.pop("embedding")
-            
+    Ranked by MongoDB's ``$text`` over the collection's text index, so
+    only the matching documents are read. Without a text index (or on a
+    MongoDB stand-in lacking ``$text``) every document the filter allows
+    is read and scored with a throwaway ``BM25Index`` instead.
+    """
+    try:
+        return await Repository.text_search(collection_name, query_text, filter_query or {}, LIST_VIEW, limit=top_k)
+    except Exception as e:
+        print(f"Text search error on {collection_name}, scanning it instead: {str(e)}")
+    docs = await Repository.find(collection_name, filter_query or {}, LIST_VIEW)
+    lexical = BM25Index(len(docs))
+    for row, doc in enumerate(docs):
+        lexical.add(row, TEXT_BUILDERS[collection_name](doc))
+    scores = lexical.scores(query_text, len(docs))
+    scores[scores == 0] = np.nan
+    return [docs[row] for row in select_top_k(scores, top_k)]
+
+async def lexical_search(collection_name, query_text, top_k=5, filter_query=None):
+    """BM25 search over the searchable text held by the in-memory index; never calls the embedding provider.
+    
+    Filters the index does not cover are answered from MongoDB instead.
+    """
+    if not index_covers(collection_name, filter_query):
+        return await stored_lexical_search(collection_name, query_text, top_k, filter_query)
+    index = VectorIndexes.get(collection_name)
+    docs, scores = index.lexical_search(query_text, index.filter_mask(filter_query))
+    return [dict(docs[row]) for row in select_top_k(scores, top_k)]
+
+async def hybrid_search(collection_name, query_text, top_k=5, filter_query=None, query_vector=None):
+    """Fuse BM25 and vector rankings of the in-memory index with reciprocal-rank fusion.
+    
+    If the query cannot be embedded within ``HYBRID_EMBEDDING_TIMEOUT_SECONDS``
+    the lexical ranking is returned on its own; the embedding keeps running
+    in the background so the next identical query finds it cached. Filters
+    the index does not cover fuse the top hits of ``stored_lexical_search``
+    with those of the configured vector search backend instead.
+    """
+    covered = index_covers(collection_name, filter_query)
+    depth = max(top_k, HYBRID_CANDIDATES)
+    if covered:
+        index = VectorIndexes.get(collection_name)
+        mask = index.filter_mask(filter_query)
+        docs, lexical_scores = index.lexical_search(query_text, mask)
+        rankings = [select_top_k(lexical_scores, depth)]
+    else:
+        docs = await stored_lexical_search(collection_name, query_text, depth, filter_query)
+        rankings = [np.arange(len(docs))]
+    
+    if query_vector is None:
+        try:
+            query_vector = await asyncio.wait_for(asyncio.shield(get_embedding(query_text)), HYBRID_EMBEDDING_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"Query embedding took longer than {HYBRID_EMBEDDING_TIMEOUT_SECONDS}s, answering {collection_name} search lexically")
+    if query_vector:
+        if covered:
+            _, vector_scores = index.search(query_vector, mask)
+            rankings.append(select_top_k(vector_scores, depth))
+        else:
+            rows = {doc.get("id"): row for row, doc in enumerate(docs)}
+            ranking = []
+            for doc in await search_vector_collection(collection_name, query_vector, depth, dict(filter_query or {}), query_text=query_text):
+                doc.pop("score", None)
+                if doc.get("id") not in rows:
+                    rows[doc.get("id")] = len(docs)
+                    docs.append(doc)
+                ranking.append(rows[doc.get("id")])
+            rankings.append(np.array(ranking, dtype=np.int64))
+    
+    return [dict(docs[row]) for row in reciprocal_rank_fusion(rankings, len(docs), top_k)]
+
+async def search_documents(collection_name, query_text, top_k, mode, filter_query):
+    """Run one of the search modes for the search endpoints"""
+    if mode == "lexical":
+        return await lexical_search(collection_name, query_text, top_k, filter_query)
+    if mode == "hybrid":
+        return await hybrid_search(collection_name, query_text, top_k, filter_query)
+    
+    query_vector = await get_embedding(query_text)
+    if not query_vector:
+        # The embedding provider is down; answer from the lexical index instead
+        return await lexical_search(collection_name, query_text, top_k, filter_query)
+    return await search_vector_collection(collection_name, query_vector, top_k, filter_query, query_text=query_text)
+
+def search_filter(search: SearchQuery) -> Dict[str, Any]:
+    """Filter of one batch search: its own equality filters, under the collection's visibility rules"""
+    return {**search.filters, **SEARCH_FILTERS[search.collection]}
+
+async def batch_search_documents(searches: List[SearchQuery], mode: str) -> List[List[Dict]]:
+    """Run several searches at once for the batch endpoint.
+    
+    All queries are embedded with one ``get_embeddings`` call. The queries
+    of each collection that its resident index can answer are then scored
+    together, as one matrix-matrix product, and every other query is run on
+    its own, concurrently. Vector queries are only grouped when the
+    configured backend is ``local``, whose exact search the matrix product
+    reproduces; otherwise they go through that backend like the
+    single-query endpoints. Hybrid search always ranks on the resident
+    index, so its queries are grouped whatever the backend.
+    """
+    filters = [search_filter(search) for search in searches]
+    results: List[Optional[List[Dict]]] = [None] * len(searches)
+    vectors = [[] for _ in searches]
+    if mode == "hybrid":
+        try:
+            vectors = await asyncio.wait_for(asyncio.shield(get_embeddings([search.query for search in searches])), HYBRID_EMBEDDING_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"Batch query embeddings took longer than {HYBRID_EMBEDDING_TIMEOUT_SECONDS}s, answering {len(searches)} searches lexically")
+    elif mode == "vector":
+        vectors = await get_embeddings([search.query for search in searches])
+    
+    groups: Dict[str, List[int]] = {}
+    groupable = mode == "hybrid" or vector_search.name == LocalVectorSearch.name
+    for i, search in enumerate(searches):
+        index = VectorIndexes.indexes.get(search.collection)
+        # Only where the index holds every document the filter allows
+        if groupable and vectors[i] and index is not None and LocalVectorSearch.covers(index.query, filters[i]):
+            groups.setdefault(search.collection, []).append(i)
+    
+    for collection_name, members in groups.items():
+        index = VectorIndexes.get(collection_name)
+        docs, scores = index.search_batch([vectors[i] for i in members])
+        masks = {}
+        for column, i in enumerate(members):
+            key = tuple(sorted(filters[i].items()))
+            if key not in masks:
+                masks[key] = index.filter_mask(filters[i])
+            mask = masks[key]
+            vector_scores = scores[:, column] if mask is None else np.where(mask, scores[:, column], np.nan)
+            top_k = searches[i].top_k
+            if mode == "hybrid":
+                _, lexical_scores = index.lexical_search(searches[i].query)
+                if mask is not None:
+                    lexical_scores = np.where(mask, lexical_scores, np.nan)
+                depth = max(top_k, HYBRID_CANDIDATES)
+                rankings = [select_top_k(lexical_scores, depth), select_top_k(vector_scores, depth)]
+                results[i] = [dict(docs[row]) for row in reciprocal_rank_fusion(rankings, len(docs), top_k)]
+            else:
+                results[i] = [dict(docs[row], score=search_score(float(vector_scores[row]) / 100.0)) for row in select_top_k(vector_scores, top_k)]
+    
+    async def run_alone(i: int) -> List[Dict]:
+        search = searches[i]
+        if mode == "lexical" or not vectors[i]:
+            return await lexical_search(search.collection, search.query, search.top_k, filters[i])
+        if mode == "hybrid":
+            return await hybrid_search(search.collection, search.query, search.top_k, filters[i], query_vector=vectors[i])
+        return await search_vector_collection(search.collection, vectors[i], search.top_k, filters[i], query_text=search.query)
+    
+    pending = [i for i, result in enumerate(results) if result is None]
+    for i, answer in zip(pending, await asyncio.gather(*(run_alone(i) for i in pending))):
+        results[i] = answer
     return results
 
 app = FastAPI(title="Job Recommender System")
@@ -271,6 +462,29 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Page size of the recommendation endpoints
+RECOMMENDATION_DEFAULT_LIMIT = int(os.getenv("RECOMMENDATION_DEFAULT_LIMIT", "50"))
+RECOMMENDATION_MAX_LIMIT = int(os.getenv("RECOMMENDATION_MAX_LIMIT", "500"))
+
+# Search endpoints: "vector" (VECTOR_SEARCH_BACKEND), "lexical" (BM25) or "hybrid" (both, rank-fused)
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+# What each collection's search endpoint may return, and how results are shaped
+SEARCH_FILTERS = {
+    JOBS_COLLECTION: {"is_active": True},
+    PROJECTS_COLLECTION: {"is_active": True},
+    CANDIDATES_COLLECTION: {"is_active": True, "profile_completed": True, "profile_visibility": "public"},
+}
+SEARCH_RESULT_MODELS = {JOBS_COLLECTION: Job, PROJECTS_COLLECTION: Project, CANDIDATES_COLLECTION: Candidate}
+# Most queries accepted by one batch search request
+BATCH_SEARCH_MAX_QUERIES = int(os.getenv("BATCH_SEARCH_MAX_QUERIES", "100"))
+# Results taken from each ranking before fusing them
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "100"))
+# Hybrid search stops waiting for the query embedding after this long and answers lexically
+HYBRID_EMBEDDING_TIMEOUT_SECONDS = float(os.getenv("HYBRID_EMBEDDING_TIMEOUT_SECONDS", "0.5"))
+# Vector search backend of the search endpoints, and the in-process one used when Atlas fails
+vector_search = create_backend(VECTOR_SEARCH_BACKEND)
+local_vector_search = LocalVectorSearch()
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -282,10 +496,25 @@ BLACKLISTED_TOKENS = set()
 async def startup_db_client():
     await Database.connect_db()
     await init_db()
+    await EmbeddingClient.start()
+    # Start embedding workers; this also backfills documents still missing an embedding
+    await EmbeddingQueue.start()
+    # Load the skill vocabulary, giving older documents their skill ids
+    await SkillVocabulary.start()
+    # Load the resident vector indexes used by the recommendation endpoints
+    await VectorIndexes.start()
+    # Load the FAISS snapshots and catch them up from the resident indexes (ANN_INDEX_ENABLED)
+    await AnnIndexes.start()
+    # New vectors move documents within the materialized rankings
+    EmbeddingQueue.add_listener(lambda collection_name, doc_id, vector: schedule_ranking_refresh(collection_name, doc_id))
     print("Database initialized and ready for use")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await AnnIndexes.stop()
+    await VectorIndexes.stop()
+    await EmbeddingQueue.stop()
+    await EmbeddingClient.close()
     await Database.close_db()
 
 # Helper functions
@@ -326,7 +555,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
     
-    user = await Database.get_collection(USERS_COLLECTION).find_one({"email": token_data.email})
+    user = await Repository.find_one(USERS_COLLECTION, {"email": token_data.email}, AUTH_VIEW)
     if user is None:
         raise credentials_exception
     return user
@@ -341,8 +570,7 @@ from passlib.context import CryptContext
 async def register_candidate(user: CandidateCreate):
     try:
         # Check if user already exists
-        existing_user = await Database.get_collection(USERS_COLLECTION).find_one({"email": user.email})
-        if existing_user:
+        if await Repository.exists(USERS_COLLECTION, {"email": user.email}):
             raise HTTPException(status_code=400, detail="Email already registered")
         
         # Generate MongoDB ObjectId
@@ -395,12 +623,16 @@ async def register_candidate(user: CandidateCreate):
         "match_score_threshold": 70  # minimum match score for job recommendations
         }
         
-        # Generate embedding for the candidate
-        candidate_dict["embedding"] = create_candidate_embedding(candidate_dict)
+        # The embedding is filled in by the background embedding queue
+        candidate_text = build_candidate_text(candidate_dict)
+        candidate_dict.update(EmbeddingQueue.pending_fields(candidate_text))
+        candidate_dict.update(await SkillVocabulary.skill_fields(CANDIDATES_COLLECTION, candidate_dict))
         
         # Insert into candidates collection
         await Database.get_collection(CANDIDATES_COLLECTION).insert_one(candidate_dict)
-    
+        VectorIndexes.upsert(CANDIDATES_COLLECTION, candidate_dict)
+        EmbeddingQueue.enqueue(CANDIDATES_COLLECTION, str_id, candidate_text)
+
         # Remove sensitive fields for response
         candidate_dict.pop("_id", None)
         candidate_dict.pop("embedding", None)
@@ -415,13 +647,10 @@ async def register_candidate(user: CandidateCreate):
 async def get_candidate_profile(candidate_id: str):
     try:
         # Get candidate profile from candidates collection using id
-        candidate = await Database.get_collection(CANDIDATES_COLLECTION).find_one({"id": candidate_id})
+        candidate = await Repository.find_one(CANDIDATES_COLLECTION, {"id": candidate_id}, DETAIL_VIEW)
         if not candidate:
             raise HTTPException(status_code=404, detail="Candidate profile not found")
         
-        # Remove MongoDB's _id
-        candidate.pop("_id", None)
-        
         return candidate
         
     except Exception as e:
@@ -432,8 +661,7 @@ async def get_candidate_profile(candidate_id: str):
 async def register_employer(user: EmployerCreate):
     try:
         # Check if user already exists
-        existing_user = await Database.get_collection(USERS_COLLECTION).find_one({"email": user.email})
-        if existing_user:
+        if await Repository.exists(USERS_COLLECTION, {"email": user.email}):
           raise HTTPException(status_code=400, detail="Email already registered")
     
         # Generate MongoDB ObjectId
@@ -509,27 +737,12 @@ async def register_employer(user: EmployerCreate):
 @app.get("/employer/{employer_id}", response_model=Employer)
 async def get_employer_profile(employer_id: str):
     try:
-        employer = await Database.get_collection(EMPLOYERS_COLLECTION).find_one({"id": employer_id})
+        employer = await Repository.find_one(EMPLOYERS_COLLECTION, {"id": employer_id}, DETAIL_VIEW)
         if not employer:
             raise HTTPException(status_code=404, detail="Employer profile not found")
         
-        # Get jobs posted by this employer
-        raw_jobs_from_db = await Database.get_collection(JOBS_COLLECTION).find(
-            {"employer_id": employer_id, "is_active": True}
-        ).to_list(length=None)
-        
-        # Process jobs to remove _id and ensure they are suitable for the response model
-        processed_jobs_list = []
-        for job_doc in raw_jobs_from_db:
-            job_doc.pop("_id", None)  # Remove MongoDB's _id from each job document
-            # Potentially, here you could also validate/convert job_doc fields if needed,
-            # e.g., ensuring datetime objects are handled as expected by Pydantic if not using a Job model for them.
-            processed_jobs_list.append(job_doc)
-            
-        employer["posted_jobs"] = processed_jobs_list
-
-        # Remove MongoDB's _id from the main employer document before returning
-        employer.pop("_id", None)
+        # Jobs posted by this employer, as listed elsewhere
+        employer["posted_jobs"] = await Repository.find(JOBS_COLLECTION, {"employer_id": employer_id, "is_active": True}, LIST_VIEW)
         
         return employer
         
@@ -541,7 +754,7 @@ async def get_employer_profile(employer_id: str):
 
 @app.post("/token", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = await Database.get_collection(USERS_COLLECTION).find_one({"email": form_data.username})
+    user = await Repository.find_one(USERS_COLLECTION, {"email": form_data.username}, CREDENTIALS_VIEW)
     if not user or not verify_password(form_data.password, user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -562,19 +775,22 @@ async def create_job(job: JobCreate, current_user: dict = Depends(get_current_us
     job_dict["id"] = str(ObjectId())
     job_dict["is_active"] = True
     
-    # Create embedding for semantic search
-    job_dict["embedding"] = create_job_embedding(job_dict)
+    # The embedding for semantic search is filled in by the background embedding queue
+    job_text = build_job_text(job_dict)
+    job_dict.update(EmbeddingQueue.pending_fields(job_text))
+    job_dict.update(await SkillVocabulary.skill_fields(JOBS_COLLECTION, job_dict))
     
     await Database.get_collection(JOBS_COLLECTION).insert_one(job_dict)
-    
+    VectorIndexes.upsert(JOBS_COLLECTION, job_dict)
+    EmbeddingQueue.enqueue(JOBS_COLLECTION, job_dict["id"], job_text)
+
     # Remove embedding from returned data to reduce response size
     job_dict.pop("embedding", None)
     return job_dict
 
 @app.get("/jobs", response_model=List[Job])
 async def get_jobs(current_user: dict = Depends(get_current_user)):
-    jobs = await Database.get_collection(JOBS_COLLECTION).find({"is_active": True}).to_list(length=None)
-    return jobs
+    return await Repository.find(JOBS_COLLECTION, {"is_active": True}, LIST_VIEW)
 
 @app.delete("/jobs/{job_id}")
 async def delete_job(
@@ -589,7 +805,7 @@ async def delete_job(
         )
     
     # Get the job
-    job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": job_id})
+    job = await Repository.find_one(JOBS_COLLECTION, {"id": job_id}, SUMMARY_VIEW)
     if not job:
         raise HTTPException(
             status_code=404,
@@ -610,6 +826,8 @@ async def delete_job(
             status_code=500,
             detail="Failed to delete job"
         )
+    VectorIndexes.remove(JOBS_COLLECTION, job_id)
+    schedule_ranking_refresh(JOBS_COLLECTION, job_id)
     
     return {"message": "Job deleted successfully"}
 
@@ -626,8 +844,8 @@ async def update_job(
             detail="Only employers can update jobs"
         )
     
-    # Get the job
-    job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": job_id})
+    # Get the job, with its embedding to tell whether it has to be re-embedded
+    job = await Repository.find_one(JOBS_COLLECTION, {"id": job_id}, INDEX_VIEW)
     if not job:
         raise HTTPException(
             status_code=404,
@@ -642,14 +860,19 @@ async def update_job(
         )
     
     # If fields that affect the embedding are updated, regenerate embedding
+    needs_embedding = False
     semantic_fields = ["title", "company", "description", "requirements", "location"]
     if any(field in update_data for field in semantic_fields):
         # Create updated job data by merging current job with updates
         updated_job = {**job}
         updated_job.update(update_data)
-        # Generate new embedding
-        update_data["embedding"] = create_job_embedding(updated_job)
-    
+        # Only re-embed when the searchable text actually changed
+        job_text = build_job_text(updated_job)
+        if not job.get("embedding") or job_text != build_job_text(job):
+            update_data.update(EmbeddingQueue.pending_fields(job_text))
+            needs_embedding = True
+    update_data.update(await SkillVocabulary.skill_fields(JOBS_COLLECTION, update_data))
+
     # Update the job
     result = await Database.get_collection(JOBS_COLLECTION).update_one(
         {"id": job_id},
@@ -662,13 +885,18 @@ async def update_job(
             detail="Failed to update job or no changes made"
         )
     
+    if needs_embedding:
+        EmbeddingQueue.enqueue(JOBS_COLLECTION, job_id, job_text)
+
     # Return updated job
-    updated_job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": job_id})
+    updated_job = await Repository.find_one(JOBS_COLLECTION, {"id": job_id}, INDEX_VIEW)
     if not updated_job:
         raise HTTPException(
             status_code=404,
             detail="Job not found after update"
         )
+    VectorIndexes.upsert(JOBS_COLLECTION, updated_job)
+    schedule_ranking_refresh(JOBS_COLLECTION, job_id)
     
     # Remove MongoDB's _id and embedding vector from response
     updated_job.pop("_id", None)
@@ -715,28 +943,25 @@ async def create_project(project: ProjectCreate, current_user: dict = Depends(ge
         # Remove any None values to prevent null constraints
         project_dict = {k: v for k, v in project_dict.items() if v is not None}
         
-        # Create embedding for semantic search
-        project_dict["embedding"] = create_project_embedding(project_dict)
+        # The embedding for semantic search is filled in by the background embedding queue
+        project_text = build_project_text(project_dict)
+        project_dict.update(EmbeddingQueue.pending_fields(project_text))
+        project_dict.update(await SkillVocabulary.skill_fields(PROJECTS_COLLECTION, project_dict))
         
         # Insert the project
         await Database.get_collection(PROJECTS_COLLECTION).insert_one(project_dict)
-        
+        VectorIndexes.upsert(PROJECTS_COLLECTION, project_dict)
+        EmbeddingQueue.enqueue(PROJECTS_COLLECTION, project_id, project_text)
+
         # Fetch and return the created project
-        created_project = await Database.get_collection(PROJECTS_COLLECTION).find_one({"id": project_dict["id"]})
+        created_project = await Repository.find_one(PROJECTS_COLLECTION, {"id": project_dict["id"]}, DETAIL_VIEW)
         if not created_project:
             print("DEBUG - Project not found after creation!")
             # Try using ObjectId directly as a fallback
-            created_project = await Database.get_collection(PROJECTS_COLLECTION).find_one({"id": project_id})
+            created_project = await Repository.find_one(PROJECTS_COLLECTION, {"id": project_id}, DETAIL_VIEW)
             if not created_project:
                 raise HTTPException(status_code=500, detail="Failed to create project - cannot find it after creation")
             
-        # Remove MongoDB's _id and embedding from response
-        if "_id" in created_project:
-            created_project.pop("_id", None)
-            
-        if "embedding" in created_project:
-            created_project.pop("embedding", None)
-            
         print(f"DEBUG - Project created successfully: id={created_project['id']}")
         return created_project
         
@@ -769,18 +994,14 @@ async def get_projects(status: Optional[str] = None, current_user: dict = Depend
     
         # Get all projects
         print(f"DEBUG: Query for all projects = {query}")
-        projects = await Database.get_collection(PROJECTS_COLLECTION).find(query).to_list(length=None)
+        projects = await Repository.find(PROJECTS_COLLECTION, query, LIST_VIEW)
         print(f"DEBUG: Found {len(projects)} projects")
         
-        # Process projects - remove _id and handle missing fields
+        # Process projects - handle missing fields
         clean_projects = []
         required_fields = ["id", "title", "company", "description", "requirements", "employer_id", "is_active", "status", "project_type", "skills_required"]
         
         for project in projects:
-            # Remove MongoDB's _id
-            if "_id" in project:
-                project.pop("_id", None)
-                
             # Fill in any missing required fields
             for field in required_fields:
                 if field not in project:
@@ -822,19 +1043,11 @@ async def get_current_employer_projects(current_user: dict = Depends(get_current
         print(f"DEBUG: Finding projects for employer_id: {employer_id}")
         
         # Find all projects for this employer
-        projects_cursor = Database.get_collection(PROJECTS_COLLECTION).find({"employer_id": employer_id})
-        projects = await projects_cursor.to_list(length=None)
+        projects = await Repository.find(PROJECTS_COLLECTION, {"employer_id": employer_id}, LIST_VIEW)
         
         print(f"DEBUG: Found {len(projects)} projects")
         
-        # Clean up projects before returning
-        result_projects = []
-        for project in projects:
-            if "_id" in project:
-                project.pop("_id", None)
-            result_projects.append(project)
-        
-        return result_projects
+        return projects
     except HTTPException:
         raise
     except Exception as e:
@@ -850,18 +1063,13 @@ async def get_project(project_id: str, current_user: dict = Depends(get_current_
     try:
         # Get the project
         print(f"DEBUG: Attempting to find project with id={project_id}")
-        project = await Database.get_collection(PROJECTS_COLLECTION).find_one({"id": project_id})
+        project = await Repository.find_one(PROJECTS_COLLECTION, {"id": project_id}, DETAIL_VIEW)
         print(f"DEBUG: Project found? {'Yes' if project else 'No'}")
         print(f"DEBUG: Project data: {project}")
         
         if not project:
             print(f"DEBUG: Project with id={project_id} not found")
             raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Remove MongoDB's _id
-        if "_id" in project:
-            project.pop("_id", None)
-            print("DEBUG: Removed _id from project")
             
         # Ensure all required fields are present
         required_fields = ["id", "title", "company", "description", "requirements", "employer_id", "is_active", "status", "project_type", "skills_required"]
@@ -918,8 +1126,9 @@ async def update_project_status(
     try:
         # Get the project
         print(f"DEBUG: Attempting to find project with id={project_id}")
-        project = await Database.get_collection(PROJECTS_COLLECTION).find_one({"id": project_id})
-        print(f"DEBUG: Project data: {project}")
+        # With its embedding, to tell whether it has to be re-embedded
+        project = await Repository.find_one(PROJECTS_COLLECTION, {"id": project_id}, INDEX_VIEW)
+        print(f"DEBUG: Project found? {'Yes' if project else 'No'}")
         
         if not project:
             print(f"DEBUG: Project with id={project_id} not found")
@@ -952,14 +1161,19 @@ async def update_project_status(
         update_data["last_updated"] = datetime.utcnow()
         
         # If fields that affect the embedding are updated, regenerate embedding
+        needs_embedding = False
         semantic_fields = ["title", "company", "description", "requirements", "skills_required", "project_type", "location"]
         if any(field in update_data for field in semantic_fields):
             # Create updated project data by merging current project with updates
             updated_project = {**project}
             updated_project.update(update_data)
-            # Generate new embedding
-            update_data["embedding"] = create_project_embedding(updated_project)
-        
+            # Only re-embed when the searchable text actually changed
+            project_text = build_project_text(updated_project)
+            if not project.get("embedding") or project_text != build_project_text(project):
+                update_data.update(EmbeddingQueue.pending_fields(project_text))
+                needs_embedding = True
+        update_data.update(await SkillVocabulary.skill_fields(PROJECTS_COLLECTION, update_data))
+
         print(f"DEBUG: Update data: {update_data}")
     
         # Update the project
@@ -972,12 +1186,17 @@ async def update_project_status(
         if result.matched_count == 0:
             print("DEBUG: No documents were matched")
             raise HTTPException(status_code=404, detail="Project not found") 
-    
+        
+        if needs_embedding:
+            EmbeddingQueue.enqueue(PROJECTS_COLLECTION, project_id, project_text)
+
         # Return updated project
-        updated_project = await Database.get_collection(PROJECTS_COLLECTION).find_one({"id": project_id})
+        updated_project = await Repository.find_one(PROJECTS_COLLECTION, {"id": project_id}, INDEX_VIEW)
         if not updated_project:
             print("DEBUG: Could not find updated project")
             raise HTTPException(status_code=404, detail="Project not found after update")
+        VectorIndexes.upsert(PROJECTS_COLLECTION, updated_project)
+        schedule_ranking_refresh(PROJECTS_COLLECTION, project_id)
         
         if "_id" in updated_project:
             updated_project.pop("_id", None)
@@ -1010,7 +1229,7 @@ async def delete_project(
     try:
         # Get the project
         print(f"DEBUG: Attempting to find project with id={project_id}")
-        project = await Database.get_collection(PROJECTS_COLLECTION).find_one({"id": project_id})
+        project = await Repository.find_one(PROJECTS_COLLECTION, {"id": project_id}, SUMMARY_VIEW)
         print(f"DEBUG: Project found? {'Yes' if project else 'No'}")
         
         if not project:
@@ -1026,13 +1245,14 @@ async def delete_project(
         print(f"DEBUG: Deleting project with id={project_id}")
         result = await Database.get_collection(PROJECTS_COLLECTION).delete_one({"id": project_id})
         print(f"DEBUG: Delete result: deleted count={result.deleted_count}")
+        VectorIndexes.remove(PROJECTS_COLLECTION, project_id)
+        schedule_ranking_refresh(PROJECTS_COLLECTION, project_id)
         
         if result.deleted_count == 0:
             print("DEBUG: No documents were deleted")
             # Even though we found it earlier, it might have been deleted concurrently or there might be an issue with the ID format
             # Check again to differentiate between "project doesn't exist" and "failed to delete"
-            exists_check = await Database.get_collection(PROJECTS_COLLECTION).find_one({"id": project_id})
-            if exists_check:
+            if await Repository.exists(PROJECTS_COLLECTION, {"id": project_id}):
                 # It still exists, so deletion failed
                 raise HTTPException(status_code=500, detail="Failed to delete project")
             else:
@@ -1042,8 +1262,7 @@ async def delete_project(
         print(f"DEBUG: Project deleted successfully: {project_id}")
         
         # Verify the project is really gone
-        verify = await Database.get_collection(PROJECTS_COLLECTION).find_one({"id": project_id})
-        if verify:
+        if await Repository.exists(PROJECTS_COLLECTION, {"id": project_id}):
             print(f"WARNING: Project still exists after deletion: {project_id}")
             
         return {"message": "Project deleted successfully", "id": project_id}
@@ -1057,162 +1276,237 @@ async def delete_project(
         raise HTTPException(status_code=500, detail=f"Failed to delete project: {str(e)}")
 
 # Recommendation endpoints
+def validate_page(limit: int, offset: int, min_score: Optional[float], min_skill_overlap: Optional[int] = None):
+    """Reject recommendation page parameters outside the allowed range"""
+    if limit < 1 or limit > RECOMMENDATION_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {RECOMMENDATION_MAX_LIMIT}")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    if min_score is not None and not 0 <= min_score <= 100:
+        raise HTTPException(status_code=400, detail="min_score must be between 0 and 100")
+    if min_skill_overlap is not None and min_skill_overlap < 1:
+        raise HTTPException(status_code=400, detail="min_skill_overlap must be at least 1")
+
+async def recommendation_entity(collection_name: str, doc_id: str, query: Dict) -> Optional[Dict]:
+    """The job, project or candidate to recommend for, read from the vector index when it is indexed.
+    
+    Documents come without their embedding either way, so the vector is
+    not transferred from MongoDB on every request (see ``entity_vector``).
+    """
+    return VectorIndexes.get(collection_name).get(doc_id) or await Repository.find_one(collection_name, query, DETAIL_VIEW)
+
+async def entity_vector(collection_name: str, entity: Dict) -> Tuple[Any, bool]:
+    """The vector to rank with for a job, project or candidate, and whether it is the stored one.
+    
+    Taken from the vector index, or read on its own for documents the
+    index does not hold; only a document whose embedding is still pending
+    is embedded on the spot.
+    """
+    index = VectorIndexes.get(collection_name)
+    vector = index.vector(entity["id"])
+    if vector is None and index.get(entity["id"]) is None:
+        vector = await Repository.vector(collection_name, entity["id"])
+    if vector is not None and len(vector):
+        return vector, True
+    return await get_embedding(TEXT_BUILDERS[collection_name](entity)), False
+
+async def ranked_page(kind: str, entity: Dict, query_vector, ranked_collection: str, query_is_job: bool,
+                      limit: int, offset: int, min_score: Optional[float], refresh: bool, query_info: Optional[Dict] = None,
+                      min_skill_overlap: Optional[int] = None, store: bool = True) -> List[Dict]:
+    """One page of ranked ``{"id", "score", "method"}`` items for an entity.
+    
+    Served from the materialized recommendations when a fresh ranking is
+    stored; otherwise ranked live against the vector index, and the top
+    ``MATERIALIZED_TOP_K`` stored for later requests. Skill pre-filtered
+    pages are always ranked live and never stored, and neither are
+    rankings made without the entity's stored vector (``store=False``).
+    """
+    query_info = query_info or entity
+    if query_info.get("skill_ids") is None:
+        # Ranked by skill ids resolved here; pick up ones other workers assigned
+        await SkillVocabulary.resolve(required_skill_names(query_info) if query_is_job else query_info.get("skills"))
+    if min_skill_overlap:
+        return rank_matches(query_vector, query_info, ranked_collection, query_is_job, limit, offset, min_score, min_skill_overlap)
+    
+    if not refresh:
+        page = await MaterializedRecommendations.page(kind, entity["id"], limit, offset)
+        if page is not None:
+            return [item for item in page if min_score is None or item["score"] >= min_score]
+    
+    if offset + limit > MATERIALIZED_TOP_K:
+        return rank_matches(query_vector, query_info, ranked_collection, query_is_job, limit, offset, min_score)
+    
+    items = rank_matches(query_vector, query_info, ranked_collection, query_is_job, MATERIALIZED_TOP_K)
+    # Only rankings made with the entity's own stored vector are worth keeping
+    if store:
+        await MaterializedRecommendations.store(kind, entity["id"], items)
+    return [item for item in items[offset:offset + limit] if min_score is None or item["score"] >= min_score]
+
 @app.get("/recommendations/jobs", response_model=List[dict])
-async def get_job_recommendations(current_user: dict = Depends(get_current_user)):
+async def get_job_recommendations(
+    background_tasks: BackgroundTasks,
+    limit: int = RECOMMENDATION_DEFAULT_LIMIT,
+    offset: int = 0,
+    min_score: Optional[float] = None,
+    refresh: bool = False,
+    explain: bool = True,
+    stream: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     if current_user["user_type"] != UserType.CANDIDATE:
         raise HTTPException(status_code=403, detail="Only candidates can get job recommendations")
+    validate_page(limit, offset, min_score)
+    validate_stream(stream)
     
     # Get candidate profile
-    candidate = await Database.get_collection(CANDIDATES_COLLECTION).find_one(
-        {"email": current_user["email"]}
-    )
+    candidate = await recommendation_entity(CANDIDATES_COLLECTION, current_user["id"], {"email": current_user["email"]})
     if not candidate:
         raise HTTPException(status_code=404, detail="Candidate profile not found")
     
-    jobs = await Database.get_collection(JOBS_COLLECTION).find({"is_active": True}).to_list(length=None)
-    recommendations = await get_candidate_job_matches(candidate, jobs)
-    
-    # Save recommendations with score > 70 to recommendations collection
-    for rec in recommendations:
-        if rec["match_score"] >= 70:
-            # Create recommendation document
-            recommendation_doc = {
-                "id": str(ObjectId()),
-                "candidate_id": candidate["id"],
-                "job_id": rec["job_id"],
-                "match_score": rec["match_score"],
-                "type": "job_recommendation",
-                "timestamp": datetime.utcnow(),
-                "viewed": False
-            }
-            
-            # Check if this recommendation already exists
-            existing_rec = await Database.get_collection(RECOMMENDATIONS_COLLECTION).find_one({
-                "candidate_id": candidate["id"],
-                "job_id": rec["job_id"],
-                "type": "job_recommendation"
-            })
-            
-            # If it doesn't exist or score has changed, save/update it
-            if not existing_rec:
-                await Database.get_collection(RECOMMENDATIONS_COLLECTION).insert_one(recommendation_doc)
-                print(f"Saved job recommendation with score {rec['match_score']} for candidate {candidate['id']}")
-            elif existing_rec["match_score"] != rec["match_score"]:
-                await Database.get_collection(RECOMMENDATIONS_COLLECTION).update_one(
-                    {"id": existing_rec["id"]},
-                    {"$set": {"match_score": rec["match_score"], "timestamp": datetime.utcnow()}}
-                )
-                print(f"Updated job recommendation score to {rec['match_score']} for candidate {candidate['id']}")
-    
-    return recommendations
+    candidate_vector, stored = await entity_vector(CANDIDATES_COLLECTION, candidate)
+    items = await ranked_page("job_recommendation", candidate, candidate_vector, JOBS_COLLECTION, False, limit, offset, min_score, refresh,
+                              store=stored)
+    
+    job_index = VectorIndexes.get(JOBS_COLLECTION)
+    items = [item for item in items if job_index.get(item["id"])]
+    
+    # Save recommendations with score >= 70 to the recommendations collection after responding
+    background_tasks.add_task(save_recommendations, [
+        {
+            "candidate_id": candidate["id"],
+            "job_id": item["id"],
+            "match_score": item["score"],
+            "type": "job_recommendation"
+        }
+        for item in items if item["score"] >= RECOMMENDATION_STORE_THRESHOLD
+    ])
+    
+    # Explain the page from the job documents held in the vector index,
+    # one recommendation at a time when streaming
+    def recommendation(item):
+        job = job_index.get(item["id"])
+        if not job:
+            return None
+        return {
+            "job_id": item["id"],
+            "match_score": item["score"],
+            "explanation": explain_match(job, candidate, item["score"], item["method"]) if explain else None
+        }
+    
+    return respond((recommendation(item) for item in items), stream)
 
 @app.get("/recommendations/candidates/{job_id}", response_model=List[dict])
-async def get_candidate_recommendations(job_id: str, current_user: dict = Depends(get_current_user)):
+async def get_candidate_recommendations(
+    job_id: str,
+    background_tasks: BackgroundTasks,
+    limit: int = RECOMMENDATION_DEFAULT_LIMIT,
+    offset: int = 0,
+    min_score: Optional[float] = None,
+    refresh: bool = False,
+    explain: bool = True,
+    min_skill_overlap: Optional[int] = None,
+    stream: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     if current_user["user_type"] != UserType.EMPLOYER:
         raise HTTPException(status_code=403, detail="Only employers can get candidate recommendations")
+    validate_page(limit, offset, min_score, min_skill_overlap)
+    validate_stream(stream)
     
-    job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": job_id})
+    job = await recommendation_entity(JOBS_COLLECTION, job_id, {"id": job_id})
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    # Make sure to only get active candidates with complete profiles
-    candidates = await Database.get_collection(CANDIDATES_COLLECTION).find({
-        "is_active": True,
-        "profile_completed": True
-    }).to_list(length=None)
-    
-    if not candidates:
+    # The candidate index only holds active candidates with complete profiles
+    candidate_index = VectorIndexes.get(CANDIDATES_COLLECTION)
+    if not len(candidate_index):
         print(f"No active candidates found for job {job_id}")
-        return []
-    
-    recommendations = await get_job_candidate_matches(job, candidates)
-    
-    # Save high-scoring recommendations to the recommendations collection
-    for rec in recommendations:
-        if rec["match_score"] >= 70:
-            # Create recommendation document
-            recommendation_doc = {
-                "id": str(ObjectId()),
-                "candidate_id": rec["candidate_id"],
-                "job_id": job_id,
-                "employer_id": current_user["id"],
-                "match_score": rec["match_score"],
-                "type": "candidate_recommendation",
-                "timestamp": datetime.utcnow(),
-                "viewed": False
-            }
-            
-            # Check if this recommendation already exists
-            existing_rec = await Database.get_collection(RECOMMENDATIONS_COLLECTION).find_one({
-                "candidate_id": rec["candidate_id"],
-                "job_id": job_id,
-                "type": "candidate_recommendation"
-            })
-            
-            # If it doesn't exist or score has changed, save/update it
-            if not existing_rec:
-                await Database.get_collection(RECOMMENDATIONS_COLLECTION).insert_one(recommendation_doc)
-                print(f"Saved candidate recommendation with score {rec['match_score']} for job {job_id}")
-            elif existing_rec["match_score"] != rec["match_score"]:
-                await Database.get_collection(RECOMMENDATIONS_COLLECTION).update_one(
-                    {"id": existing_rec["id"]},
-                    {"$set": {"match_score": rec["match_score"], "timestamp": datetime.utcnow()}}
-                )
-                print(f"Updated candidate recommendation score to {rec['match_score']} for job {job_id}")
-    
-    # Fetch full candidate details for each recommendation
-    detailed_recommendations = []
-    for rec in recommendations:
-        candidate = next((c for c in candidates if c["id"] == rec["candidate_id"]), None)
-        if candidate:
-            # Remove MongoDB's _id from candidate
-            if "_id" in candidate:
-                candidate.pop("_id", None)
-                
-            rec_with_details = rec.copy()
-            rec_with_details["candidate"] = candidate
-            detailed_recommendations.append(rec_with_details)
+        return respond([], stream)
+    
+    job_vector, stored = await entity_vector(JOBS_COLLECTION, job)
+    items = await ranked_page("candidate_recommendation", job, job_vector, CANDIDATES_COLLECTION, True, limit, offset, min_score, refresh,
+                              min_skill_overlap=min_skill_overlap, store=stored)
+    
+    items = [item for item in items if candidate_index.get(item["id"])]
+    
+    # Save high-scoring recommendations to the recommendations collection after responding
+    background_tasks.add_task(save_recommendations, [
+        {
+            "candidate_id": item["id"],
+            "job_id": job_id,
+            "employer_id": current_user["id"],
+            "match_score": item["score"],
+            "type": "candidate_recommendation"
+        }
+        for item in items if item["score"] >= RECOMMENDATION_STORE_THRESHOLD
+    ])
     
-    return detailed_recommendations
+    # Attach candidate details from the index; indexed documents carry
+    # neither MongoDB's _id nor the stored vector
+    def recommendation(item):
+        candidate = candidate_index.get(item["id"])
+        if not candidate:
+            return None
+        return {
+            "candidate_id": item["id"],
+            "match_score": item["score"],
+            "explanation": explain_match(job, candidate, item["score"], item["method"]) if explain else None,
+            "candidate": candidate
+        }
+    
+    return respond((recommendation(item) for item in items), stream)
 
 # Add this function after the existing recommendation functions
 @app.get("/recommendations/projects", response_model=List[dict])
-async def get_project_recommendations(current_user: dict = Depends(get_current_user)):
+async def get_project_recommendations(
+    background_tasks: BackgroundTasks,
+    limit: int = RECOMMENDATION_DEFAULT_LIMIT,
+    offset: int = 0,
+    min_score: Optional[float] = None,
+    refresh: bool = False,
+    explain: bool = True,
+    stream: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     """Get project recommendations for a candidate"""
     if current_user["user_type"] != UserType.CANDIDATE:
         raise HTTPException(status_code=403, detail="Only candidates can get project recommendations")
+    validate_page(limit, offset, min_score)
+    validate_stream(stream)
     
     # Get candidate profile
-    candidate = await Database.get_collection(CANDIDATES_COLLECTION).find_one(
-        {"email": current_user["email"]}
-    )
+    candidate = await recommendation_entity(CANDIDATES_COLLECTION, current_user["id"], {"email": current_user["email"]})
     if not candidate:
         raise HTTPException(status_code=404, detail="Candidate profile not found")
     
-    # Get active projects
-    projects = await Database.get_collection(PROJECTS_COLLECTION).find({"is_active": True, "status": "open"}).to_list(length=None)
-    
-    if not projects:
-        return []
-    
-    recommendations = []
-    # Process each project to find matches
-    for project in projects:
-        # Convert project format to job-like format for the recommender
-        project_job_format = {
-            "title": project.get("title", ""),
-            "required_skills": project.get("skills_required", []),  # Map project skills to required_skills
-            "description": project.get("description", ""),
+    # Projects are ranked against the stored candidate vector and the
+    # project vectors held by the index; nothing is embedded per request
+    candidate_vector, stored = await entity_vector(CANDIDATES_COLLECTION, candidate)
+    items = await ranked_page("project_recommendation", candidate, candidate_vector, PROJECTS_COLLECTION, False, limit, offset, min_score, refresh,
+                              store=stored)
+    
+    project_index = VectorIndexes.get(PROJECTS_COLLECTION)
+    items = [item for item in items if project_index.get(item["id"])]
+    
+    # Save recommendations with score >= 70 to the recommendations collection after responding
+    background_tasks.add_task(save_recommendations, [
+        {
+            "candidate_id": candidate["id"],
+            "project_id": item["id"],
+            "match_score": item["score"],
+            "type": "project_recommendation"
         }
-        
-        # Use the same matching algorithm used for jobs
-        score, explanation = await get_match_score(project_job_format, candidate)
-        
-        # Add to recommendations
-        project_recommendation = {
+        for item in items if item["score"] >= RECOMMENDATION_STORE_THRESHOLD
+    ])
+    
+    def recommendation(item):
+        project = project_index.get(item["id"])
+        if not project:
+            return None
+        return {
             "project_id": project["id"],
-            "match_score": score,
-            "explanation": explanation,
+            "match_score": item["score"],
+            "explanation": explain_match(project_as_job(project), candidate, item["score"], item["method"]) if explain else None,
             "project_details": {
                 "title": project.get("title", ""),
                 "company": project.get("company", ""),
@@ -1221,50 +1515,29 @@ async def get_project_recommendations(current_user: dict = Depends(get_current_u
                 "skills_required": project.get("skills_required", []),
             }
         }
-        recommendations.append(project_recommendation)
-        
-        # Save recommendations with score > 70 to recommendations collection
-        if score >= 70:
-            # Create recommendation document
-            recommendation_doc = {
-                "id": str(ObjectId()),
-                "candidate_id": candidate["id"],
-                "project_id": project["id"],
-                "match_score": score,
-                "type": "project_recommendation",
-                "timestamp": datetime.utcnow(),
-                "viewed": False
-            }
-            
-            # Check if this recommendation already exists
-            existing_rec = await Database.get_collection(RECOMMENDATIONS_COLLECTION).find_one({
-                "candidate_id": candidate["id"],
-                "project_id": project["id"],
-                "type": "project_recommendation"
-            })
-            
-            # If it doesn't exist or score has changed, save/update it
-            if not existing_rec:
-                await Database.get_collection(RECOMMENDATIONS_COLLECTION).insert_one(recommendation_doc)
-                print(f"Saved project recommendation with score {score} for candidate {candidate['id']}")
-            elif existing_rec["match_score"] != score:
-                await Database.get_collection(RECOMMENDATIONS_COLLECTION).update_one(
-                    {"id": existing_rec["id"]},
-                    {"$set": {"match_score": score, "timestamp": datetime.utcnow()}}
-                )
-                print(f"Updated project recommendation score to {score} for candidate {candidate['id']}")
-    
-    # Sort by match score
-    recommendations = sorted(recommendations, key=lambda x: x["match_score"], reverse=True)
-    return recommendations
+    
+    return respond((recommendation(item) for item in items), stream)
 
 @app.get("/recommendations/candidates-for-project/{project_id}", response_model=List[dict])
-async def get_candidate_recommendations_for_project(project_id: str, current_user: dict = Depends(get_current_user)):
+async def get_candidate_recommendations_for_project(
+    project_id: str,
+    background_tasks: BackgroundTasks,
+    limit: int = RECOMMENDATION_DEFAULT_LIMIT,
+    offset: int = 0,
+    min_score: Optional[float] = None,
+    refresh: bool = False,
+    explain: bool = True,
+    min_skill_overlap: Optional[int] = None,
+    stream: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     """Get candidate recommendations for a specific project"""
     if current_user["user_type"] != UserType.EMPLOYER:
         raise HTTPException(status_code=403, detail="Only employers can get candidate recommendations for projects")
+    validate_page(limit, offset, min_score, min_skill_overlap)
+    validate_stream(stream)
     
-    project = await Database.get_collection(PROJECTS_COLLECTION).find_one({"id": project_id})
+    project = await recommendation_entity(PROJECTS_COLLECTION, project_id, {"id": project_id})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
@@ -1272,32 +1545,39 @@ async def get_candidate_recommendations_for_project(project_id: str, current_use
     if project["employer_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="You can only get recommendations for your own projects")
     
-    # Get active candidates with complete profiles
-    candidates = await Database.get_collection(CANDIDATES_COLLECTION).find({
-        "is_active": True,
-        "profile_completed": True
-    }).to_list(length=None)
-    
-    if not candidates:
-        return []
-    
-    recommendations = []
-    for candidate in candidates:
-        # Convert project format to job-like format for the recommender
-        project_job_format = {
-            "title": project.get("title", ""),
-            "required_skills": project.get("skills_required", []),
-            "description": project.get("description", ""),
+    candidate_index = VectorIndexes.get(CANDIDATES_COLLECTION)
+    if not len(candidate_index):
+        return respond([], stream)
+    
+    # Convert project format to job-like format for the recommender
+    project_job_format = project_as_job(project)
+    project_vector, stored = await entity_vector(PROJECTS_COLLECTION, project)
+    items = await ranked_page("project_candidate_recommendation", project, project_vector, CANDIDATES_COLLECTION, True,
+                              limit, offset, min_score, refresh, query_info=project_job_format, min_skill_overlap=min_skill_overlap,
+                              store=stored)
+    
+    items = [item for item in items if candidate_index.get(item["id"])]
+    
+    # Save recommendations with score >= 70 to the recommendations collection after responding
+    background_tasks.add_task(save_recommendations, [
+        {
+            "candidate_id": item["id"],
+            "project_id": project_id,
+            "employer_id": current_user["id"],
+            "match_score": item["score"],
+            "type": "project_candidate_recommendation"
         }
-        
-        # Use the same matching algorithm
-        score, explanation = await get_match_score(project_job_format, candidate)
-        
-        candidate_id = candidate.get("id")
-        recommendation = {
-            "candidate_id": candidate_id,
-            "match_score": score,
-            "explanation": explanation,
+        for item in items if item["score"] >= RECOMMENDATION_STORE_THRESHOLD
+    ])
+    
+    def recommendation(item):
+        candidate = candidate_index.get(item["id"])
+        if not candidate:
+            return None
+        return {
+            "candidate_id": item["id"],
+            "match_score": item["score"],
+            "explanation": explain_match(project_job_format, candidate, item["score"], item["method"]) if explain else None,
             "candidate": {
                 "full_name": candidate.get("full_name", ""),
                 "skills": candidate.get("skills", []),
@@ -1305,68 +1585,38 @@ async def get_candidate_recommendations_for_project(project_id: str, current_use
                 "experience": candidate.get("experience", "")
             }
         }
-        
-        recommendations.append(recommendation)
-        
-        # Save recommendations with score > 70 to recommendations collection
-        if score >= 70:
-            # Create recommendation document
-            recommendation_doc = {
-                "id": str(ObjectId()),
-                "candidate_id": candidate_id,
-                "project_id": project_id,
-                "employer_id": current_user["id"],
-                "match_score": score,
-                "type": "project_candidate_recommendation",
-                "timestamp": datetime.utcnow(),
-                "viewed": False
-            }
-            
-            # Check if this recommendation already exists
-            existing_rec = await Database.get_collection(RECOMMENDATIONS_COLLECTION).find_one({
-                "candidate_id": candidate_id,
-                "project_id": project_id,
-                "type": "project_candidate_recommendation"
-            })
-            
-            # If it doesn't exist or score has changed, save/update it
-            if not existing_rec:
-                await Database.get_collection(RECOMMENDATIONS_COLLECTION).insert_one(recommendation_doc)
-                print(f"Saved candidate recommendation for project with score {score}")
-            elif existing_rec["match_score"] != score:
-                await Database.get_collection(RECOMMENDATIONS_COLLECTION).update_one(
-                    {"id": existing_rec["id"]},
-                    {"$set": {"match_score": score, "timestamp": datetime.utcnow()}}
-                )
-                print(f"Updated candidate recommendation for project with score {score}")
-    
-    # Sort by match score
-    recommendations = sorted(recommendations, key=lambda x: x["match_score"], reverse=True)
-    return recommendations
+    
+    return respond((recommendation(item) for item in items), stream)
 
 # Add a semantic search endpoint
 @app.post("/jobs/search", response_model=List[Job])
 async def search_jobs_semantic(
     search_data: dict,
     top_k: int = 5,
+    mode: str = "vector",
+    stream: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Search for jobs using semantic search"""
+    """Search for jobs using semantic (vector), lexical (BM25) or hybrid search"""
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(SEARCH_MODES)}")
+    validate_stream(stream)
     try:
         query = search_data.get("query", "")
         if not query:
             raise HTTPException(status_code=400, detail="Query parameter is required")
             
-        query_vector = get_embedding(query)
-        
-        # Use the MongoDB vector search
-        results = await search_vector_collection(
-            JOBS_COLLECTION, 
-            query_vector, 
-            top_k, 
-            {"is_active": True}
+        results = await search_documents(
+            JOBS_COLLECTION,
+            query,
+            top_k,
+            mode,
+            dict(SEARCH_FILTERS[JOBS_COLLECTION])
         )
         
+        if stream:
+            # A streamed response skips response_model, so shape each job here
+            return respond((Job(**job) for job in results), stream)
         return results
         
     except Exception as e:
@@ -1379,22 +1629,23 @@ async def search_jobs_semantic(
 async def search_projects_semantic(
     search_data: dict,
     top_k: int = 5,
+    mode: str = "vector",
     current_user: dict = Depends(get_current_user)
 ):
-    """Search for projects using semantic search"""
+    """Search for projects using semantic (vector), lexical (BM25) or hybrid search"""
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(SEARCH_MODES)}")
     try:
         query = search_data.get("query", "")
         if not query:
             raise HTTPException(status_code=400, detail="Query parameter is required")
             
-        query_vector = get_embedding(query)
-        
-        # Use the MongoDB vector search
-        results = await search_vector_collection(
+        results = await search_documents(
             PROJECTS_COLLECTION,
-            query_vector,
+            query,
             top_k,
-            {"is_active": True}
+            mode,
+            dict(SEARCH_FILTERS[PROJECTS_COLLECTION])
         )
         
         return results
@@ -1409,9 +1660,12 @@ async def search_projects_semantic(
 async def search_candidates_semantic(
     search_data: dict,
     top_k: int = 5,
+    mode: str = "vector",
     current_user: dict = Depends(get_current_user)
 ):
-    """Search for candidates using semantic search"""
+    """Search for candidates using semantic (vector), lexical (BM25) or hybrid search"""
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(SEARCH_MODES)}")
     try:
         # Only employers can search for candidates
         if current_user["user_type"] != UserType.EMPLOYER:
@@ -1421,18 +1675,12 @@ async def search_candidates_semantic(
         if not query:
             raise HTTPException(status_code=400, detail="Query parameter is required")
             
-        query_vector = get_embedding(query)
-        
-        # Use the MongoDB vector search
-        results = await search_vector_collection(
+        results = await search_documents(
             CANDIDATES_COLLECTION,
-            query_vector,
+            query,
             top_k,
-            {
-                "is_active": True,
-                "profile_completed": True,
-                "profile_visibility": "public"
-            }
+            mode,
+            dict(SEARCH_FILTERS[CANDIDATES_COLLECTION])
         )
         
         return results
@@ -1443,6 +1691,51 @@ async def search_candidates_semantic(
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Failed to perform semantic search on candidates: {str(e)}")
 
+@app.post("/search/batch", response_model=List[BatchSearchResult])
+async def search_batch(
+    batch: BatchSearchRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Run several searches, over any of the searchable collections, in one request.
+    
+    Each query has its own collection, ``top_k`` and equality ``filters``;
+    results come back grouped per query, in request order.
+    """
+    if batch.mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(SEARCH_MODES)}")
+    if not batch.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    if len(batch.queries) > BATCH_SEARCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_SEARCH_MAX_QUERIES} queries can be searched at once")
+    for search in batch.queries:
+        if search.collection not in SEARCH_FILTERS:
+            raise HTTPException(status_code=400, detail=f"collection must be one of: {', '.join(SEARCH_FILTERS)}")
+        if not search.query:
+            raise HTTPException(status_code=400, detail="Every search needs a query")
+        if search.top_k < 1:
+            raise HTTPException(status_code=400, detail="top_k must be at least 1")
+        if any(field.startswith("$") for field in search.filters):
+            raise HTTPException(status_code=400, detail="Filters can only compare fields for equality")
+        # Only employers can search for candidates
+        if search.collection == CANDIDATES_COLLECTION and current_user["user_type"] != UserType.EMPLOYER:
+            raise HTTPException(status_code=403, detail="Only employers can search candidates")
+    
+    try:
+        results = await batch_search_documents(batch.queries, batch.mode)
+        return [
+            {
+                "query": search.query,
+                "collection": search.collection,
+                "results": [SEARCH_RESULT_MODELS[search.collection](**doc) for doc in docs]
+            }
+            for search, docs in zip(batch.queries, results)
+        ]
+    except Exception as e:
+        print(f"Error in batch search: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to perform batch search: {str(e)}")
+
 # User profile endpoints
 @app.put("/profile", response_model=User)
 async def update_profile(profile_data: dict, current_user: dict = Depends(get_current_user)):
@@ -1455,29 +1748,35 @@ async def update_profile(profile_data: dict, current_user: dict = Depends(get_cu
         )
         
         # Check if any field affects candidate embedding
+        needs_embedding = False
         semantic_fields = ["full_name", "skills", "experience", "education", "location", "bio"]
         if any(field in profile_data for field in semantic_fields):
             # Get the current candidate data
-            candidate = await Database.get_collection(CANDIDATES_COLLECTION).find_one(
-                {"email": current_user["email"]}
-            )
+            candidate = await Repository.find_one(CANDIDATES_COLLECTION, {"email": current_user["email"]}, INDEX_VIEW)
             if candidate:
                 # Create updated candidate data by merging
                 updated_candidate = {**candidate}
                 updated_candidate.update(profile_data)
-                # Generate new embedding
-                profile_data["embedding"] = create_candidate_embedding(updated_candidate)
-        
-        # Update candidate profile with new data including potential new embedding
+                # Only re-embed when the searchable text actually changed
+                candidate_text = build_candidate_text(updated_candidate)
+                if not candidate.get("embedding") or candidate_text != build_candidate_text(candidate):
+                    profile_data.update(EmbeddingQueue.pending_fields(candidate_text))
+                    needs_embedding = True
+        profile_data.update(await SkillVocabulary.skill_fields(CANDIDATES_COLLECTION, profile_data))
+
+        # Update candidate profile with new data; the embedding is refreshed in the background
         await Database.get_collection(CANDIDATES_COLLECTION).update_one(
             {"email": current_user["email"]},
             {"$set": profile_data}
         )
-        
+        if needs_embedding:
+            EmbeddingQueue.enqueue(CANDIDATES_COLLECTION, candidate["id"], candidate_text)
+
         # Get updated candidate profile
-        updated_profile = await Database.get_collection(CANDIDATES_COLLECTION).find_one(
-            {"email": current_user["email"]}
-        )
+        updated_profile = await Repository.find_one(CANDIDATES_COLLECTION, {"email": current_user["email"]}, INDEX_VIEW)
+        VectorIndexes.upsert(CANDIDATES_COLLECTION, updated_profile)
+        if updated_profile:
+            schedule_ranking_refresh(CANDIDATES_COLLECTION, updated_profile["id"])
         
         # Remove embedding from response
         if updated_profile and "embedding" in updated_profile:
@@ -1499,9 +1798,7 @@ async def update_profile(profile_data: dict, current_user: dict = Depends(get_cu
         )
         
         # Get updated employer profile
-        updated_profile = await Database.get_collection(EMPLOYERS_COLLECTION).find_one(
-            {"email": current_user["email"]}
-        )
+        updated_profile = await Repository.find_one(EMPLOYERS_COLLECTION, {"email": current_user["email"]}, DETAIL_VIEW)
         return updated_profile
 
 @app.get("/profile", response_model=User)
@@ -1526,6 +1823,8 @@ async def delete_user(current_user: dict = Depends(get_current_user)):
             )
             if candidate_result.deleted_count == 0:
                 print(f"Warning: Candidate profile not found for user {current_user['email']}")
+            VectorIndexes.remove(CANDIDATES_COLLECTION, current_user["id"])
+            schedule_ranking_refresh(CANDIDATES_COLLECTION, current_user["id"])
         
         # If user is an employer, delete from employers collection and their posted jobs
         elif current_user["user_type"] == UserType.EMPLOYER:
@@ -1542,6 +1841,8 @@ async def delete_user(current_user: dict = Depends(get_current_user)):
             )
             if jobs_result.deleted_count > 0:
                 print(f"Deleted {jobs_result.deleted_count} jobs posted by employer {current_user['email']}")
+            for job_id in VectorIndexes.remove_matching(JOBS_COLLECTION, "employer_id", current_user["id"]):
+                schedule_ranking_refresh(JOBS_COLLECTION, job_id)
             
             # Delete all projects posted by this employer
             projects_result = await Database.get_collection(PROJECTS_COLLECTION).delete_many(
@@ -1549,6 +1850,8 @@ async def delete_user(current_user: dict = Depends(get_current_user)):
             )
             if projects_result.deleted_count > 0:
                 print(f"Deleted {projects_result.deleted_count} projects posted by employer {current_user['email']}")
+            for project_id in VectorIndexes.remove_matching(PROJECTS_COLLECTION, "employer_id", current_user["id"]):
+                schedule_ranking_refresh(PROJECTS_COLLECTION, project_id)
         
         return {"message": "User and associated profiles deleted successfully"}
         
@@ -1591,17 +1894,15 @@ async def apply_for_job(application: JobApplicationCreate, current_user: dict =
             raise HTTPException(status_code=403, detail="Only candidates can apply for jobs")
         
         # Check if the job exists
-        job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": application.job_id})
+        job = await Repository.find_one(JOBS_COLLECTION, {"id": application.job_id}, SUMMARY_VIEW)
         if not job:
             raise HTTPException(status_code=404, detail="Job not found")
         
         # Check if the candidate has already applied for this job
-        existing_application = await Database.get_collection(JOB_APPLICATIONS_COLLECTION).find_one({
+        if await Repository.exists(JOB_APPLICATIONS_COLLECTION, {
             "candidate_id": current_user["id"],
             "job_id": application.job_id
-        })
-        
-        if existing_application:
+        }):
             raise HTTPException(status_code=400, detail="You have already applied for this job")
         
         # Create a new application
@@ -1632,14 +1933,12 @@ async def get_job_applications(current_user: dict = Depends(get_current_user)):
             raise HTTPException(status_code=403, detail="Only candidates can view their job applications")
         
         # Get all applications for this candidate
-        applications = await Database.get_collection(JOB_APPLICATIONS_COLLECTION).find({
-            "candidate_id": current_user["id"]
-        }).to_list(length=None)
+        applications = await Repository.find(JOB_APPLICATIONS_COLLECTION, {"candidate_id": current_user["id"]}, DETAIL_VIEW)
         
         # Get job details for each application
+        jobs = await Repository.find_by_ids(JOBS_COLLECTION, [application.get("job_id") for application in applications], SUMMARY_VIEW)
         for application in applications:
-            application.pop("_id", None)
-            job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": application["job_id"]})
+            job = jobs.get(application["job_id"])
             if job:
                 application["job_details"] = {
                     "title": job.get("title"),
@@ -1660,12 +1959,10 @@ async def withdraw_application(application_id: str, current_user: dict = Depends
             raise HTTPException(status_code=403, detail="Only candidates can withdraw applications")
         
         # Check if the application exists and belongs to this candidate
-        application = await Database.get_collection(JOB_APPLICATIONS_COLLECTION).find_one({
+        if not await Repository.exists(JOB_APPLICATIONS_COLLECTION, {
             "id": application_id,
             "candidate_id": current_user["id"]
-        })
-        
-        if not application:
+        }):
             raise HTTPException(status_code=404, detail="Application not found or does not belong to you")
         
         # Delete the application
@@ -1693,12 +1990,10 @@ async def update_application(
             raise HTTPException(status_code=403, detail="Only candidates can update applications")
         
         # Check if the application exists and belongs to this candidate
-        application = await Database.get_collection(JOB_APPLICATIONS_COLLECTION).find_one({
+        if not await Repository.exists(JOB_APPLICATIONS_COLLECTION, {
             "id": application_id,
             "candidate_id": current_user["id"]
-        })
-        
-        if not application:
+        }):
             raise HTTPException(status_code=404, detail="Application not found or does not belong to you")
         
         # Only allow updating certain fields
@@ -1721,15 +2016,12 @@ async def update_application(
             raise HTTPException(status_code=500, detail="Failed to update application")
         
         # Get updated application
-        updated_application = await Database.get_collection(JOB_APPLICATIONS_COLLECTION).find_one({"id": application_id})
+        updated_application = await Repository.find_one(JOB_APPLICATIONS_COLLECTION, {"id": application_id}, DETAIL_VIEW)
         if not updated_application:
             raise HTTPException(status_code=404, detail="Application not found after update")
         
-        # Remove MongoDB's _id
-        updated_application.pop("_id", None)
-        
         # Get job details
-        job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": updated_application["job_id"]})
+        job = await Repository.find_one(JOBS_COLLECTION, {"id": updated_application["job_id"]}, SUMMARY_VIEW)
         if job:
             updated_application["job_details"] = {
                 "title": job.get("title"),
@@ -1751,17 +2043,15 @@ async def save_job(saved_job: SavedJobCreate, current_user: dict = Depends(get_c
             raise HTTPException(status_code=403, detail="Only candidates can save jobs")
         
         # Check if the job exists
-        job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": saved_job.job_id})
+        job = await Repository.find_one(JOBS_COLLECTION, {"id": saved_job.job_id}, SUMMARY_VIEW)
         if not job:
             raise HTTPException(status_code=404, detail="Job not found")
     
         # Check if the job is already saved
-        existing_saved_job = await Database.get_collection(SAVED_JOBS_COLLECTION).find_one({
+        if await Repository.exists(SAVED_JOBS_COLLECTION, {
             "candidate_id": current_user["id"],
             "job_id": saved_job.job_id
-        })
-        
-        if existing_saved_job:
+        }):
             raise HTTPException(status_code=400, detail="You have already saved this job")
         
         # Create a new saved job
@@ -1790,14 +2080,12 @@ async def get_saved_jobs(current_user: dict = Depends(get_current_user)):
             raise HTTPException(status_code=403, detail="Only candidates can view their saved jobs")
         
         # Get all saved jobs for this candidate
-        saved_jobs = await Database.get_collection(SAVED_JOBS_COLLECTION).find({
-            "candidate_id": current_user["id"]
-        }).to_list(length=None)
+        saved_jobs = await Repository.find(SAVED_JOBS_COLLECTION, {"candidate_id": current_user["id"]}, DETAIL_VIEW)
     
         # Get job details for each saved job
+        jobs = await Repository.find_by_ids(JOBS_COLLECTION, [saved_job.get("job_id") for saved_job in saved_jobs], SUMMARY_VIEW)
         for saved_job in saved_jobs:
-            saved_job.pop("_id", None)
-            job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": saved_job["job_id"]})
+            job = jobs.get(saved_job["job_id"])
             if job:
                 saved_job["job_details"] = {
                     "title": job.get("title"),
@@ -1818,12 +2106,10 @@ async def remove_saved_job(saved_job_id: str, current_user: dict = Depends(get_c
             raise HTTPException(status_code=403, detail="Only candidates can remove saved jobs")
         
         # Check if the saved job exists and belongs to this candidate
-        saved_job = await Database.get_collection(SAVED_JOBS_COLLECTION).find_one({
+        if not await Repository.exists(SAVED_JOBS_COLLECTION, {
             "id": saved_job_id,
             "candidate_id": current_user["id"]
-        })
-        
-        if not saved_job:
+        }):
             raise HTTPException(status_code=404, detail="Saved job not found or does not belong to you")
         
         # Delete the saved job
@@ -1851,12 +2137,10 @@ async def update_saved_job(
             raise HTTPException(status_code=403, detail="Only candidates can update saved jobs")
         
         # Check if the saved job exists and belongs to this candidate
-        saved_job = await Database.get_collection(SAVED_JOBS_COLLECTION).find_one({
+        if not await Repository.exists(SAVED_JOBS_COLLECTION, {
             "id": saved_job_id,
             "candidate_id": current_user["id"]
-        })
-        
-        if not saved_job:
+        }):
             raise HTTPException(status_code=404, detail="Saved job not found or does not belong to you")
         
         # Only allow updating notes field
@@ -1875,15 +2159,12 @@ async def update_saved_job(
             raise HTTPException(status_code=500, detail="Failed to update saved job")
         
         # Get updated saved job
-        updated_saved_job = await Database.get_collection(SAVED_JOBS_COLLECTION).find_one({"id": saved_job_id})
+        updated_saved_job = await Repository.find_one(SAVED_JOBS_COLLECTION, {"id": saved_job_id}, DETAIL_VIEW)
         if not updated_saved_job:
             raise HTTPException(status_code=404, detail="Saved job not found after update")
         
-        # Remove MongoDB's _id
-        updated_saved_job.pop("_id", None)
-        
         # Get job details
-        job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": updated_saved_job["job_id"]})
+        job = await Repository.find_one(JOBS_COLLECTION, {"id": updated_saved_job["job_id"]}, SUMMARY_VIEW)
         if job:
             updated_saved_job["job_details"] = {
                 "title": job.get("title"),
@@ -1903,17 +2184,17 @@ async def get_stored_recommendations(current_user: dict = Depends(get_current_us
     try:
         if current_user["user_type"] == UserType.CANDIDATE:
             # For candidates, get job and project recommendations
-            recommendations = await Database.get_collection(RECOMMENDATIONS_COLLECTION).find({
+            recommendations = await Repository.find(RECOMMENDATIONS_COLLECTION, {
                 "candidate_id": current_user["id"],
                 "type": {"$in": ["job_recommendation", "project_recommendation"]}
-            }).to_list(length=None)
+            }, DETAIL_VIEW)
             
-            # Enrich recommendations with details
+            # Enrich recommendations with details, read in one query per collection
+            jobs = await Repository.find_by_ids(JOBS_COLLECTION, [rec.get("job_id") for rec in recommendations if rec["type"] == "job_recommendation"], SUMMARY_VIEW)
+            projects = await Repository.find_by_ids(PROJECTS_COLLECTION, [rec.get("project_id") for rec in recommendations if rec["type"] == "project_recommendation"], SUMMARY_VIEW)
             for rec in recommendations:
-                rec.pop("_id", None)
-                
                 if rec["type"] == "job_recommendation" and "job_id" in rec:
-                    job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": rec["job_id"]})
+                    job = jobs.get(rec["job_id"])
                     if job:
                         rec["job_details"] = {
                             "title": job.get("title", ""),
@@ -1923,7 +2204,7 @@ async def get_stored_recommendations(current_user: dict = Depends(get_current_us
                         }
                 
                 elif rec["type"] == "project_recommendation" and "project_id" in rec:
-                    project = await Database.get_collection(PROJECTS_COLLECTION).find_one({"id": rec["project_id"]})
+                    project = projects.get(rec["project_id"])
                     if project:
                         rec["project_details"] = {
                             "title": project.get("title", ""),
@@ -1935,17 +2216,18 @@ async def get_stored_recommendations(current_user: dict = Depends(get_current_us
             
         elif current_user["user_type"] == UserType.EMPLOYER:
             # For employers, get candidate recommendations for their jobs and projects
-            recommendations = await Database.get_collection(RECOMMENDATIONS_COLLECTION).find({
+            recommendations = await Repository.find(RECOMMENDATIONS_COLLECTION, {
                 "employer_id": current_user["id"],
                 "type": {"$in": ["candidate_recommendation", "project_candidate_recommendation"]}
-            }).to_list(length=None)
+            }, DETAIL_VIEW)
             
-            # Enrich recommendations with details
+            # Enrich recommendations with details, read in one query per collection
+            candidates = await Repository.find_by_ids(CANDIDATES_COLLECTION, [rec.get("candidate_id") for rec in recommendations], SUMMARY_VIEW)
+            jobs = await Repository.find_by_ids(JOBS_COLLECTION, [rec.get("job_id") for rec in recommendations if rec["type"] == "candidate_recommendation"], SUMMARY_VIEW)
+            projects = await Repository.find_by_ids(PROJECTS_COLLECTION, [rec.get("project_id") for rec in recommendations if rec["type"] == "project_candidate_recommendation"], SUMMARY_VIEW)
             for rec in recommendations:
-                rec.pop("_id", None)
-                
                 if "candidate_id" in rec:
-                    candidate = await Database.get_collection(CANDIDATES_COLLECTION).find_one({"id": rec["candidate_id"]})
+                    candidate = candidates.get(rec["candidate_id"])
                     if candidate:
                         rec["candidate_details"] = {
                             "full_name": candidate.get("full_name", ""),
@@ -1955,14 +2237,14 @@ async def get_stored_recommendations(current_user: dict = Depends(get_current_us
                         }
                 
                 if rec["type"] == "candidate_recommendation" and "job_id" in rec:
-                    job = await Database.get_collection(JOBS_COLLECTION).find_one({"id": rec["job_id"]})
+                    job = jobs.get(rec["job_id"])
                     if job:
                         rec["job_details"] = {
                             "title": job.get("title", "")
                         }
                 
                 elif rec["type"] == "project_candidate_recommendation" and "project_id" in rec:
-                    project = await Database.get_collection(PROJECTS_COLLECTION).find_one({"id": rec["project_id"]})
+                    project = projects.get(rec["project_id"])
                     if project:
                         rec["project_details"] = {
                             "title": project.get("title", "")
@@ -1981,6 +2263,46 @@ async def get_stored_recommendations(current_user: dict = Depends(get_current_us
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Failed to retrieve recommendations: {str(e)}")
 
+@app.get("/recommendations/{recommendation_id}/explanation", response_model=dict)
+async def get_recommendation_explanation(
+    recommendation_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Build the full explanation of a stored recommendation on demand"""
+    recommendation = await Repository.find_one(RECOMMENDATIONS_COLLECTION, {"id": recommendation_id}, DETAIL_VIEW)
+    if not recommendation:
+        raise HTTPException(status_code=404, detail="Recommendation not found")
+    
+    # Verify ownership based on user type
+    if current_user["user_type"] == UserType.CANDIDATE:
+        if recommendation.get("candidate_id") != current_user["id"]:
+            raise HTTPException(status_code=403, detail="You can only view explanations of your own recommendations")
+    elif current_user["user_type"] == UserType.EMPLOYER:
+        if recommendation.get("employer_id") != current_user["id"]:
+            raise HTTPException(status_code=403, detail="You can only view explanations of your own recommendations")
+    else:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    if recommendation.get("project_id"):
+        project = await recommendation_entity(PROJECTS_COLLECTION, recommendation["project_id"], {"id": recommendation["project_id"]})
+        job_info = project_as_job(project) if project else None
+    else:
+        job_info = await recommendation_entity(JOBS_COLLECTION, recommendation["job_id"], {"id": recommendation["job_id"]})
+    candidate = await recommendation_entity(CANDIDATES_COLLECTION, recommendation["candidate_id"], {"id": recommendation["candidate_id"]})
+    if not job_info or not candidate:
+        raise HTTPException(status_code=404, detail="The recommended job, project or candidate no longer exists")
+    
+    score = recommendation["match_score"]
+    matched_skills, missing_skills = split_skills(required_skill_names(job_info), candidate.get("skills"))
+    return {
+        "recommendation_id": recommendation_id,
+        "type": recommendation["type"],
+        "match_score": score,
+        "explanation": build_match_explanation(job_info, candidate, score),
+        "matched_skills": matched_skills,
+        "missing_skills": missing_skills,
+    }
+
 @app.patch("/recommendations/{recommendation_id}/viewed")
 async def mark_recommendation_as_viewed(
     recommendation_id: str,
@@ -1989,7 +2311,7 @@ async def mark_recommendation_as_viewed(
     """Mark a recommendation as viewed"""
     try:
         # Find the recommendation
-        recommendation = await Database.get_collection(RECOMMENDATIONS_COLLECTION).find_one({"id": recommendation_id})
+        recommendation = await Repository.find_one(RECOMMENDATIONS_COLLECTION, {"id": recommendation_id}, DETAIL_VIEW)
         if not recommendation:
             raise HTTPException(status_code=404, detail="Recommendation not found")
         
@@ -2020,6 +2342,24 @@ async def mark_recommendation_as_viewed(
         print(f"Error marking recommendation as viewed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/embeddings/cache/stats")
+async def get_embedding_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Get hit/miss counters for the embedding cache"""
+    return {
+        **EmbeddingCache.stats(),
+        "client": EmbeddingClient.stats(),
+        "queue": EmbeddingQueue.stats(),
+        "vector_index": VectorIndexes.stats(),
+        "ann_index": AnnIndexes.stats(),
+    }
+
+@app.post("/embeddings/retry-failed")
+async def retry_failed_embeddings(collection: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Queue dead-lettered documents for embedding again"""
+    if collection is not None and collection not in TEXT_BUILDERS:
+        raise HTTPException(status_code=400, detail=f"Unknown collection: {collection}")
+    return {"reset": await EmbeddingQueue.retry_failed(collection)}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,325 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# The generators behind bulk_job_posting.py; populate_sample_jobs.py is not
+# imported because it connects to MongoDB at import time
+from bulk_job_posting import generate_job_data, job_titles, technologies, locations, experience_levels, employment_types
+from utils import ann_index, vector_search
+from utils.ann_index import AnnIndex, AnnIndexes, faiss
+from utils.database import JOBS_COLLECTION, CANDIDATES_COLLECTION
+from utils.embedding_providers import LocalHashingEmbeddingProvider
+from utils.embedding_queue import TEXT_BUILDERS
+from utils.scoring import normalize_vector, select_top_k
+from utils.vector_index import VectorIndex, VectorIndexes, INDEXED_COLLECTIONS
+from utils.vector_search import LocalVectorSearch, FaissVectorSearch
+
+BENCHMARK_BACKENDS = ["local", "faiss-hnsw", "faiss-ivfpq"]
+BENCHMARK_COLLECTIONS = [JOBS_COLLECTION, CANDIDATES_COLLECTION]
+# Documents embedded per call while building a catalog
+EMBED_CHUNK_SIZE = 10000
+# Untimed queries run before each backend is measured
+WARMUP_QUERIES = 10
+
+educations = [
+    "BSc Computer Science", "MSc Computer Science", "BEng Software Engineering", "MSc Data Science",
+    "PhD Machine Learning", "BA Design", "MBA", "Coding Bootcamp", "Self-taught"
+]
+
+# Extra equality condition of the "filtered" workload, drawn per query
+FILTER_FIELDS = {
+    JOBS_COLLECTION: ("employment_type", employment_types),
+    CANDIDATES_COLLECTION: ("location", locations),
+}
+
+
+def generate_candidate_data(number):
+    """Generate random candidate data from the same vocabulary as the jobs"""
+    level = random.choice(experience_levels)
+    title = random.choice(job_titles)
+    skills = random.sample(technologies, random.randint(3, 8))
+    return {
+        "full_name": f"Candidate {number}",
+        "skills": skills,
+        "experience": f"{level} {title} with {random.randint(0, 20)} years of experience",
+        "education": random.choice(educations),
+        "location": random.choice(locations),
+        "bio": f"{title} working with {', '.join(skills[:3])}.",
+    }
+
+
+def generate_documents(collection_name, size, seed):
+    """Deterministic synthetic documents of a collection, all eligible for its resident index"""
+    random.seed(f"{seed}:{collection_name}")
+    docs = []
+    for number in range(size):
+        doc = generate_job_data() if collection_name == JOBS_COLLECTION else generate_candidate_data(number)
+        doc.update(INDEXED_COLLECTIONS[collection_name])
+        doc["id"] = f"{collection_name}-{number:07d}"
+        docs.append(doc)
+    return docs
+
+
+def generate_queries(collection_name, count, seed):
+    """Deterministic query texts and filter values: candidates searching jobs, employers searching candidates"""
+    random.seed(f"{seed}:{collection_name}:queries")
+    field, values = FILTER_FIELDS[collection_name]
+    queries = []
+    for _ in range(count):
+        if collection_name == JOBS_COLLECTION:
+            text = f"{random.choice(experience_levels)} {random.choice(job_titles)} {' '.join(random.sample(technologies, 3))}"
+        else:
+            job = generate_job_data()
+            text = f"{job['title']} {' '.join(job['requirements'])}"
+        queries.append((text, {field: random.choice(values)}))
+    return queries
+
+
+def rss_bytes():
+    """Resident set size of this process (peak size where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def build_catalog(collection_name, size, seed, provider):
+    """Embed a synthetic catalog into a resident vector index, timing generation, embedding and indexing"""
+    started = time.perf_counter()
+    docs = generate_documents(collection_name, size, seed)
+    generate_seconds = time.perf_counter() - started
+
+    build_text = TEXT_BUILDERS[collection_name]
+    index = VectorIndex(collection_name, INDEXED_COLLECTIONS[collection_name], capacity=size)
+    rss_before = rss_bytes()
+    embed_seconds = build_seconds = 0.0
+    for start in range(0, size, EMBED_CHUNK_SIZE):
+        chunk = docs[start:start + EMBED_CHUNK_SIZE]
+        started = time.perf_counter()
+        matrix = provider.embed_matrix([build_text(doc) for doc in chunk])
+        embed_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        for doc, vector in zip(chunk, matrix):
+            doc["embedding"] = vector
+            index.upsert(doc)
+            del doc["embedding"]
+        build_seconds += time.perf_counter() - started
+    rss_delta = rss_bytes() - rss_before
+
+    dataset = {
+        "collection": collection_name,
+        "size": size,
+        "generate_seconds": round(generate_seconds, 3),
+        "embed_seconds": round(embed_seconds, 3),
+        "with_vectors": index.stats()["with_vectors"],
+    }
+    build = {"build_seconds": build_seconds, "index_bytes": int(index.matrix.nbytes), "rss_delta_bytes": rss_delta}
+    return index, dataset, build
+
+
+def exact_neighbours(index, query, filter_query, top_k) -> Tuple[List[str], float]:
+    """Ids of the exact top_k and the k-th best cosine, which ties can also reach"""
+    docs, scores = index.search(query, index.filter_mask(filter_query))
+    rows = select_top_k(scores, top_k)
+    if not len(rows):
+        return [], float("inf")
+    return [docs[row]["id"] for row in rows], float(scores[rows[-1]]) / 100.0
+
+
+async def build_backend(name, collection_name, index, directory) -> Tuple[Optional[Any], Dict[str, Any]]:
+    """Instantiate a backend over the resident index, building its FAISS index if it has one"""
+    if name == "local":
+        return LocalVectorSearch(), {}
+    if faiss is None:
+        print(f"Skipping {name}: faiss is not installed (pip install faiss-cpu)")
+        return None, {}
+
+    ann = AnnIndex(collection_name, index_type=name.split("-", 1)[1], directory=directory)
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    ann.reconcile()
+    await ann.snapshot()
+    build_seconds = time.perf_counter() - started
+    AnnIndexes.indexes[collection_name] = ann
+    return FaissVectorSearch(), {
+        "build_seconds": build_seconds,
+        "index_bytes": os.path.getsize(os.path.join(directory, ann.base_file)),
+        "rss_delta_bytes": rss_bytes() - rss_before,
+        "index_kind": ann.base_kind,
+    }
+
+
+async def measure(backend, index, queries, filters, top_k) -> Dict[str, Any]:
+    """Latency, throughput and recall@k of one backend over a workload, run one query at a time"""
+    collection_name = index.collection_name
+    for vector, filter_query in list(zip(queries, filters))[:WARMUP_QUERIES]:
+        await backend.search(collection_name, vector, top_k, filter_query)
+
+    latencies, recalls = [], []
+    for vector, filter_query in zip(queries, filters):
+        started = time.perf_counter()
+        results = await backend.search(collection_name, vector, top_k, filter_query)
+        latencies.append(time.perf_counter() - started)
+
+        expected, threshold = exact_neighbours(index, vector, filter_query, top_k)
+        if not expected:
+            continue
+        query = normalize_vector(vector)
+        hits = sum(
+            1 for result in results
+            if index.vector(result["id"]) is not None and float(index.vector(result["id"]) @ query) >= threshold - 1e-6
+        )
+        recalls.append(min(hits, len(expected)) / len(expected))
+
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        "queries": len(latencies),
+        "qps": round(len(latencies) / sum(latencies), 2) if latencies else 0.0,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "recall": round(float(np.mean(recalls)), 4) if recalls else None,
+    }
+
+
+async def benchmark(args) -> Dict[str, Any]:
+    provider = LocalHashingEmbeddingProvider(args.dimensions)
+    report = {
+        "benchmark": "vector_search",
+        "created_at": datetime.utcnow().isoformat(),
+        "seed": args.seed,
+        "dimensions": args.dimensions,
+        "top_k": args.top_k,
+        "queries": args.queries,
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "faiss": getattr(faiss, "__version__", None),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parameters": {
+            "ANN_HNSW_M": ann_index.ANN_HNSW_M,
+            "ANN_HNSW_EF_CONSTRUCTION": ann_index.ANN_HNSW_EF_CONSTRUCTION,
+            "ANN_HNSW_EF_SEARCH": ann_index.ANN_HNSW_EF_SEARCH,
+            "ANN_IVF_NLIST": ann_index.ANN_IVF_NLIST,
+            "ANN_IVF_NPROBE": ann_index.ANN_IVF_NPROBE,
+            "ANN_PQ_M": ann_index.ANN_PQ_M,
+            "ANN_PQ_NBITS": ann_index.ANN_PQ_NBITS,
+            "ANN_FILTER_OVERFETCH": vector_search.ANN_FILTER_OVERFETCH,
+        },
+        "datasets": [],
+        "results": [],
+    }
+
+    for collection_name in args.collections:
+        queries = generate_queries(collection_name, args.queries, args.seed)
+        vectors = provider.embed_matrix([text for text, _ in queries])
+        vectors = [vector.tolist() for vector in vectors]
+        index_query = INDEXED_COLLECTIONS[collection_name]
+        workloads = {
+            "unfiltered": [dict(index_query) for _ in queries],
+            "filtered": [dict(index_query, **condition) for _, condition in queries],
+        }
+
+        for size in args.sizes:
+            print(f"Building {size} {collection_name} with {args.dimensions}-dimensional local embeddings...")
+            index, dataset, resident_build = build_catalog(collection_name, size, args.seed, provider)
+            report["datasets"].append(dataset)
+            VectorIndexes.indexes = {collection_name: index}
+
+            with tempfile.TemporaryDirectory(prefix="ann_benchmark_") as directory:
+                for name in args.backends:
+                    backend, build = await build_backend(name, collection_name, index, directory)
+                    if backend is None:
+                        continue
+                    build = build or resident_build
+                    for workload, filters in workloads.items():
+                        result = {
+                            "collection": collection_name,
+                            "size": size,
+                            "backend": name,
+                            "workload": workload,
+                            "build_seconds": round(build["build_seconds"], 3),
+                            "index_bytes": build["index_bytes"],
+                            "rss_delta_bytes": build["rss_delta_bytes"],
+                        }
+                        if "index_kind" in build:
+                            result["index_kind"] = build["index_kind"]
+                        result.update(await measure(backend, index, vectors, filters, args.top_k))
+                        report["results"].append(result)
+                        print(f"  {name:12} {workload:10} recall@{args.top_k} {result['recall']}  "
+                              f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  {result['qps']} qps")
+                    AnnIndexes.indexes = {}
+
+            VectorIndexes.indexes = {}
+            del index
+            gc.collect()
+    return report
+
+
+def compare(report, baseline, recall_tolerance, latency_tolerance) -> List[str]:
+    """Describe every result that got worse than the matching baseline result"""
+    for setting in ("seed", "dimensions", "top_k", "queries"):
+        if baseline.get(setting) != report[setting]:
+            print(f"Warning: the baseline was run with {setting}={baseline.get(setting)}, this run with {report[setting]}")
+    key =lambda result: (result["collection"], result["size"], result["backend"], result["workload"])
+    previous = {key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        label = "/".join(str(part) for part in key(result))
+        if old.get("recall") is not None and result.get("recall") is not None and result["recall"] < old["recall"] - recall_tolerance:
+            regressions.append(f"{label}: recall {old['recall']} -> {result['recall']}")
+        for metric in ("p50_ms", "p99_ms"):
+            if result[metric] > old[metric] * (1 + latency_tolerance):
+                regressions.append(f"{label}: {metric} {old[metric]} -> {result[metric]}")
+        if result["qps"] < old["qps"] / (1 + latency_tolerance):
+            regressions.append(f"{label}: qps {old['qps']} -> {result['qps']}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the vector search backends on deterministic synthetic catalogs")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000], help="Catalog sizes, e.g. 10000 100000 1000000")
+    parser.add_argument("--collections", nargs="+", choices=BENCHMARK_COLLECTIONS, default=BENCHMARK_COLLECTIONS)
+    parser.add_argument("--backends", nargs="+", choices=BENCHMARK_BACKENDS, default=BENCHMARK_BACKENDS)
+    parser.add_argument("--dimensions", type=int, default=384, help="Embedding dimensions (production uses EMBEDDING_DIMENSIONS, 3072)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per workload")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json", help="Where the JSON report is written")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against; exits with status 1 on regressions")
+    parser.add_argument("--recall-tolerance", type=float, default=0.01, help="Allowed absolute drop in recall")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25, help="Allowed relative increase in latency")
+    args = parser.parse_args()
+
+    report = asyncio.run(benchmark(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(report['results'])} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.recall_tolerance, args.latency_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
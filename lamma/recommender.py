@@ -1,14 +1,16 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+def _skill_keys(skills) -> Dict[str, str]:
+    """Normalized skill name -> original spelling"""
+    return {" ".join(str(skill).split()).lower(): skill for skill in skills or []}
 
 class RecommenderSystem:
     def __init__(self):
         pass
 
-    def _generate_explanation(self, candidate_info: Dict, job_info: Dict, match_score: float) -> str:
-        candidate_skills = set(candidate_info.get('skills', []))
-        job_requirements = set(job_info.get('requirements', []))
-        common_skills = candidate_skills.intersection(job_requirements)
-        
+    def _generate_explanation(self, common_skills: List[str], match_score: float) -> str:
         if match_score > 70:
             return f"Strong match! Candidate has {len(common_skills)} matching skills: {', '.join(common_skills)}"
         elif match_score > 40:
@@ -16,24 +18,34 @@ class RecommenderSystem:
         else:
             return f"Low match. Candidate has {len(common_skills)} matching skills: {', '.join(common_skills)}"
 
-    def get_candidate_job_match(self, candidate_info: Dict, job_info: Dict) -> Tuple[float, str]:
-        # Use simple skill matching
-        candidate_skills = set(candidate_info.get('skills', []))
-        job_requirements = set(job_info.get('requirements', []))
-        common_skills = candidate_skills.intersection(job_requirements)
-        
+    def get_candidate_job_match(self, candidate_info: Dict, job_info: Dict,
+                                candidate_skills: Optional[Dict[str, str]] = None,
+                                job_requirements: Optional[Dict[str, str]] = None) -> Tuple[float, str]:
+        # Use simple skill matching. The side that stays the same across a
+        # batch passes its normalized skills in, so they are built only once.
+        if candidate_skills is None:
+            candidate_skills = _skill_keys(candidate_info.get('skills', []))
+        if job_requirements is None:
+            job_requirements = _skill_keys(job_info.get('requirements', []))
+        common_skills = [skill for key, skill in job_requirements.items() if key in candidate_skills]
+
         if not job_requirements:
             match_percentage = 0
+        elif candidate_info.get('skill_ids') is not None and job_info.get('skill_ids') is not None:
+            # Documents stored with vocabulary ids are compared as sorted integer arrays
+            common_count = len(np.intersect1d(candidate_info['skill_ids'], job_info['skill_ids'], assume_unique=True))
+            match_percentage = round(common_count / max(1, len(job_info['skill_ids'])) * 100, 2)
         else:
             match_percentage = round(len(common_skills) / len(job_requirements) * 100, 2)
         
-        explanation = self._generate_explanation(candidate_info, job_info, match_percentage)
+        explanation = self._generate_explanation(common_skills, match_percentage)
         return match_percentage, explanation
 
     def get_job_candidate_matches(self, job_info: Dict, candidates: List[Dict]) -> List[Dict]:
+        job_requirements = _skill_keys(job_info.get('requirements', []))
         matches = []
         for candidate in candidates:
-            match_score, explanation = self.get_candidate_job_match(candidate, job_info)
+            match_score, explanation = self.get_candidate_job_match(candidate, job_info, job_requirements=job_requirements)
             matches.append({
                 "candidate_id": str(candidate["_id"]),  # Convert ObjectId to string
                 "match_score": match_score,
@@ -43,13 +55,14 @@ class RecommenderSystem:
         return sorted(matches, key=lambda x: x["match_score"], reverse=True)
 
     def get_candidate_job_matches(self, candidate_info: Dict, jobs: List[Dict]) -> List[Dict]:
+        candidate_skills = _skill_keys(candidate_info.get('skills', []))
         matches = []
         for job in jobs:
-            match_score, explanation = self.get_candidate_job_match(candidate_info, job)
+            match_score, explanation = self.get_candidate_job_match(candidate_info, job, candidate_skills=candidate_skills)
             matches.append({
                 "job_id": job["id"],
                 "match_score": match_score,
                 "explanation": explanation
             })
         
-        return sorted(matches, key=lambda x: x["match_score"], reverse=True) 
\ No newline at end of file
+        return sorted(matches, key=lambda x: x["match_score"], reverse=True)
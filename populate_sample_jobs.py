@@ -7,6 +7,10 @@ import uuid
 import json
 from bson import ObjectId
 
+from utils.embedding_providers import embed_texts_sync_with_model
+from utils.embedding_queue import EmbeddingQueue
+from utils.searchable_text import build_job_text
+
 # Load environment variables
 load_dotenv()
 
@@ -16,10 +20,6 @@ JOBS_COLLECTION = "jobs"
 USERS_COLLECTION = "users"
 EMPLOYERS_COLLECTION = "employers"
 
-# Ollama endpoint for embeddings
-OLLAMA_ENDPOINT = os.getenv("OLLAMA_ENDPOINT", "http://localhost:11434/api/embeddings")
-OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:latest")
-
 # Connect to MongoDB
 client = MongoClient(MONGODB_URI)
 db = client[DB_NAME]
@@ -27,33 +27,6 @@ jobs_collection = db[JOBS_COLLECTION]
 users_collection = db[USERS_COLLECTION]
 employers_collection = db[EMPLOYERS_COLLECTION]
 
-def get_embedding(text: str) -> list:
-    """Get embedding from Ollama API"""
-    try:
-        response = requests.post(
-            OLLAMA_ENDPOINT,
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": text
-            }
-        )
-        
-        if response.status_code != 200:
-            print(f"Error from Ollama API: {response.status_code}")
-            print(response.text)
-            return []
-            
-        data = response.json()
-        return data['embedding']
-    except Exception as e:
-        print(f"Error getting embedding: {e}")
-        return []
-
-def create_job_embedding(job_data):
-    """Create a searchable text from job data and get its embedding"""
-    searchable_text = f"{job_data.get('title', '')} {job_data.get('company', '')} {job_data.get('description', '')} {' '.join(job_data.get('requirements', []))} {job_data.get('location', '')}"
-    return get_embedding(searchable_text)
-
 def create_sample_jobs(employer_id=None):
     """Create sample jobs for testing"""
     
@@ -189,11 +162,19 @@ def create_sample_jobs(employer_id=None):
         }
     ]
     
-    # Add unique ID and embeddings to each job
-    for job in sample_jobs:
+    # Embed all jobs in one batch with the configured provider (EMBEDDING_PROVIDER)
+    print(f"Creating embeddings for {len(sample_jobs)} jobs")
+    texts = [build_job_text(job) for job in sample_jobs]
+    embeddings, model = embed_texts_sync_with_model(texts)
+    
+    # Add unique ID and embeddings to each job, with the same embedding
+    # fields the embedding queue writes
+    for job, text, embedding in zip(sample_jobs, texts, embeddings):
         job["_id"] = ObjectId()
-        print(f"Creating embedding for job: {job['title']}")
-        job["embedding"] = create_job_embedding(job)
+        if embedding:
+            job.update(EmbeddingQueue.ready_fields(text, embedding, model))
+        else:
+            job.update(EmbeddingQueue.pending_fields(text))
         
         # Insert job
         jobs_collection.insert_one(job)
@@ -0,0 +1,113 @@
+import asyncio
+import os
+
+# Small vectors keep the index definition and the documents readable
+os.environ["EMBEDDING_DIMENSIONS"] = "8"
+
+import numpy as np
+from mongomock_motor import AsyncMongoMockClient
+
+from utils.atlas_vector_search import (
+    VECTOR_SEARCH_CANDIDATES_PER_RESULT, VECTOR_SEARCH_MAX_CANDIDATES,
+    num_candidates, split_filter, vector_search_pipeline
+)
+from utils.vector_codec import encode_embedding
+from utils.vector_search_double import VectorSearchDouble
+
+DIMENSIONS = 8
+QUERY = [1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+
+
+def unit(index):
+    vector = [0.0] * DIMENSIONS
+    vector[index] = 1.0
+    return vector
+
+
+def jobs_double(docs):
+    collection = AsyncMongoMockClient()["job_recommender"]["jobs"]
+    asyncio.run(collection.insert_many(docs))
+    return VectorSearchDouble(collection)
+
+
+def search(double, top_k, filter_query=None, selectivity=1.0):
+    pipeline = vector_search_pipeline("jobs", QUERY, top_k, filter_query, selectivity)
+    return asyncio.run(double.aggregate(pipeline).to_list(length=top_k))
+
+
+def sample_jobs():
+    return [
+        {"title": "exact", "is_active": True, "employer_id": "a", "job_type": "full-time", "embedding": QUERY},
+        {"title": "close", "is_active": True, "employer_id": "b", "job_type": "contract", "embedding": [1.0, 1.0] + [0.0] * 6},
+        {"title": "opposite", "is_active": True, "employer_id": "a", "job_type": "full-time", "embedding": [-1.0] + [0.0] * 7},
+        {"title": "inactive", "is_active": False, "employer_id": "a", "job_type": "full-time", "embedding": QUERY},
+        {"title": "orthogonal", "is_active": True, "employer_id": "b", "job_type": "full-time", "embedding": unit(3)},
+    ]
+
+
+def test_indexed_filter_fields_are_pushed_down():
+    prefilter, residual = split_filter("jobs", {"is_active": True, "employer_id": {"$in": ["a", "b"]}})
+    assert prefilter == {"$and": [{"is_active": {"$eq": True}}, {"employer_id": {"$in": ["a", "b"]}}]}
+    assert residual == {}
+
+    search_stage = vector_search_pipeline("jobs", QUERY, 3, {"is_active": True})[0]["$vectorSearch"]
+    assert search_stage["filter"] == {"is_active": {"$eq": True}}
+    assert search_stage["index"] == "jobs_vector_index"
+    assert search_stage["limit"] == 3
+
+
+def test_leftover_filters_go_to_a_match():
+    prefilter, residual = split_filter("jobs", {"is_active": True, "job_type": "full-time", "employer_id": {"$regex": "^a"}})
+    assert prefilter == {"is_active": {"$eq": True}}
+    assert residual == {"job_type": "full-time", "employer_id": {"$regex": "^a"}}
+
+    pipeline = vector_search_pipeline("jobs", QUERY, 2, {"is_active": True, "job_type": "full-time"})
+    search_stage = pipeline[0]["$vectorSearch"]
+    # The search returns its whole candidate pool so the $match can still fill the page
+    assert search_stage["limit"] == search_stage["numCandidates"]
+    assert pipeline[1:3] == [{"$match": {"job_type": "full-time"}}, {"$limit": 2}]
+
+
+def test_num_candidates_grows_as_the_filter_narrows():
+    assert num_candidates(5) == 5 * VECTOR_SEARCH_CANDIDATES_PER_RESULT
+    narrowing = [num_candidates(5, selectivity) for selectivity in (1.0, 0.5, 0.1, 0.01)]
+    assert narrowing == sorted(narrowing) and len(set(narrowing)) == len(narrowing)
+    assert num_candidates(5, 1e-9) == VECTOR_SEARCH_MAX_CANDIDATES
+    assert num_candidates(VECTOR_SEARCH_MAX_CANDIDATES) == VECTOR_SEARCH_MAX_CANDIDATES
+
+
+def test_search_applies_prefilter_and_match_through_the_double():
+    double = jobs_double(sample_jobs())
+
+    results = search(double, 10, {"is_active": True})
+    assert [doc["title"] for doc in results] == ["exact", "close", "orthogonal", "opposite"]
+
+    results = search(double, 10, {"is_active": True, "job_type": "full-time"})
+    assert [doc["title"] for doc in results] == ["exact", "orthogonal", "opposite"]
+
+    results = search(double, 1, {"is_active": True, "employer_id": "b"})
+    assert [doc["title"] for doc in results] == ["close"]
+
+
+def test_scores_are_on_the_zero_to_one_scale():
+    results = search(jobs_double(sample_jobs()), 10, {"is_active": True})
+    scores = {doc["title"]: doc["score"] for doc in results}
+    assert scores["exact"] == 1.0
+    assert scores["orthogonal"] == 0.5
+    assert scores["opposite"] == 0.0
+    assert np.isclose(scores["close"], (1 + 1 / np.sqrt(2)) / 2)
+
+
+def test_results_come_without_embedding_or_id():
+    for doc in search(jobs_double(sample_jobs()), 10, {"is_active": True, "job_type": "full-time"}):
+        assert "embedding" not in doc
+        assert "_id" not in doc
+
+
+def test_packed_embeddings_are_not_indexed():
+    docs = sample_jobs()[:1] + [
+        {"title": "float16", "is_active": True, "embedding": encode_embedding(QUERY, "float16")},
+        {"title": "int8", "is_active": True, "embedding": encode_embedding(QUERY, "int8")},
+    ]
+    results = search(jobs_double(docs), 10, {"is_active": True})
+    assert [doc["title"] for doc in results] == ["exact"]
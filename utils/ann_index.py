@@ -0,0 +1,512 @@
+import asyncio
+import fcntl
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.scoring import normalize_vector, select_top_k
+from utils.vector_index import VectorIndexes
+
+try:
+    import faiss
+except ImportError:  # optional: pip install faiss-cpu
+    faiss = None
+
+# Keep FAISS approximate nearest-neighbour indexes next to the resident
+# vector indexes (used by VECTOR_SEARCH_BACKEND=faiss)
+ANN_INDEX_ENABLED = os.getenv("ANN_INDEX_ENABLED", "false").lower() == "true"
+# "hnsw" (graph, best recall per millisecond, vectors kept uncompressed) or
+# "ivfpq" (inverted lists over product-quantized codes, far smaller)
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "hnsw").lower()
+# Where snapshots are written and loaded from at startup
+ANN_INDEX_DIR = os.getenv("ANN_INDEX_DIR", "ann_indexes")
+# How often changed indexes are snapshotted to disk
+ANN_SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("ANN_SNAPSHOT_INTERVAL_SECONDS", "300"))
+# Memory-map snapshots instead of reading them into memory, so workers on
+# one host share the page cache and start without copying the index
+ANN_INDEX_MMAP = os.getenv("ANN_INDEX_MMAP", "true").lower() == "true"
+# Vectors added since the last snapshot are searched exactly; snapshot early
+# once there are this many
+ANN_DELTA_MAX_SIZE = int(os.getenv("ANN_DELTA_MAX_SIZE", "50000"))
+# Rebuild the snapshot instead of merging into it once this fraction of its
+# vectors belong to removed or re-embedded documents
+ANN_COMPACT_RATIO = float(os.getenv("ANN_COMPACT_RATIO", "0.2"))
+
+# HNSW: graph degree, build-time and query-time beam widths
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+ANN_HNSW_EF_CONSTRUCTION = int(os.getenv("ANN_HNSW_EF_CONSTRUCTION", "200"))
+ANN_HNSW_EF_SEARCH = int(os.getenv("ANN_HNSW_EF_SEARCH", "128"))
+# IVF-PQ: inverted lists (0 picks 4 * sqrt(n)), lists probed per query,
+# PQ sub-quantizers and bits per code
+ANN_IVF_NLIST = int(os.getenv("ANN_IVF_NLIST", "0"))
+ANN_IVF_NPROBE = int(os.getenv("ANN_IVF_NPROBE", "16"))
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", "64"))
+ANN_PQ_NBITS = int(os.getenv("ANN_PQ_NBITS", "8"))
+# Below this many vectors IVF-PQ cannot be trained well and a flat
+# (exact) index is snapshotted instead; training uses at most this sample
+ANN_IVF_MIN_TRAIN = int(os.getenv("ANN_IVF_MIN_TRAIN", "10000"))
+ANN_IVF_TRAIN_SIZE = int(os.getenv("ANN_IVF_TRAIN_SIZE", "100000"))
+
+
+def _pq_subquantizers(dimensions: int) -> int:
+    """Largest number of PQ sub-quantizers up to ANN_PQ_M that divides the dimensions"""
+    return next(m for m in range(min(ANN_PQ_M, dimensions), 0, -1) if dimensions % m == 0)
+
+
+def build_faiss_index(kind: str, labels: np.ndarray, matrix: np.ndarray):
+    """A FAISS index of normalized vectors under int64 labels, scored by inner product (cosine)"""
+    n, dimensions = matrix.shape
+    if kind == "hnsw":
+        inner = faiss.IndexHNSWFlat(dimensions, ANN_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        inner.hnsw.efConstruction = ANN_HNSW_EF_CONSTRUCTION
+    elif kind == "ivfpq":
+        nlist = ANN_IVF_NLIST or int(4 * np.sqrt(n))
+        nlist = max(1, min(nlist, n // 39))
+        inner = faiss.IndexIVFPQ(faiss.IndexFlatIP(dimensions), dimensions, nlist,
+                                 _pq_subquantizers(dimensions), ANN_PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        sample = matrix
+        if n > ANN_IVF_TRAIN_SIZE:
+            sample = matrix[np.random.default_rng(0).choice(n, ANN_IVF_TRAIN_SIZE, replace=False)]
+        inner.train(np.ascontiguousarray(sample))
+    else:
+        inner = faiss.IndexFlatIP(dimensions)
+    # IVF indexes store the labels themselves; IndexIDMap assumes removals
+    # renumber the inner index, which only holds for the others
+    index = inner if kind == "ivfpq" else faiss.IndexIDMap(inner)
+    if n:
+        index.add_with_ids(np.ascontiguousarray(matrix), labels.astype(np.int64))
+    return index
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+class AnnIndex:
+    """Approximate nearest-neighbour index over one collection's vectors.
+
+    Documents get sequential int64 labels (``labels`` / ``ids`` map them to
+    document ids). The bulk of the vectors sit in ``base``, a FAISS
+    ``IndexIDMap`` over HNSW or IVF-PQ loaded from the last snapshot, which
+    is never written to in place (it is usually memory-mapped). Vectors
+    added since then live in a small exact ``delta`` searched alongside it,
+    and base vectors of removed or re-embedded documents are tombstoned in
+    ``deleted`` and skipped with an ID selector at query time.
+
+    ``snapshot`` folds the delta and tombstones into a new base in a worker
+    thread (merging into the old one, or rebuilding from the resident
+    vector index once tombstones pile up), writes it next to a JSON
+    manifest of the labels and swaps it in. Only files this process wrote
+    are ever deleted, and the one before the current base is kept so other
+    workers can still load it.
+    """
+
+    def __init__(self, collection_name: str, index_type: str = ANN_INDEX_TYPE, directory: str = ANN_INDEX_DIR):
+        self.collection_name = collection_name
+        self.index_type = index_type
+        self.directory = directory
+        self.dimensions: Optional[int] = None
+        self.base = None
+        self.base_kind: Optional[str] = None
+        self.base_file: Optional[str] = None
+        self.base_size = 0
+        self.labels: Dict[str, int] = {}
+        self.ids: Dict[int, str] = {}
+        self.deleted: Set[int] = set()
+        self.delta: Dict[int, np.ndarray] = {}
+        self.next_label = 0
+        self.generation = 0
+        self.saved_at: Optional[datetime] = None
+        self.manifest_mtime: Optional[int] = None
+        self.dirty = False
+        # Snapshot files written by this process, oldest first
+        self.written: List[str] = []
+        # Labels dropped while a snapshot is being built
+        self.pending_limit: Optional[int] = None
+        self.dropped: Set[int] = set()
+        self._delta_cache: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._params = None
+        self._selector = None
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, f"{self.collection_name}.json")
+
+    def _drop(self, label: int):
+        self.ids.pop(label, None)
+        if self.delta.pop(label, None) is not None:
+            self._delta_cache = None
+        else:
+            self.deleted.add(label)
+            self._params = None
+        if self.pending_limit is not None and label < self.pending_limit:
+            self.dropped.add(label)
+        self.dirty = True
+
+    def update(self, doc_id: str, vector: Optional[Any]):
+        """Index a document's new vector, or remove it when ``vector`` is None"""
+        label = self.labels.pop(doc_id, None)
+        if label is not None:
+            self._drop(label)
+        vector = normalize_vector(vector) if vector is not None else None
+        if vector is None:
+            return
+        if self.dimensions is None:
+            self.dimensions = len(vector)
+        elif len(vector) != self.dimensions:
+            print(f"Skipping {self.collection_name}/{doc_id} in the ANN index: {len(vector)} dimensions, expected {self.dimensions}")
+            return
+        label = self.next_label
+        self.next_label += 1
+        self.labels[doc_id] = label
+        self.ids[label] = doc_id
+        self.delta[label] = vector
+        self._delta_cache = None
+        self.dirty = True
+
+    def _search_params(self):
+        """Query-time knobs and the tombstone selector, rebuilt when tombstones change"""
+        if self._params is None:
+            arguments = {}
+            if self.deleted:
+                batch = faiss.IDSelectorBatch(np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted)))
+                # The selector only holds a pointer to the batch; keep both alive
+                self._selector = (batch, faiss.IDSelectorNot(batch))
+                arguments["sel"] = self._selector[1]
+            if self.base_kind == "hnsw":
+                self._params = faiss.SearchParametersHNSW(efSearch=ANN_HNSW_EF_SEARCH, **arguments)
+            elif self.base_kind == "ivfpq":
+                self._params = faiss.SearchParametersIVF(nprobe=ANN_IVF_NPROBE, **arguments)
+            else:
+                self._params = faiss.SearchParameters(**arguments)
+        return self._params
+
+    def _delta_matrix(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._delta_cache is None:
+            labels = np.fromiter(self.delta, dtype=np.int64, count=len(self.delta))
+            matrix = np.stack(list(self.delta.values())) if self.delta else np.zeros((0, self.dimensions or 0), dtype=np.float32)
+            self._delta_cache = (labels, matrix)
+        return self._delta_cache
+
+    def search(self, query_vector: Any, k: int) -> Tuple[List[str], np.ndarray]:
+        """Ids of (approximately) the ``k`` nearest documents and their cosine similarities, best first"""
+        query = normalize_vector(query_vector)
+        if query is None or query.shape[0] != self.dimensions or k <= 0:
+            return [], np.zeros(0, dtype=np.float32)
+        labels, scores = [], []
+        if self.base is not None and self.base.ntotal:
+            distances, found = self.base.search(query[None, :], min(k, self.base.ntotal), params=self._search_params())
+            keep = found[0] >= 0
+            labels.append(found[0][keep])
+            scores.append(distances[0][keep])
+        if self.delta:
+            delta_labels, matrix = self._delta_matrix()
+            delta_scores = matrix @ query
+            rows = select_top_k(delta_scores, k)
+            labels.append(delta_labels[rows])
+            scores.append(delta_scores[rows])
+        if not labels:
+            return [], np.zeros(0, dtype=np.float32)
+        labels, scores = np.concatenate(labels), np.concatenate(scores).astype(np.float32)
+        rows = select_top_k(scores, k)
+        ids = [self.ids.get(int(label)) for label in labels[rows]]
+        live = [i for i, doc_id in enumerate(ids) if doc_id is not None]
+        return [ids[i] for i in live], scores[rows][live]
+
+    def reconcile(self, since: Optional[datetime] = None):
+        """Bring the index in line with the resident vector index.
+
+        Documents missing here, or whose embedding changed after ``since``
+        (the snapshot time), are (re)indexed from the resident vectors;
+        documents no longer there are removed. Nothing is read from MongoDB.
+        """
+        index = VectorIndexes.indexes.get(self.collection_name)
+        if index is None:
+            return
+        seen = set()
+        for doc in index.documents():
+            doc_id = doc["id"]
+            vector = index.vector(doc_id)
+            if vector is None:
+                if doc_id in self.labels:
+                    self.update(doc_id, None)
+                continue
+            seen.add(doc_id)
+            updated_at = doc.get("embedding_updated_at")
+            changed = since is not None and isinstance(updated_at, datetime) and updated_at.replace(tzinfo=None) > since
+            if doc_id not in self.labels or changed:
+                self.update(doc_id, vector)
+        for doc_id in [doc_id for doc_id in self.labels if doc_id not in seen]:
+            self.update(doc_id, None)
+
+    def snapshot_changed(self) -> bool:
+        """Whether another process wrote a snapshot since this one was loaded or written"""
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns != self.manifest_mtime
+        except OSError:
+            return False
+
+    def load(self) -> bool:
+        """Load the last snapshot, memory-mapped; False if there is none usable"""
+        try:
+            manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            path = os.path.join(self.directory, manifest["file"])
+            if manifest["kind"] not in (self.index_type, "flat"):
+                print(f"ANN snapshot of {self.collection_name} is {manifest['kind']}, not {self.index_type}; rebuilding")
+                return False
+            flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if ANN_INDEX_MMAP else 0
+            base = faiss.read_index(path, flags)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Could not load the ANN snapshot of {self.collection_name}: {e}")
+            return False
+
+        self.base, self.base_kind, self.base_file = base, manifest["kind"], manifest["file"]
+        self.base_size = int(base.ntotal)
+        self.dimensions = manifest["dimensions"]
+        self.labels = {doc_id: int(label) for doc_id, label in manifest["labels"].items()}
+        self.ids = {label: doc_id for doc_id, label in self.labels.items()}
+        self.deleted = set(manifest["deleted"])
+        self.next_label = manifest["next_label"]
+        self.generation = manifest["generation"]
+        self.saved_at = datetime.fromisoformat(manifest["saved_at"])
+        self.manifest_mtime = manifest_mtime
+        self.delta, self._delta_cache = {}, None
+        self.dirty = False
+        self._params = None
+        print(f"Loaded the {self.base_kind} ANN snapshot of {self.collection_name} ({len(self)} vectors)")
+        return True
+
+    def _should_rebuild(self) -> bool:
+        if self.base is None or self.base_kind not in (self.index_type, "flat") or self.base.d != self.dimensions:
+            return True
+        if self.base_kind == "flat" and self.index_type == "ivfpq" and len(self) >= ANN_IVF_MIN_TRAIN:
+            return True
+        # The snapshot may have been removed by the worker that wrote it
+        if not os.path.exists(os.path.join(self.directory, self.base_file)):
+            return True
+        return len(self.deleted) > ANN_COMPACT_RATIO * max(self.base_size, 1)
+
+    def _build_kind(self, size: int) -> str:
+        if self.index_type == "ivfpq" and size < ANN_IVF_MIN_TRAIN:
+            return "flat"
+        return self.index_type
+
+    def _merge(self, kind: str, labels: np.ndarray, matrix: np.ndarray, removed: np.ndarray):
+        """Copy of the current base with the delta added and, where supported, tombstones removed"""
+        index = faiss.read_index(os.path.join(self.directory, self.base_file))
+        if len(removed) and kind != "hnsw":
+            index.remove_ids(removed)
+        if len(labels):
+            index.add_with_ids(np.ascontiguousarray(matrix), labels)
+        return index
+
+    async def snapshot(self):
+        """Fold the delta and tombstones into a new base, write it to disk and swap it in"""
+        if not self.dirty or self.pending_limit is not None:
+            return
+        self.pending_limit, self.dropped = self.next_label, set()
+        try:
+            if self._should_rebuild():
+                index = VectorIndexes.indexes.get(self.collection_name)
+                live = [(label, index.vector(doc_id) if index else None) for doc_id, label in self.labels.items()]
+                live = [(label, vector) for label, vector in live if vector is not None and len(vector) == self.dimensions]
+                labels = np.array([label for label, _ in live], dtype=np.int64)
+                matrix = np.stack([vector for _, vector in live]) if live else np.zeros((0, self.dimensions or 1), dtype=np.float32)
+                kind = self._build_kind(len(live))
+                new_base = await asyncio.to_thread(build_faiss_index, kind, labels, matrix)
+                retained: Set[int] = set()
+            else:
+                kind = self.base_kind
+                labels, matrix = self._delta_matrix()
+                removed = np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted))
+                # HNSW cannot remove vectors; their tombstones carry over
+                retained = set(self.deleted) if kind == "hnsw" else set()
+                new_base = await asyncio.to_thread(self._merge, kind, labels, matrix, removed)
+
+            self.generation += 1
+            file_name = f"{self.collection_name}.{os.getpid()}.{self.generation}.faiss"
+            path = os.path.join(self.directory, file_name)
+            os.makedirs(self.directory, exist_ok=True)
+            await asyncio.to_thread(faiss.write_index, new_base, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            if ANN_INDEX_MMAP:
+                new_base = await asyncio.to_thread(faiss.read_index, path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+            # Swap in, keeping whatever changed while the new base was built
+            limit = self.pending_limit
+            self.base, self.base_kind, self.base_file = new_base, kind, file_name
+            self.base_size = int(new_base.ntotal)
+            self.deleted = {label for label in retained | self.dropped if label < limit}
+            self.delta = {label: vector for label, vector in self.delta.items() if label >= limit}
+            self._delta_cache = None
+            self._params = None
+            self.saved_at = datetime.utcnow()
+            self.dirty = bool(self.delta or self.dropped)
+            manifest = {
+                "collection": self.collection_name,
+                "file": file_name,
+                "kind": kind,
+                "dimensions": self.dimensions,
+                "generation": self.generation,
+                "saved_at": self.saved_at.isoformat(),
+                "next_label": limit,
+                "labels": {doc_id: label for doc_id, label in self.labels.items() if label < limit},
+                "deleted": sorted(self.deleted),
+            }
+            await asyncio.to_thread(_write_json, self.manifest_path, manifest)
+            self.manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+            self.written.append(file_name)
+            # Keep the previous base for workers still loading it
+            while len(self.written) > 2:
+                try:
+                    os.remove(os.path.join(self.directory, self.written.pop(0)))
+                except OSError:
+                    pass
+            print(f"Snapshotted the {kind} ANN index of {self.collection_name} ({self.base_size} vectors) to {path}")
+        finally:
+            self.pending_limit, self.dropped = None, set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "type": self.base_kind or self.index_type,
+            "size": len(self),
+            "base_size": self.base_size,
+            "delta_size": len(self.delta),
+            "tombstones": len(self.deleted),
+            "generation": self.generation,
+            "saved_at": self.saved_at.isoformat() if self.saved_at else None,
+        }
+
+
+class AnnIndexes:
+    """FAISS indexes mirroring the resident vector indexes.
+
+    Started after ``VectorIndexes``: each collection loads its last snapshot
+    and catches up from the resident index, so boot never re-reads
+    embeddings from MongoDB and never rebuilds an index from scratch unless
+    there is no snapshot. Kept current through the vector index listeners
+    and snapshotted periodically.
+
+    When several workers share ``ANN_INDEX_DIR``, the one holding
+    ``snapshot.lock`` writes the snapshots; the others reload each new
+    snapshot and catch up from their resident index, which keeps their
+    deltas small. The lock is released when the process exits, so another
+    worker can take over.
+    """
+    indexes: Dict[str, AnnIndex] = {}
+    snapshotter: Optional[asyncio.Task] = None
+    lock_file = None
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return ANN_INDEX_ENABLED and faiss is not None
+
+    @classmethod
+    async def start(cls):
+        if not ANN_INDEX_ENABLED:
+            return
+        if faiss is None:
+            print("ANN_INDEX_ENABLED is set but faiss is not installed (pip install faiss-cpu); ANN search disabled")
+            return
+        cls.indexes = {}
+        for name in VectorIndexes.indexes:
+            index = AnnIndex(name)
+            loaded = index.load()
+            index.reconcile(index.saved_at if loaded else None)
+            cls.indexes[name] = index
+            print(f"ANN index for {name}: {len(index)} vectors, {len(index.delta)} since the last snapshot")
+        VectorIndexes.add_listener(cls.update, cls.reconcile)
+        cls.snapshotter = asyncio.create_task(cls._snapshot_loop())
+
+    @classmethod
+    async def stop(cls):
+        if cls.snapshotter:
+            cls.snapshotter.cancel()
+            await asyncio.gather(cls.snapshotter, return_exceptions=True)
+            cls.snapshotter = None
+        # A final snapshot means the next boot has nothing to catch up on
+        if cls.acquire_snapshotter():
+            await cls.snapshot_all()
+        cls.release_snapshotter()
+
+    @classmethod
+    def acquire_snapshotter(cls) -> bool:
+        if cls.lock_file is not None:
+            return True
+        os.makedirs(ANN_INDEX_DIR, exist_ok=True)
+        lock_file = open(os.path.join(ANN_INDEX_DIR, "snapshot.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        cls.lock_file = lock_file
+        return True
+
+    @classmethod
+    def release_snapshotter(cls):
+        if cls.lock_file is not None:
+            cls.lock_file.close()
+            cls.lock_file = None
+
+    @classmethod
+    def get(cls, collection_name: str) -> Optional[AnnIndex]:
+        return cls.indexes.get(collection_name)
+
+    @classmethod
+    def update(cls, collection_name: str, doc_id: str, vector: Optional[np.ndarray]):
+        index = cls.indexes.get(collection_name)
+        if index is not None:
+            index.update(doc_id, vector)
+
+    @classmethod
+    def reconcile(cls, collection_name: str):
+        index = cls.indexes.get(collection_name)
+        if index is not None:
+            index.reconcile(index.saved_at)
+
+    @classmethod
+    async def snapshot_all(cls):
+        for name, index in cls.indexes.items():
+            try:
+                await index.snapshot()
+            except Exception as e:
+                print(f"Error snapshotting the ANN index of {name}: {e}")
+
+    @classmethod
+    def reload_all(cls):
+        """Pick up snapshots written by the snapshotting worker"""
+        for name, index in cls.indexes.items():
+            if index.snapshot_changed() and index.load():
+                index.reconcile(index.saved_at)
+
+    @classmethod
+    async def _snapshot_loop(cls):
+        if cls.acquire_snapshotter():
+            await cls.snapshot_all()
+        elapsed = 0
+        while True:
+            await asyncio.sleep(5)
+            elapsed += 5
+            if not cls.acquire_snapshotter():
+                cls.reload_all()
+                continue
+            if elapsed >= ANN_SNAPSHOT_INTERVAL_SECONDS or any(len(index.delta) >= ANN_DELTA_MAX_SIZE for index in cls.indexes.values()):
+                elapsed = 0
+                await cls.snapshot_all()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {name: index.stats() for name, index in cls.indexes.items()}
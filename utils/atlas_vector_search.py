@@ -0,0 +1,92 @@
+import math
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from utils.create_vector_indexes import VECTOR_FILTER_FIELDS, vector_index_name
+
+# numCandidates per requested result for an unfiltered search; Atlas
+# recommends 10-20x the limit for good recall of its approximate search
+VECTOR_SEARCH_CANDIDATES_PER_RESULT = int(os.getenv("VECTOR_SEARCH_CANDIDATES_PER_RESULT", "20"))
+# Highest numCandidates (and limit) Atlas accepts
+VECTOR_SEARCH_MAX_CANDIDATES = 10000
+
+# What a $vectorSearch pre-filter can express
+FILTER_OPERATORS = {"$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin"}
+FILTER_TYPES = (bool, int, float, str, datetime, ObjectId)
+
+
+def _prefilterable(value: Any) -> bool:
+    if isinstance(value, FILTER_TYPES):
+        return True
+    if isinstance(value, dict):
+        return bool(value) and all(
+            operator in FILTER_OPERATORS and (
+                all(isinstance(item, FILTER_TYPES) for item in operand)
+                if operator in ("$in", "$nin") else isinstance(operand, FILTER_TYPES)
+            )
+            for operator, operand in value.items()
+        )
+    return False
+
+
+def split_filter(collection_name: str, filter_query: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Split a filter into the $vectorSearch pre-filter and what is left for a $match.
+
+    Conditions on fields indexed as filter fields are pushed down;
+    anything else (other fields, unsupported operators) stays behind.
+    """
+    indexed = set(VECTOR_FILTER_FIELDS.get(collection_name, []))
+    conditions, residual = [], {}
+    for field, value in (filter_query or {}).items():
+        if field in indexed and _prefilterable(value):
+            conditions.append({field: value if isinstance(value, dict) else {"$eq": value}})
+        else:
+            residual[field] = value
+    if not conditions:
+        return {}, residual
+    return (conditions[0] if len(conditions) == 1 else {"$and": conditions}), residual
+
+
+def num_candidates(limit: int, selectivity: float = 1.0) -> int:
+    """numCandidates for a search returning ``limit`` results.
+
+    Restrictive pre-filters lower the recall of the approximate search, so
+    the candidate pool grows as the fraction of documents passing the filter
+    (``selectivity``) shrinks, up to the Atlas maximum.
+    """
+    candidates = math.ceil(limit * VECTOR_SEARCH_CANDIDATES_PER_RESULT / max(selectivity, 1e-6))
+    return int(min(VECTOR_SEARCH_MAX_CANDIDATES, max(limit, candidates)))
+
+
+def vector_search_pipeline(collection_name: str, query_vector: List[float], top_k: int,
+                           filter_query: Optional[Dict[str, Any]] = None, selectivity: float = 1.0) -> List[Dict[str, Any]]:
+    """Aggregation pipeline for an Atlas $vectorSearch over a collection's embeddings.
+
+    Results carry their ``vectorSearchScore`` as ``score`` and come without
+    ``_id`` and the embedding. Conditions that cannot be pre-filtered are
+    applied after the search, which then returns its whole candidate pool
+    so the $match still leaves ``top_k`` results where possible.
+    """
+    prefilter, residual = split_filter(collection_name, filter_query)
+    limit = max(1, min(top_k, VECTOR_SEARCH_MAX_CANDIDATES))
+    candidates = num_candidates(limit, selectivity)
+    search = {
+        "index": vector_index_name(collection_name),
+        "path": "embedding",
+        "queryVector": [float(value) for value in query_vector],
+        "numCandidates": candidates,
+        "limit": candidates if residual else limit,
+    }
+    if prefilter:
+        search["filter"] = prefilter
+
+    pipeline = [{"$vectorSearch": search}]
+    if residual:
+        pipeline += [{"$match": residual}, {"$limit": limit}]
+    # An exclusion $project cannot add fields, so the score is set first
+    pipeline.append({"$addFields": {"score": {"$meta": "vectorSearchScore"}}})
+    pipeline.append({"$project": {"_id": 0, "embedding": 0}})
+    return pipeline
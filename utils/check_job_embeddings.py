@@ -106,7 +106,7 @@ def check_job_embeddings():
     
     if not vector_index_exists:
         print("❌ No vector index found in jobs collection")
-        print("   Run 'python create_vector_indexes.py' to create the required indexes")
+        print("   Run 'python utils/create_vector_indexes.py' to create the required indexes")
     
     client.close()
 
@@ -107,7 +107,7 @@ def check_project_embeddings():
     
     if not vector_index_exists:
         print("❌ No vector index found in projects collection")
-        print("   Run 'python create_vector_indexes.py' to create the required indexes")
+        print("   Run 'python utils/create_vector_indexes.py' to create the required indexes")
     
     # Show some projects that don't have embeddings (if any)
     if without_embedding_count > 0:
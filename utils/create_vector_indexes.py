@@ -1,5 +1,8 @@
+import argparse
+import json
 import os
 from pymongo import MongoClient
+from pymongo.errors import OperationFailure
 from dotenv import load_dotenv
 import time
 
@@ -13,8 +16,57 @@ JOBS_COLLECTION = "jobs"
 CANDIDATES_COLLECTION = "candidates"
 PROJECTS_COLLECTION = "projects"
 
-def create_vector_indexes():
+# Size of the stored embeddings; must match the embedding provider
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "3072"))
+
+# Fields indexed as "filter" next to the embedding, so $vectorSearch can
+# apply them as a pre-filter instead of a $match after the search
+VECTOR_FILTER_FIELDS = {
+    JOBS_COLLECTION: ["is_active", "employer_id"],
+    PROJECTS_COLLECTION: ["is_active", "status", "employer_id"],
+    CANDIDATES_COLLECTION: ["is_active", "profile_completed", "profile_visibility"],
+}
+
+def vector_index_name(collection_name):
+    return f"{collection_name}_vector_index"
+
+def vector_index_definition(collection_name, dimensions=EMBEDDING_DIMENSIONS):
+    """Atlas Vector Search index definition of a collection's embedding and filter fields"""
+    return {
+        "fields": [
+            {
+                "type": "vector",
+                "path": "embedding",
+                "numDimensions": dimensions,
+                "similarity": "cosine"
+            }
+        ] + [
+            {"type": "filter", "path": field}
+            for field in VECTOR_FILTER_FIELDS[collection_name]
+        ]
+    }
+
+def create_search_index(db, collection_name, dimensions):
+    """Create or update the vector search index of one collection"""
+    name = vector_index_name(collection_name)
+    definition = vector_index_definition(collection_name, dimensions)
+    existing = {index["name"] for index in db.command({"listSearchIndexes": collection_name}).get("cursor", {}).get("firstBatch", [])}
+    if name in existing:
+        db.command({"updateSearchIndex": collection_name, "name": name, "definition": definition})
+        print(f"Updated vector search index {name}")
+    else:
+        db.command({"createSearchIndexes": collection_name, "indexes": [{"name": name, "type": "vectorSearch", "definition": definition}]})
+        print(f"Created vector search index {name}")
+
+def create_vector_indexes(dimensions=EMBEDDING_DIMENSIONS, print_only=False):
     """Create vector indexes for all collections that need vector search"""
+    if print_only:
+        for collection_name in VECTOR_FILTER_FIELDS:
+            print(f"{vector_index_name(collection_name)}:")
+            print(json.dumps(vector_index_definition(collection_name, dimensions), indent=2))
+        return
+    
+    client = None
     try:
         # Connect to MongoDB
         client = MongoClient(MONGODB_URL)
@@ -22,32 +74,15 @@ def create_vector_indexes():
         
         print(f"Connected to MongoDB database: {DATABASE_NAME}")
         
-        # Create Atlas Search index for jobs collection
-        try:
-            # For Atlas Search, you need to use the Atlas UI or API to create indexes
-            # This is a placeholder to remind users to create the indexes manually
-            print(f"To create a vector search index for {JOBS_COLLECTION}, use the MongoDB Atlas UI:")
-            print("1. Go to the Atlas UI")
-            print("2. Select your cluster")
-            print("3. Go to the Search tab")
-            print("4. Create an index with the following JSON configuration:")
-            print("""
-            {
-              "mappings": {
-                "dynamic": false,
-                "fields": {
-                  "embedding": {
-                    "dimensions": 3072,
-                    "similarity": "cosine",
-                    "type": "vector"
-                  }
-                }
-              }
-            }
-            """)
-            print(f"Name the index: {JOBS_COLLECTION}_vector_index")
-        except Exception as e:
-            print(f"Error creating vector index for {JOBS_COLLECTION}: {str(e)}")
+        # Atlas Vector Search indexes, generated from VECTOR_FILTER_FIELDS
+        for collection_name in VECTOR_FILTER_FIELDS:
+            try:
+                create_search_index(db, collection_name, dimensions)
+            except OperationFailure as e:
+                # Search index commands only exist on Atlas; print the definition for the Atlas UI
+                print(f"Could not create the vector search index for {collection_name}: {str(e)}")
+                print(f"Create it in the Atlas UI (Atlas Vector Search, JSON editor) as {vector_index_name(collection_name)}:")
+                print(json.dumps(vector_index_definition(collection_name, dimensions), indent=2))
         
         # Create regular indexes for faster lookups
         try:
@@ -76,13 +111,18 @@ def create_vector_indexes():
             print(f"Error creating regular indexes for {PROJECTS_COLLECTION}: {str(e)}")
             
         print("\nRegular indexes created successfully")
-        print("\nFor vector search functionality, please create Atlas Search indexes manually using the MongoDB Atlas UI.")
-        print("Refer to the instructions above for each collection.")
+        print("\nVector search indexes build in the background; they answer queries once Atlas reports them READY.")
         
     except Exception as e:
         print(f"Error connecting to MongoDB: {str(e)}")
     finally:
-        client.close()
+        if client:
+            client.close()
 
 if __name__ == "__main__":
-    create_vector_indexes() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create the Atlas Vector Search and regular indexes")
+    parser.add_argument("--dimensions", type=int, default=EMBEDDING_DIMENSIONS, help="Embedding size to index")
+    parser.add_argument("--print", dest="print_only", action="store_true", help="Only print the vector index definitions")
+    args = parser.parse_args()
+    
+    create_vector_indexes(args.dimensions, args.print_only)
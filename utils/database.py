@@ -46,6 +46,19 @@ EMPLOYERS_COLLECTION = "employers"
 PROJECTS_COLLECTION = "projects"
 JOB_APPLICATIONS_COLLECTION = "job_applications"
 SAVED_JOBS_COLLECTION = "saved_jobs"
+EMBEDDING_CACHE_COLLECTION = "embedding_cache"
+EMBEDDING_DEAD_LETTERS_COLLECTION = "embedding_dead_letters"
+MATERIALIZED_RECOMMENDATIONS_COLLECTION = "materialized_recommendations"
+SKILLS_COLLECTION = "skills"
+
+# Fields read by utils/searchable_text.py, text-indexed so lexical searches
+# the resident indexes cannot answer are ranked by MongoDB's $text
+TEXT_INDEX_NAME = "searchable_text"
+TEXT_INDEX_FIELDS = {
+    JOBS_COLLECTION: ["title", "company", "description", "requirements", "location"],
+    PROJECTS_COLLECTION: ["title", "company", "description", "requirements", "skills_required", "project_type", "location"],
+    CANDIDATES_COLLECTION: ["full_name", "skills", "experience", "education", "location", "bio"],
+}
 
 async def init_db():
     """Initialize database by creating all required collections"""
@@ -64,7 +77,11 @@ async def init_db():
             EMPLOYERS_COLLECTION,
             PROJECTS_COLLECTION,
             JOB_APPLICATIONS_COLLECTION,
-            SAVED_JOBS_COLLECTION
+            SAVED_JOBS_COLLECTION,
+            EMBEDDING_CACHE_COLLECTION,
+            EMBEDDING_DEAD_LETTERS_COLLECTION,
+            MATERIALIZED_RECOMMENDATIONS_COLLECTION,
+            SKILLS_COLLECTION
         ]
         
         # Create collections if they don't exist
@@ -106,6 +123,44 @@ async def init_db():
         await db[SAVED_JOBS_COLLECTION].create_index("job_id")
         await db[SAVED_JOBS_COLLECTION].create_index([("candidate_id", 1), ("job_id", 1)], unique=True)
         
+        # Recommendations collection: one stored recommendation per match, upserted in bulk
+        try:
+            await db[RECOMMENDATIONS_COLLECTION].create_index(
+                [("type", 1), ("candidate_id", 1), ("job_id", 1), ("project_id", 1)],
+                unique=True
+            )
+        except Exception as e:
+            # Duplicates saved before the index existed have to be removed first
+            print(f"Could not create unique recommendations index: {e}")
+        await db[RECOMMENDATIONS_COLLECTION].create_index("id", unique=True)
+        
+        # Materialized recommendations: one precomputed ranking per entity and kind
+        await db[MATERIALIZED_RECOMMENDATIONS_COLLECTION].create_index([("kind", 1), ("entity_id", 1)], unique=True)
+        await db[MATERIALIZED_RECOMMENDATIONS_COLLECTION].create_index([("kind", 1), ("generation", 1)])
+        # Reverse index: which rankings contain a given job, project or candidate
+        await db[MATERIALIZED_RECOMMENDATIONS_COLLECTION].create_index([("kind", 1), ("items.id", 1)])
+        await db[MATERIALIZED_RECOMMENDATIONS_COLLECTION].create_index("entity_id")
+        
+        # Skill vocabulary: normalized skill name <-> integer id
+        await db[SKILLS_COLLECTION].create_index("name", unique=True)
+        await db[SKILLS_COLLECTION].create_index("id", unique=True)
+        
+        # Embedding cache collection
+        await db[EMBEDDING_CACHE_COLLECTION].create_index("key", unique=True)
+        
+        # Pending-embedding lookups used by the background embedding queue
+        await db[JOBS_COLLECTION].create_index("embedding_status")
+        await db[PROJECTS_COLLECTION].create_index("embedding_status")
+        await db[CANDIDATES_COLLECTION].create_index("embedding_status")
+        
+        # Text indexes for lexical search outside the resident indexes
+        for collection_name, fields in TEXT_INDEX_FIELDS.items():
+            try:
+                await db[collection_name].create_index([(field, "text") for field in fields], name=TEXT_INDEX_NAME)
+            except Exception as e:
+                # A collection holds at most one text index; an existing one has to be dropped first
+                print(f"Could not create text index on {collection_name}: {e}")
+        
         print("All indexes created successfully")
         
     except Exception as e:
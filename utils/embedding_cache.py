@@ -0,0 +1,135 @@
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pymongo import UpdateOne
+
+from utils.database import Database, EMBEDDING_CACHE_COLLECTION
+from utils.vector_codec import decode_embedding, encode_embedding
+
+# Number of vectors kept in the in-process LRU tier
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2000"))
+# Set to "false" to disable the shared MongoDB tier
+EMBEDDING_CACHE_PERSISTENT = os.getenv("EMBEDDING_CACHE_PERSISTENT", "true").lower() == "true"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse runs of whitespace so formatting-only differences share a cache entry"""
+    return _WHITESPACE_RE.sub(" ", text or "").strip()
+
+
+def cache_key(model: str, text: str) -> str:
+    """Content address of an embedding: hash of the model name and normalized text"""
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache keyed by ``cache_key(model, text)``.
+
+    The first tier is an in-process LRU of float32 vectors; the second is the
+    ``embedding_cache`` MongoDB collection, shared by all workers and kept
+    across restarts. Hits in the persistent tier are promoted into the LRU.
+    """
+    memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+    memory_hits = 0
+    persistent_hits = 0
+    misses = 0
+
+    @classmethod
+    def _remember(cls, key: str, vector: np.ndarray):
+        cls.memory[key] = vector
+        cls.memory.move_to_end(key)
+        while len(cls.memory) > EMBEDDING_CACHE_SIZE:
+            cls.memory.popitem(last=False)
+
+    @classmethod
+    def _persistent_available(cls) -> bool:
+        return EMBEDDING_CACHE_PERSISTENT and Database.client is not None
+
+    @classmethod
+    def get_memory(cls, model: str, text: str) -> Optional[List[float]]:
+        """Check only the in-process tier; misses are not counted here"""
+        key = cache_key(model, text)
+        vector = cls.memory.get(key)
+        if vector is None:
+            return None
+        cls.memory.move_to_end(key)
+        cls.memory_hits += 1
+        return vector.tolist()
+
+    @classmethod
+    async def get_many(cls, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up cached vectors; entries are None on a miss"""
+        keys = [cache_key(model, text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+
+        for i, key in enumerate(keys):
+            vector = cls.memory.get(key)
+            if vector is not None:
+                cls.memory.move_to_end(key)
+                cls.memory_hits += 1
+                results[i] = vector.tolist()
+            else:
+                missing.setdefault(key, []).append(i)
+
+        if missing and cls._persistent_available():
+            try:
+                docs = await Database.get_collection(EMBEDDING_CACHE_COLLECTION).find(
+                    {"key": {"$in": list(missing.keys())}},
+                    {"_id": 0, "key": 1, "embedding": 1}
+                ).to_list(length=None)
+                for doc in docs:
+                    vector = decode_embedding(doc["embedding"])
+                    if vector is None:
+                        continue
+                    cls._remember(doc["key"], vector)
+                    for i in missing.pop(doc["key"], []):
+                        cls.persistent_hits += 1
+                        results[i] = vector.tolist()
+            except Exception as e:
+                print(f"Error reading embedding cache: {e}")
+
+        cls.misses += sum(len(positions) for positions in missing.values())
+        return results
+
+    @classmethod
+    async def put_many(cls, model: str, texts: List[str], vectors: List[List[float]]):
+        """Store freshly computed vectors in both tiers; empty vectors are skipped"""
+        operations = []
+        now = datetime.utcnow()
+        for text, vector in zip(texts, vectors):
+            if not vector:
+                continue
+            key = cache_key(model, text)
+            cls._remember(key, np.asarray(vector, dtype=np.float32))
+            operations.append(UpdateOne(
+                {"key": key},
+                {"$setOnInsert": {"key": key, "model": model, "embedding": encode_embedding(vector), "created_at": now}},
+                upsert=True
+            ))
+
+        if operations and cls._persistent_available():
+            try:
+                await Database.get_collection(EMBEDDING_CACHE_COLLECTION).bulk_write(operations, ordered=False)
+            except Exception as e:
+                print(f"Error writing embedding cache: {e}")
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        lookups = cls.memory_hits + cls.persistent_hits + cls.misses
+        hits = cls.memory_hits + cls.persistent_hits
+        return {
+            "memory_entries": len(cls.memory),
+            "memory_capacity": EMBEDDING_CACHE_SIZE,
+            "memory_hits": cls.memory_hits,
+            "persistent_hits": cls.persistent_hits,
+            "misses": cls.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Type
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Which provider embeds texts, and which one (if any) takes over when it is slow or failing
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "groq")
+EMBEDDING_FALLBACK_PROVIDER = os.getenv("EMBEDDING_FALLBACK_PROVIDER", "")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "3072"))
+
+# Groq API configuration
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_EMBEDDING_MODEL = os.getenv("GROQ_EMBEDDING_MODEL", "llama3-embed-8b")
+GROQ_API_BASE = os.getenv("GROQ_API_BASE", "https://api.groq.com/v1")
+
+# Ollama configuration
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_EMBEDDING_MODEL = os.getenv("OLLAMA_EMBEDDING_MODEL", "llama3.2:latest")
+
+# Connection pool limits shared by the HTTP providers
+EMBEDDING_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "10"))
+EMBEDDING_CONNECT_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_CONNECT_TIMEOUT_SECONDS", "3"))
+EMBEDDING_MAX_CONNECTIONS = int(os.getenv("EMBEDDING_MAX_CONNECTIONS", "20"))
+EMBEDDING_KEEPALIVE_SECONDS = float(os.getenv("EMBEDDING_KEEPALIVE_SECONDS", "60"))
+
+
+class EmbeddingProvider:
+    """Interface shared by all embedding backends.
+
+    ``model`` identifies the vector space the provider produces (it is part
+    of the embedding cache key), and ``embed_batch`` returns one vector per
+    input text, using [] for texts that could not be embedded.
+    """
+    name = "base"
+
+    @property
+    def model(self) -> str:
+        raise NotImplementedError
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def embed_batch(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class HTTPEmbeddingProvider(EmbeddingProvider):
+    """Base for providers reached over HTTP through a pooled keep-alive client"""
+    base_url = ""
+
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self.client is not None:
+            return
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(EMBEDDING_TIMEOUT_SECONDS, connect=EMBEDDING_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=EMBEDDING_MAX_CONNECTIONS,
+                max_keepalive_connections=EMBEDDING_MAX_CONNECTIONS,
+                keepalive_expiry=EMBEDDING_KEEPALIVE_SECONDS,
+            ),
+        )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+        self.client = None
+
+
+class GroqEmbeddingProvider(HTTPEmbeddingProvider):
+    name = "groq"
+    base_url = GROQ_API_BASE
+
+    @property
+    def model(self) -> str:
+        return GROQ_EMBEDDING_MODEL
+
+    async def embed_batch(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        try:
+            if not GROQ_API_KEY:
+                raise ValueError("GROQ_API_KEY environment variable is not set")
+
+            if self.client is None:
+                await self.start()
+
+            headers = {
+                "Authorization": f"Bearer {GROQ_API_KEY}",
+                "Content-Type": "application/json"
+            }
+
+            response = await self.client.post(
+                "/embeddings",
+                headers=headers,
+                json={
+                    "model": GROQ_EMBEDDING_MODEL,
+                    "input": texts
+                },
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
+
+            response.raise_for_status()
+            data = response.json()
+
+            # Extract embeddings from the response, ordered by input index
+            items = data.get("data") or []
+            if len(items) != len(texts) or not all("embedding" in item for item in items):
+                print("Unexpected response format from Groq API")
+                return [[] for _ in texts]
+            items = sorted(items, key=lambda item: item.get("index", 0))
+            return [item["embedding"] for item in items]
+        except Exception as e:
+            print(f"Error getting embeddings from Groq: {e}")
+            # Return empty embeddings in case of error
+            return [[] for _ in texts]
+
+
+class OllamaEmbeddingProvider(HTTPEmbeddingProvider):
+    name = "ollama"
+    base_url = OLLAMA_BASE_URL
+
+    @property
+    def model(self) -> str:
+        return f"ollama:{OLLAMA_EMBEDDING_MODEL}"
+
+    async def embed_batch(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        try:
+            if self.client is None:
+                await self.start()
+
+            response = await self.client.post(
+                "/api/embed",
+                json={
+                    "model": OLLAMA_EMBEDDING_MODEL,
+                    "input": texts
+                },
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
+
+            response.raise_for_status()
+            embeddings = response.json().get("embeddings") or []
+            if len(embeddings) != len(texts):
+                print("Unexpected response format from Ollama API")
+                return [[] for _ in texts]
+            return embeddings
+        except Exception as e:
+            print(f"Error getting embeddings from Ollama: {e}")
+            return [[] for _ in texts]
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+
+@lru_cache(maxsize=200000)
+def _hash_feature(feature: str, dimensions: int) -> Tuple[int, float]:
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dimensions, 1.0 if (digest >> 63) & 1 else -1.0
+
+
+class LocalHashingEmbeddingProvider(EmbeddingProvider):
+    """Zero-network embedder using signed feature hashing.
+
+    Lowercased word unigrams and bigrams are hashed into a fixed number of
+    dimensions with log-scaled term frequencies, and the result is L2
+    normalized, so texts sharing vocabulary have a high cosine similarity.
+    It is deterministic across processes and needs nothing but NumPy, which
+    makes it suitable for offline development, bulk loading and benchmarks.
+    """
+    name = "local"
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    @property
+    def model(self) -> str:
+        return f"local:hashing-{self.dimensions}"
+
+    def embed_one(self, text: str) -> np.ndarray:
+        tokens = [token.rstrip(".") for token in _TOKEN_RE.findall((text or "").lower())]
+        tokens = [token for token in tokens if token]
+        features = Counter(tokens)
+        features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in features.items():
+            index, sign = _hash_feature(feature, self.dimensions)
+            vector[index] += sign * (1.0 + math.log(count))
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        """Embed texts straight into a float32 matrix (used by bulk loaders and benchmarks)"""
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for i, text in enumerate(texts):
+            matrix[i] = self.embed_one(text)
+        return matrix
+
+    async def embed_batch(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        matrix = await asyncio.to_thread(self.embed_matrix, texts)
+        return [row.tolist() if row.any() else [] for row in matrix]
+
+
+EMBEDDING_PROVIDERS: Dict[str, Type[EmbeddingProvider]] = {
+    "groq": GroqEmbeddingProvider,
+    "ollama": OllamaEmbeddingProvider,
+    "local": LocalHashingEmbeddingProvider,
+}
+
+
+def create_provider(name: str) -> EmbeddingProvider:
+    """Instantiate a registered embedding provider by name"""
+    provider_class = EMBEDDING_PROVIDERS.get((name or "").lower())
+    if provider_class is None:
+        raise ValueError(f"Unknown embedding provider '{name}'. Available: {', '.join(EMBEDDING_PROVIDERS)}")
+    return provider_class()
+
+
+def embed_texts_sync(texts: List[str], provider_name: Optional[str] = None) -> List[List[float]]:
+    """Embed texts from synchronous scripts (bulk loaders, maintenance tools)"""
+    return embed_texts_sync_with_model(texts, provider_name)[0]
+
+
+def embed_texts_sync_with_model(texts: List[str], provider_name: Optional[str] = None) -> Tuple[List[List[float]], str]:
+    """Like ``embed_texts_sync``, also returning the model the vectors come from"""
+    provider = create_provider(provider_name or EMBEDDING_PROVIDER)
+
+    async def run():
+        await provider.start()
+        try:
+            return await provider.embed_batch(texts)
+        finally:
+            await provider.close()
+
+    return asyncio.run(run()), provider.model
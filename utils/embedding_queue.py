@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from utils.database import Database, JOBS_COLLECTION, PROJECTS_COLLECTION, CANDIDATES_COLLECTION, EMBEDDING_DEAD_LETTERS_COLLECTION
+from utils.embeddings import EmbeddingClient
+from utils.embedding_cache import normalize_text
+from utils.vector_codec import encode_embedding
+from utils.searchable_text import build_job_text, build_project_text, build_candidate_text
+
+EMBEDDING_QUEUE_SIZE = int(os.getenv("EMBEDDING_QUEUE_SIZE", "10000"))
+EMBEDDING_QUEUE_WORKERS = int(os.getenv("EMBEDDING_QUEUE_WORKERS", "4"))
+EMBEDDING_QUEUE_MAX_RETRIES = int(os.getenv("EMBEDDING_QUEUE_MAX_RETRIES", "3"))
+EMBEDDING_QUEUE_RETRY_DELAY_SECONDS = float(os.getenv("EMBEDDING_QUEUE_RETRY_DELAY_SECONDS", "2"))
+# How often documents left pending (e.g. because the queue was full) are swept up again
+EMBEDDING_BACKFILL_INTERVAL_SECONDS = float(os.getenv("EMBEDDING_BACKFILL_INTERVAL_SECONDS", "300"))
+
+# Searchable text builder for every collection that carries an embedding
+TEXT_BUILDERS = {
+    JOBS_COLLECTION: build_job_text,
+    PROJECTS_COLLECTION: build_project_text,
+    CANDIDATES_COLLECTION: build_candidate_text,
+}
+
+EMBEDDING_PENDING = "pending"
+EMBEDDING_READY = "ready"
+EMBEDDING_FAILED = "failed"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingQueue:
+    """In-process background queue that fills in document embeddings.
+
+    Write handlers persist documents immediately with
+    ``embedding_status: "pending"`` and the hash of their searchable text,
+    then enqueue the text here. Worker tasks embed it, retry failures with
+    exponential backoff, and record documents that still fail in the
+    ``embedding_dead_letters`` collection. Retries wait on a timer rather than
+    in a worker, so a provider outage never holds up the rest of the queue.
+    The vector is only written if the document's text hash is unchanged, so a
+    slow job can never overwrite the embedding of a newer edit.
+
+    Failed documents are left alone by the backfill sweep until their text
+    changes (write handlers reset them to pending) or ``retry_failed`` is
+    called.
+    """
+    queue: Optional[asyncio.Queue] = None
+    workers: List[asyncio.Task] = []
+    sweeper: Optional[asyncio.Task] = None
+    queued: Set[Tuple[str, str]] = set()
+    # Backoff timers of documents waiting to be retried
+    retries: Dict[Tuple[str, str, str], asyncio.TimerHandle] = {}
+    # Called with (collection_name, doc_id, vector) after an embedding is stored
+    listeners: List[Callable[[str, str, List[float]], None]] = []
+    processed = 0
+    failed = 0
+
+    @staticmethod
+    def pending_fields(text: str) -> Dict[str, Any]:
+        """Fields to store with a document whose embedding is still being computed"""
+        return {"embedding_status": EMBEDDING_PENDING, "embedding_text_hash": text_hash(text)}
+
+    @staticmethod
+    def ready_fields(text: str, vector: List[float], model: Optional[str]) -> Dict[str, Any]:
+        """Fields to store with a document once its embedding has been computed"""
+        return {
+            "embedding": encode_embedding(vector),
+            "embedding_model": model,
+            "embedding_status": EMBEDDING_READY,
+            "embedding_text_hash": text_hash(text),
+            "embedding_updated_at": datetime.utcnow()
+        }
+
+    @classmethod
+    def add_listener(cls, listener: Callable[[str, str, List[float]], None]):
+        if listener not in cls.listeners:
+            cls.listeners.append(listener)
+
+    @classmethod
+    async def start(cls):
+        if cls.queue is not None:
+            return
+        cls.queue = asyncio.Queue(maxsize=EMBEDDING_QUEUE_SIZE)
+        cls.workers = [asyncio.create_task(cls._worker()) for _ in range(EMBEDDING_QUEUE_WORKERS)]
+        cls.sweeper = asyncio.create_task(cls._sweep())
+
+    @classmethod
+    async def stop(cls):
+        for handle in cls.retries.values():
+            handle.cancel()
+        cls.retries.clear()
+        tasks = cls.workers + ([cls.sweeper] if cls.sweeper else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        cls.queue = None
+        cls.workers = []
+        cls.sweeper = None
+        cls.queued.clear()
+
+    @classmethod
+    def enqueue(cls, collection_name: str, doc_id: str, text: str) -> bool:
+        """Queue a document for embedding; returns False if it has to wait for the next sweep"""
+        if cls.queue is None:
+            print(f"Embedding queue not started; {collection_name}/{doc_id} left pending")
+            return False
+        key = (collection_name, doc_id)
+        try:
+            cls.queue.put_nowait((collection_name, doc_id, text, 0))
+        except asyncio.QueueFull:
+            print(f"Embedding queue full; {collection_name}/{doc_id} left pending for the next sweep")
+            return False
+        cls.queued.add(key)
+        return True
+
+    @classmethod
+    async def _worker(cls):
+        while True:
+            collection_name, doc_id, text, attempt = await cls.queue.get()
+            try:
+                await cls._process(collection_name, doc_id, text, attempt)
+            except Exception as e:
+                print(f"Error in embedding worker for {collection_name}/{doc_id}: {e}")
+                # Leave the document pending for the next sweep
+                cls.queued.discard((collection_name, doc_id))
+            finally:
+                cls.queue.task_done()
+
+    @classmethod
+    async def _process(cls, collection_name: str, doc_id: str, text: str, attempt: int):
+        vector, model = await EmbeddingClient.embed_with_model(text)
+
+        if not vector:
+            if attempt + 1 < EMBEDDING_QUEUE_MAX_RETRIES:
+                cls._schedule_retry(collection_name, doc_id, text, attempt + 1)
+                return
+            await cls._dead_letter(collection_name, doc_id, text, attempt + 1)
+            return
+
+        cls.queued.discard((collection_name, doc_id))
+        result = await Database.get_collection(collection_name).update_one(
+            {"id": doc_id, "embedding_text_hash": text_hash(text)},
+            {"$set": cls.ready_fields(text, vector, model)}
+        )
+        if result.matched_count == 0:
+            print(f"Skipped stale embedding for {collection_name}/{doc_id} (document changed or was deleted)")
+        else:
+            for listener in cls.listeners:
+                try:
+                    listener(collection_name, doc_id, vector)
+                except Exception as e:
+                    print(f"Error in embedding listener for {collection_name}/{doc_id}: {e}")
+        cls.processed += 1
+
+    @classmethod
+    def _schedule_retry(cls, collection_name: str, doc_id: str, text: str, attempt: int):
+        """Put the document back on the queue once its backoff delay has passed"""
+        delay = EMBEDDING_QUEUE_RETRY_DELAY_SECONDS * (2 ** (attempt - 1))
+        cls.retries[(collection_name, doc_id, text)] = asyncio.get_running_loop().call_later(
+            delay, cls._requeue, collection_name, doc_id, text, attempt
+        )
+
+    @classmethod
+    def _requeue(cls, collection_name: str, doc_id: str, text: str, attempt: int):
+        cls.retries.pop((collection_name, doc_id, text), None)
+        if cls.queue is None:
+            return
+        try:
+            cls.queue.put_nowait((collection_name, doc_id, text, attempt))
+        except asyncio.QueueFull:
+            # Leave the document pending; the next sweep will pick it up
+            cls.queued.discard((collection_name, doc_id))
+
+    @classmethod
+    async def _dead_letter(cls, collection_name: str, doc_id: str, text: str, attempts: int):
+        cls.queued.discard((collection_name, doc_id))
+        cls.failed += 1
+        print(f"Embedding failed for {collection_name}/{doc_id} after {attempts} attempts")
+        await Database.get_collection(collection_name).update_one(
+            {"id": doc_id, "embedding_text_hash": text_hash(text)},
+            {"$set": {"embedding_status": EMBEDDING_FAILED}}
+        )
+        await Database.get_collection(EMBEDDING_DEAD_LETTERS_COLLECTION).insert_one({
+            "collection": collection_name,
+            "doc_id": doc_id,
+            "embedding_text_hash": text_hash(text),
+            "attempts": attempts,
+            "failed_at": datetime.utcnow()
+        })
+
+    @classmethod
+    async def backfill(cls) -> int:
+        """Queue every document that is still pending, has no embedding, or
+        was embedded by another model than the primary (the fallback provider)
+        and the primary is answering again.
+
+        Dead-lettered documents are skipped; see ``retry_failed``.
+        """
+        queued = 0
+        stale = [
+            {"embedding_status": EMBEDDING_PENDING},
+            {"embedding": {"$exists": False}},
+            {"embedding": []}
+        ]
+        model = EmbeddingClient.model()
+        # Re-embedding during an outage would only store another fallback vector
+        if model and await EmbeddingClient.primary_available():
+            stale.append({"embedding_model": {"$exists": True, "$ne": model}})
+        for collection_name, build_text in TEXT_BUILDERS.items():
+            cursor = Database.get_collection(collection_name).find(
+                {"embedding_status": {"$ne": EMBEDDING_FAILED}, "$or": stale},
+                {"_id": 0, "embedding": 0}
+            )
+            async for doc in cursor:
+                doc_id = doc.get("id")
+                if not doc_id or (collection_name, doc_id) in cls.queued:
+                    continue
+                text = build_text(doc)
+                if doc.get("embedding_text_hash") != text_hash(text):
+                    await Database.get_collection(collection_name).update_one(
+                        {"id": doc_id},
+                        {"$set": cls.pending_fields(text)}
+                    )
+                if not cls.enqueue(collection_name, doc_id, text):
+                    return queued
+                queued += 1
+        if queued:
+            print(f"Queued {queued} documents for embedding backfill")
+        return queued
+
+    @classmethod
+    async def retry_failed(cls, collection_name: Optional[str] = None) -> int:
+        """Mark dead-lettered documents pending again and queue them"""
+        collection_names = [collection_name] if collection_name else list(TEXT_BUILDERS)
+        reset = 0
+        for name in collection_names:
+            result = await Database.get_collection(name).update_many(
+                {"embedding_status": EMBEDDING_FAILED},
+                {"$set": {"embedding_status": EMBEDDING_PENDING}}
+            )
+            reset += result.modified_count
+        if reset:
+            print(f"Reset {reset} failed embeddings to pending")
+            await cls.backfill()
+        return reset
+
+    @classmethod
+    async def _sweep(cls):
+        while True:
+            try:
+                await cls.backfill()
+            except Exception as e:
+                print(f"Error during embedding backfill: {e}")
+            await asyncio.sleep(EMBEDDING_BACKFILL_INTERVAL_SECONDS)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            "queued": cls.queue.qsize() if cls.queue else 0,
+            "in_flight_documents": len(cls.queued),
+            "waiting_to_retry": len(cls.retries),
+            "processed": cls.processed,
+            "failed": cls.failed,
+        }
@@ -0,0 +1,260 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from utils.embedding_cache import EmbeddingCache, normalize_text
+from utils.embedding_providers import EmbeddingProvider, EMBEDDING_PROVIDER, EMBEDDING_FALLBACK_PROVIDER, create_provider
+
+load_dotenv()
+
+# Request limits for the embedding client
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8"))
+# When a fallback provider is configured, the primary gets this long before it takes over
+EMBEDDING_FAILOVER_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_FAILOVER_TIMEOUT_SECONDS", "3"))
+
+# Micro-batching: texts arriving within the window are sent as one list-input request
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent single-text embedding requests into batched calls.
+
+    Callers await ``submit(text)``; texts are buffered until either the batch
+    window elapses or ``max_batch_size`` texts are waiting, then sent through
+    ``embed_many`` in one request and the results are handed back to each
+    waiting caller. Identical texts in the same batch are only sent once.
+    ``failed`` is handed back when the batch request raises.
+    """
+
+    def __init__(self, embed_many, window_ms: float = EMBEDDING_BATCH_WINDOW_MS, max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE, failed: Any = None):
+        self.embed_many = embed_many
+        self.failed = [] if failed is None else failed
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.pending: Dict[str, List[asyncio.Future]] = {}
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.tasks: Set[asyncio.Task] = set()
+        self.batches_sent = 0
+        self.texts_submitted = 0
+
+    async def submit(self, text: str) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.setdefault(text, []).append(future)
+        self.texts_submitted += 1
+
+        if len(self.pending) >= self.max_batch_size:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, {}
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _send(self, batch: Dict[str, List[asyncio.Future]]):
+        texts = list(batch.keys())
+        try:
+            vectors = await self.embed_many(texts)
+            self.batches_sent += 1
+        except Exception as e:
+            print(f"Error sending embedding batch of {len(texts)} texts: {e}")
+            vectors = [self.failed for _ in texts]
+
+        for text, vector in zip(texts, vectors):
+            for future in batch[text]:
+                if not future.done():
+                    future.set_result(vector)
+
+    async def close(self):
+        self._flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "texts_submitted": self.texts_submitted,
+            "batches_sent": self.batches_sent,
+            "pending": len(self.pending),
+        }
+
+
+class EmbeddingClient:
+    """Async embedding client used by the API handlers.
+
+    Texts are embedded by the provider selected with EMBEDDING_PROVIDER
+    (see ``utils.embedding_providers``); HTTP providers keep a pool of
+    keep-alive connections, and a semaphore caps the number of in-flight
+    embedding calls. Single-text requests go through an ``EmbeddingBatcher``
+    so concurrent callers share one list-input request, and only cache
+    misses reach the provider. If EMBEDDING_FALLBACK_PROVIDER is set, texts
+    the primary provider fails on or does not answer within
+    EMBEDDING_FAILOVER_TIMEOUT_SECONDS are embedded by the fallback instead.
+    Its vectors live in a different space, so ``embed_with_model`` and
+    ``embed_many_with_models`` report which model produced each one.
+    """
+    provider: Optional[EmbeddingProvider] = None
+    fallback: Optional[EmbeddingProvider] = None
+    semaphore: Optional[asyncio.Semaphore] = None
+    batcher: Optional[EmbeddingBatcher] = None
+    failovers = 0
+    # Set while the primary provider is failing, cleared by its next success
+    failing_over = False
+
+    @classmethod
+    async def start(cls):
+        if cls.provider is not None:
+            return
+        cls.provider = create_provider(EMBEDDING_PROVIDER)
+        await cls.provider.start()
+        if EMBEDDING_FALLBACK_PROVIDER and EMBEDDING_FALLBACK_PROVIDER != EMBEDDING_PROVIDER:
+            cls.fallback = create_provider(EMBEDDING_FALLBACK_PROVIDER)
+            await cls.fallback.start()
+        cls.semaphore = asyncio.Semaphore(EMBEDDING_MAX_CONCURRENCY)
+        if EMBEDDING_BATCH_MAX_SIZE > 1:
+            cls.batcher = EmbeddingBatcher(cls.embed_many_with_models, failed=([], None))
+        print(f"Embedding provider: {cls.provider.model}" + (f" (fallback: {cls.fallback.model})" if cls.fallback else ""))
+
+    @classmethod
+    async def close(cls):
+        if cls.batcher is not None:
+            await cls.batcher.close()
+        cls.batcher = None
+        for provider in (cls.provider, cls.fallback):
+            if provider is not None:
+                await provider.close()
+        cls.provider = None
+        cls.fallback = None
+        cls.semaphore = None
+
+    @classmethod
+    def model(cls) -> Optional[str]:
+        """The primary provider's model, which stored embeddings should come from"""
+        return cls.provider.model if cls.provider else None
+
+    @classmethod
+    async def primary_available(cls) -> bool:
+        """Whether the primary provider answers; asks it directly while failing over"""
+        if cls.failing_over and cls.provider is not None:
+            vectors = await cls._embed_with(cls.provider, ["health check"], None, True)
+            cls.failing_over = not vectors[0]
+        return not cls.failing_over
+
+    @classmethod
+    async def embed(cls, text: str) -> List[float]:
+        """Get the embedding for a single text, or [] if the call fails"""
+        vector, _ = await cls.embed_with_model(text)
+        return vector
+
+    @classmethod
+    async def embed_with_model(cls, text: str) -> Tuple[List[float], Optional[str]]:
+        """Get the embedding for a single text and the model that produced it ([], None on failure)"""
+        if cls.provider is None:
+            await cls.start()
+
+        text = normalize_text(text)
+        cached = EmbeddingCache.get_memory(cls.provider.model, text)
+        if cached is not None:
+            return cached, cls.provider.model
+
+        if cls.batcher is not None:
+            return await cls.batcher.submit(text)
+        results = await cls.embed_many_with_models([text])
+        return results[0]
+
+    @classmethod
+    async def embed_many(cls, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        """Get embeddings for several texts, only requesting cache misses.
+
+        Returns one vector per input text, in order; entries are [] if the
+        call fails. Misses are deduplicated and sent as list-input requests.
+        """
+        return [vector for vector, _ in await cls.embed_many_with_models(texts, timeout)]
+
+    @classmethod
+    async def embed_many_with_models(cls, texts: List[str], timeout: Optional[float] = None) -> List[Tuple[List[float], Optional[str]]]:
+        """Like ``embed_many``, pairing each vector with the model that produced it"""
+        if not texts:
+            return []
+        if cls.provider is None:
+            await cls.start()
+
+        texts = [normalize_text(text) for text in texts]
+        cached = await EmbeddingCache.get_many(cls.provider.model, texts)
+        results = [(vector, cls.provider.model) if vector is not None else None for vector in cached]
+
+        missing = list(dict.fromkeys(text for text, result in zip(texts, results) if result is None))
+        if missing:
+            fetched = await cls._fetch(missing, timeout)
+            by_text = dict(zip(missing, fetched))
+            results = [result if result is not None else by_text[text] for text, result in zip(texts, results)]
+
+        return results
+
+    @classmethod
+    async def _fetch(cls, texts: List[str], timeout: Optional[float] = None) -> List[Tuple[List[float], Optional[str]]]:
+        """Embed texts with the primary provider, failing over per text if configured"""
+        vectors = await cls._embed_with(cls.provider, texts, timeout, cls.fallback is not None)
+        await EmbeddingCache.put_many(cls.provider.model, texts, vectors)
+        results = [(vector, cls.provider.model if vector else None) for vector in vectors]
+
+        failed = [i for i, vector in enumerate(vectors) if not vector]
+        if len(failed) < len(vectors):
+            cls.failing_over = False
+        elif cls.fallback is not None:
+            cls.failing_over = True
+        if failed and cls.fallback is not None:
+            cls.failovers += 1
+            retry_texts = [texts[i] for i in failed]
+            cached = await EmbeddingCache.get_many(cls.fallback.model, retry_texts)
+            to_embed = [text for text, vector in zip(retry_texts, cached) if vector is None]
+            fresh = await cls._embed_with(cls.fallback, to_embed, timeout, False) if to_embed else []
+            await EmbeddingCache.put_many(cls.fallback.model, to_embed, fresh)
+            fresh_by_text = dict(zip(to_embed, fresh))
+            for i, text, vector in zip(failed, retry_texts, cached):
+                vector = vector if vector is not None else fresh_by_text[text]
+                results[i] = (vector, cls.fallback.model if vector else None)
+
+        return results
+
+    @classmethod
+    async def _embed_with(cls, provider: EmbeddingProvider, texts: List[str], timeout: Optional[float], bounded: bool) -> List[List[float]]:
+        """Send texts to one provider in chunks of at most EMBEDDING_BATCH_MAX_SIZE"""
+        chunk_size = max(1, EMBEDDING_BATCH_MAX_SIZE)
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+
+        async def request(chunk: List[str]) -> List[List[float]]:
+            async with cls.semaphore:
+                if not bounded:
+                    return await provider.embed_batch(chunk, timeout)
+                try:
+                    return await asyncio.wait_for(provider.embed_batch(chunk, timeout), EMBEDDING_FAILOVER_TIMEOUT_SECONDS)
+                except asyncio.TimeoutError:
+                    print(f"Embedding provider {provider.name} timed out after {EMBEDDING_FAILOVER_TIMEOUT_SECONDS}s")
+                    return [[] for _ in chunk]
+
+        results = await asyncio.gather(*(request(chunk) for chunk in chunks))
+        return [vector for chunk_vectors in results for vector in chunk_vectors]
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            "provider": cls.provider.model if cls.provider else None,
+            "fallback": cls.fallback.model if cls.fallback else None,
+            "failovers": cls.failovers,
+            "failing_over": cls.failing_over,
+            "batching": cls.batcher.stats() if cls.batcher else None,
+        }
@@ -0,0 +1,83 @@
+import math
+import os
+import re
+from typing import Dict, List
+
+import numpy as np
+
+# Okapi BM25 term frequency saturation and document length normalization
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Words, keeping the symbols of names like c++, c# or node.js
+_token = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return _token.findall(text.lower())
+
+
+class BM25Index:
+    """In-process BM25 index over the searchable text of vector index rows.
+
+    Postings map each term to ``{row: term frequency}``, with rows shared
+    with the owning ``VectorIndex`` so lexical and vector scores line up.
+    A query is scored by walking the posting lists of its terms only, with
+    the BM25 formula applied to each list as one numpy expression.
+    """
+
+    def __init__(self, capacity: int):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.row_terms: Dict[int, List[str]] = {}
+        self.lengths = np.zeros(capacity, dtype=np.float32)
+        self.total_length = 0
+        self.documents = 0
+
+    def grow(self, capacity: int):
+        self.lengths = np.concatenate([self.lengths, np.zeros(capacity - self.lengths.shape[0], dtype=np.float32)])
+
+    def add(self, row: int, text: str):
+        self.remove(row)
+        tokens = tokenize(text)
+        frequencies: Dict[str, int] = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for term, frequency in frequencies.items():
+            self.postings.setdefault(term, {})[row] = frequency
+        self.row_terms[row] = list(frequencies)
+        self.lengths[row] = len(tokens)
+        self.total_length += len(tokens)
+        self.documents += 1
+
+    def remove(self, row: int):
+        terms = self.row_terms.pop(row, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings[term]
+            del posting[row]
+            if not posting:
+                del self.postings[term]
+        self.total_length -= int(self.lengths[row])
+        self.lengths[row] = 0
+        self.documents -= 1
+
+    def scores(self, query: str, size: int) -> np.ndarray:
+        """BM25 score of the query for rows [0, size); 0 for rows without any query term"""
+        scores = np.zeros(size, dtype=np.float32)
+        if not self.documents:
+            return scores
+        average_length = self.total_length / self.documents or 1.0
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            rows = np.fromiter(posting.keys(), dtype=np.int64, count=len(posting))
+            frequencies = np.fromiter(posting.values(), dtype=np.float32, count=len(posting))
+            idf = math.log(1 + (self.documents - len(posting) + 0.5) / (len(posting) + 0.5))
+            normalization = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[rows] / average_length)
+            scores[rows] += idf * frequencies * (BM25_K1 + 1) / (frequencies + normalization)
+        return scores
+
+    def stats(self) -> Dict[str, int]:
+        return {"documents": self.documents, "terms": len(self.postings)}
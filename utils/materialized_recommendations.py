@@ -0,0 +1,159 @@
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pymongo import UpdateOne
+
+from utils.database import Database, MATERIALIZED_RECOMMENDATIONS_COLLECTION, JOBS_COLLECTION, PROJECTS_COLLECTION, CANDIDATES_COLLECTION
+
+# Number of ranked matches stored per entity
+MATERIALIZED_TOP_K = int(os.getenv("MATERIALIZED_TOP_K", "200"))
+# Stored rankings older than this are recomputed on the next request
+RECOMMENDATION_MAX_STALENESS_SECONDS = float(os.getenv("RECOMMENDATION_MAX_STALENESS_SECONDS", "3600"))
+
+# Each kind of recommendation ranks documents of one collection for an
+# entity of another: kind -> (entity collection, ranked collection)
+MATERIALIZED_KINDS: Dict[str, Tuple[str, str]] = {
+    "job_recommendation": (CANDIDATES_COLLECTION, JOBS_COLLECTION),
+    "project_recommendation": (CANDIDATES_COLLECTION, PROJECTS_COLLECTION),
+    "candidate_recommendation": (JOBS_COLLECTION, CANDIDATES_COLLECTION),
+    "project_candidate_recommendation": (PROJECTS_COLLECTION, CANDIDATES_COLLECTION),
+}
+
+# The generation counter lives in the same collection under this reserved kind
+GENERATION_KIND = "_generation"
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row top-k of a score block: (column indices, scores), best first.
+
+    Uses ``np.argpartition`` along each row so only k columns per row are
+    sorted; NaN scores sort last.
+    """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.zeros((scores.shape[0], 0), dtype=np.int64)
+        return empty, empty.astype(np.float32)
+    filled = np.where(np.isnan(scores), -np.inf, scores)
+    columns = np.argpartition(-filled, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(filled, columns, axis=1)
+    order = np.argsort(-top, axis=1, kind="stable")
+    return np.take_along_axis(columns, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+class MaterializedRecommendations:
+    """Precomputed top-k rankings stored one document per entity and kind.
+
+    Each document holds ``items`` (``{"id", "score", "method"}``, best
+    first), the time it was computed and the generation of the batch run
+    that wrote it. Requests read one page of it with a single indexed
+    ``find_one``; rankings older than ``RECOMMENDATION_MAX_STALENESS_SECONDS``
+    are treated as missing. A multikey index on ``items.id`` is the reverse
+    index used to find every ranking that contains a given document.
+    """
+
+    @classmethod
+    def collection(cls):
+        return Database.get_collection(MATERIALIZED_RECOMMENDATIONS_COLLECTION)
+
+    @classmethod
+    async def current_generation(cls) -> int:
+        doc = await cls.collection().find_one({"kind": GENERATION_KIND, "entity_id": GENERATION_KIND})
+        return doc["generation"] if doc else 0
+
+    @classmethod
+    async def page(cls, kind: str, entity_id: str, limit: int, offset: int = 0) -> Optional[List[Dict[str, Any]]]:
+        """One page of a stored ranking, or None if it is missing, stale or too short"""
+        doc = await cls.collection().find_one(
+            {"kind": kind, "entity_id": entity_id},
+            {"_id": 0, "computed_at": 1, "truncated": 1, "items": {"$slice": [offset, limit]}}
+        )
+        if not doc:
+            return None
+        if doc["computed_at"] < datetime.utcnow() - timedelta(seconds=RECOMMENDATION_MAX_STALENESS_SECONDS):
+            return None
+        items = doc.get("items", [])
+        # A cut-off ranking that cannot fill the page may be missing matches past its end
+        if doc.get("truncated") and len(items) < limit:
+            return None
+        return items
+
+    @classmethod
+    async def store(cls, kind: str, entity_id: str, items: List[Dict[str, Any]], generation: Optional[int] = None):
+        """Replace the stored ranking of one entity (used for on-demand refreshes)"""
+        if generation is None:
+            generation = await cls.current_generation()
+        await cls.collection().replace_one(
+            {"kind": kind, "entity_id": entity_id},
+            materialized_doc(kind, entity_id, items, generation),
+            upsert=True
+        )
+
+    @classmethod
+    async def ranked_kinds(cls, entity_id: str) -> List[str]:
+        """Kinds for which a ranking of this entity is stored"""
+        return await cls.collection().distinct("kind", {"entity_id": entity_id})
+
+    @classmethod
+    async def entities_containing(cls, kind: str, item_id: str) -> List[str]:
+        """Entities whose stored ranking contains the item (reverse index lookup)"""
+        docs = await cls.collection().find({"kind": kind, "items.id": item_id}, {"_id": 0, "entity_id": 1}).to_list(length=None)
+        return [doc["entity_id"] for doc in docs]
+
+    @classmethod
+    async def rerank_item(cls, kind: str, item_id: str, scores: Dict[str, float]) -> int:
+        """Move one item to its new score inside the stored rankings of the given entities.
+
+        The item is pulled and pushed back with ``$sort``/``$slice``, so it
+        drops out of rankings it no longer makes the top-k of and enters
+        those it now does. Entities without a stored ranking are untouched.
+        All updates go out in a single bulk write.
+        """
+        operations = []
+        for entity_id, score in scores.items():
+            operations.append(UpdateOne(
+                {"kind": kind, "entity_id": entity_id, "items.id": item_id},
+                {"$pull": {"items": {"id": item_id}}}
+            ))
+            operations.append(UpdateOne(
+                {"kind": kind, "entity_id": entity_id},
+                {"$push": {"items": {
+                    "$each": [{"id": item_id, "score": score, "method": "vector"}],
+                    "$sort": {"score": -1},
+                    "$slice": MATERIALIZED_TOP_K
+                }}}
+            ))
+        if not operations:
+            return 0
+        result = await cls.collection().bulk_write(operations, ordered=True)
+        return result.modified_count
+
+    @classmethod
+    async def remove_item(cls, kind: str, item_id: str) -> int:
+        """Drop an item that can no longer be recommended from every ranking of a kind"""
+        result = await cls.collection().update_many(
+            {"kind": kind, "items.id": item_id},
+            {"$pull": {"items": {"id": item_id}}}
+        )
+        return result.modified_count
+
+    @classmethod
+    async def remove_entity(cls, entity_id: str) -> int:
+        result = await cls.collection().delete_many({"entity_id": entity_id})
+        return result.deleted_count
+
+
+def materialized_doc(kind: str, entity_id: str, items: List[Dict[str, Any]], generation: int,
+                     computed_at: Optional[datetime] = None, top_k: int = MATERIALIZED_TOP_K) -> Dict[str, Any]:
+    """Stored form of one ranking; ``truncated`` marks rankings cut off at top_k"""
+    items = items[:top_k]
+    return {
+        "kind": kind,
+        "entity_id": entity_id,
+        "generation": generation,
+        "computed_at": computed_at or datetime.utcnow(),
+        "items": items,
+        "truncated": len(items) == top_k,
+    }
@@ -0,0 +1,72 @@
+import argparse
+from pymongo import MongoClient, UpdateOne
+
+from utils.database import MONGODB_URL, DATABASE_NAME, JOBS_COLLECTION, PROJECTS_COLLECTION, CANDIDATES_COLLECTION, EMBEDDING_CACHE_COLLECTION
+from utils.vector_codec import STORAGE_FORMATS, decode_embedding, encode_embedding, embedding_format
+
+BATCH_SIZE = 500
+
+def migrate_collection(db, collection_name, target_format, dry_run=False):
+    """Re-encode every stored embedding in a collection into the target format"""
+    collection = db[collection_name]
+    converted = 0
+    skipped = 0
+    operations = []
+    
+    cursor = collection.find({"embedding": {"$exists": True}}, {"_id": 1, "embedding": 1})
+    for doc in cursor:
+        current_format = embedding_format(doc.get("embedding"))
+        if current_format is None or current_format == target_format:
+            skipped += 1
+            continue
+        
+        vector = decode_embedding(doc["embedding"])
+        operations.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {"embedding": encode_embedding(vector, target_format)}}
+        ))
+        converted += 1
+        
+        if len(operations) >= BATCH_SIZE:
+            if not dry_run:
+                collection.bulk_write(operations, ordered=False)
+            operations = []
+    
+    if operations and not dry_run:
+        collection.bulk_write(operations, ordered=False)
+    
+    print(f"{collection_name}: converted {converted} embeddings to {target_format}, skipped {skipped}")
+    return converted
+
+def migrate_embeddings(target_format, collections, dry_run=False):
+    client = MongoClient(MONGODB_URL)
+    try:
+        db = client[DATABASE_NAME]
+        print(f"Connected to MongoDB database: {DATABASE_NAME}")
+        if dry_run:
+            print("Dry run: no documents will be modified")
+        
+        total = 0
+        for collection_name in collections:
+            total += migrate_collection(db, collection_name, target_format, dry_run)
+        print(f"\nConverted {total} embeddings in total")
+        
+        if target_format != "float":
+            print("\nNote: Atlas $vectorSearch only indexes float arrays. Set EMBEDDING_STORAGE_FORMAT")
+            print(f"to '{target_format}' for new documents and use a local vector search backend.")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert stored embeddings between float, float16 and int8 formats")
+    parser.add_argument("--format", choices=STORAGE_FORMATS, required=True, help="Target storage format")
+    parser.add_argument(
+        "--collections",
+        nargs="+",
+        default=[JOBS_COLLECTION, PROJECTS_COLLECTION, CANDIDATES_COLLECTION, EMBEDDING_CACHE_COLLECTION],
+        help="Collections to migrate"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be converted")
+    args = parser.parse_args()
+    
+    migrate_embeddings(args.format, args.collections, args.dry_run)
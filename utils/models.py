@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 from datetime import datetime
 from enum import Enum
 
@@ -153,6 +153,21 @@ class Recommendation(BaseModel):
     explanation: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class SearchQuery(BaseModel):
+    query: str
+    collection: str = "jobs"  # jobs, projects or candidates
+    top_k: int = 5
+    filters: Dict[str, Union[bool, int, float, str]] = {}
+
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchQuery]
+    mode: str = "vector"
+
+class BatchSearchResult(BaseModel):
+    query: str
+    collection: str
+    results: List[Union[Job, Project, Candidate]]
+
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
@@ -0,0 +1,68 @@
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from utils.database import Database, RECOMMENDATIONS_COLLECTION
+
+# Matches scoring at least this much are stored for /recommendations/stored
+RECOMMENDATION_STORE_THRESHOLD = float(os.getenv("RECOMMENDATION_STORE_THRESHOLD", "70"))
+
+# A stored recommendation is identified by these fields; together they carry
+# a unique index, and job_id/project_id are null for the other kind of match
+RECOMMENDATION_KEY_FIELDS = ("type", "candidate_id", "job_id", "project_id")
+
+
+def recommendation_key(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: doc.get(field) for field in RECOMMENDATION_KEY_FIELDS}
+
+
+def recommendation_upsert(doc: Dict[str, Any], now: Optional[datetime] = None) -> UpdateOne:
+    """Upsert one recommendation by its compound key.
+
+    New recommendations get an id and start unviewed; existing ones keep
+    both and only have their score, timestamp and owner refreshed.
+    """
+    now = now or datetime.utcnow()
+    updates = {"match_score": doc["match_score"], "timestamp": now}
+    if doc.get("employer_id"):
+        updates["employer_id"] = doc["employer_id"]
+    return UpdateOne(
+        recommendation_key(doc),
+        {
+            "$set": updates,
+            "$setOnInsert": {"id": str(ObjectId()), "viewed": False},
+        },
+        upsert=True
+    )
+
+
+async def delete_recommendations_for(field: str, value: str) -> int:
+    """Remove stored recommendations of a job, project or candidate that can no longer be recommended"""
+    result = await Database.get_collection(RECOMMENDATIONS_COLLECTION).delete_many({field: value})
+    return result.deleted_count
+
+
+async def save_recommendations(docs: List[Dict[str, Any]]) -> int:
+    """Persist recommendations in a single unordered bulk write.
+
+    Returns the number of recommendations inserted or changed. Runs as a
+    background task after the response has been sent, so errors are logged
+    rather than raised.
+    """
+    if not docs:
+        return 0
+    now = datetime.utcnow()
+    try:
+        result = await Database.get_collection(RECOMMENDATIONS_COLLECTION).bulk_write(
+            [recommendation_upsert(doc, now) for doc in docs],
+            ordered=False
+        )
+        saved = result.upserted_count + result.modified_count
+        print(f"Saved {saved} of {len(docs)} {docs[0].get('type', 'recommendation')}s")
+        return saved
+    except Exception as e:
+        print(f"Error saving recommendations: {str(e)}")
+        return 0
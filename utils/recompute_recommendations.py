@@ -0,0 +1,129 @@
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+from pymongo import MongoClient, ReplaceOne, ReturnDocument
+
+from utils.database import MONGODB_URL, DATABASE_NAME, MATERIALIZED_RECOMMENDATIONS_COLLECTION, CANDIDATES_COLLECTION
+from utils.materialized_recommendations import MATERIALIZED_KINDS, MATERIALIZED_TOP_K, GENERATION_KIND, materialized_doc, top_k_rows
+from utils.reranker import rerank_scores, RERANK_RECALL_SIZE
+from utils.scoring import normalize_vector, stack_embeddings, select_top_k
+from utils.vector_index import INDEXED_COLLECTIONS
+
+BLOCK_SIZE = 256
+WRITE_BATCH_SIZE = 500
+
+def load_vectors(db, collection_name):
+    """The documents (without embedding) and the normalized embedding matrix of every recommendable document"""
+    docs = list(db[collection_name].find(INDEXED_COLLECTIONS[collection_name], {"_id": 0}))
+    dimensions = next((vector.shape[0] for vector in (normalize_vector(doc.get("embedding")) for doc in docs) if vector is not None), 0)
+    matrix, has_vector = stack_embeddings(docs, dimensions)
+    for doc in docs:
+        doc.pop("embedding", None)
+    return docs, matrix, has_vector
+
+def rerank_row(entity, ranked_docs, columns, recall_scores, entity_is_job, top_k, now):
+    """Re-rank one entity's recalled columns on match features; (columns, scores) of its top-k"""
+    recalled = [ranked_docs[column] for column in columns]
+    entities = [entity] * len(recalled)
+    jobs, candidates = (entities, recalled) if entity_is_job else (recalled, entities)
+    final = rerank_scores(jobs, candidates, recall_scores, ranked_is_job=not entity_is_job, now=now)
+    rows = select_top_k(final, top_k)
+    return columns[rows], final[rows]
+
+def recompute_kind(db, kind, generation, block_size, top_k, dry_run=False):
+    """Score every entity against the ranked collection in blocks and store each top-k"""
+    entity_collection, ranked_collection = MATERIALIZED_KINDS[kind]
+    entities, entity_matrix, entity_has_vector = load_vectors(db, entity_collection)
+    ranked_docs, ranked_matrix, ranked_has_vector = load_vectors(db, ranked_collection)
+    entity_ids = [entity["id"] for entity in entities]
+    ranked_ids = [doc["id"] for doc in ranked_docs]
+    if entity_matrix.shape[1] != ranked_matrix.shape[1]:
+        print(f"{kind}: {entity_collection} and {ranked_collection} embeddings have different dimensions, skipped")
+        return 0
+
+    collection = db[MATERIALIZED_RECOMMENDATIONS_COLLECTION]
+    ranked_ids = np.array(ranked_ids, dtype=object)
+    computed_at = datetime.utcnow()
+    operations = []
+    written = 0
+
+    for start in range(0, len(entity_ids), block_size):
+        block = slice(start, start + block_size)
+        # One matrix-matrix product scores the whole block against every ranked document
+        scores = (entity_matrix[block] @ ranked_matrix.T) * 100.0
+        scores[:, ~ranked_has_vector] = np.nan
+        # Recall the best matches by cosine, then re-rank only those like the API does
+        columns, recall_scores = top_k_rows(scores, max(top_k, RERANK_RECALL_SIZE))
+
+        for row, entity_id in enumerate(entity_ids[block]):
+            if not entity_has_vector[start + row]:
+                # Left to the on-demand path once the entity has an embedding
+                continue
+            recalled = np.isfinite(recall_scores[row])
+            top_columns, top_scores = rerank_row(
+                entities[start + row], ranked_docs, columns[row][recalled], recall_scores[row][recalled],
+                entity_collection != CANDIDATES_COLLECTION, top_k, computed_at
+            )
+            items = [
+                {"id": ranked_id, "score": float(score), "method": "vector"}
+                for ranked_id, score in zip(ranked_ids[top_columns], top_scores)
+            ]
+            operations.append(ReplaceOne(
+                {"kind": kind, "entity_id": entity_id},
+                materialized_doc(kind, entity_id, items, generation, computed_at, top_k),
+                upsert=True
+            ))
+
+        if len(operations) >= WRITE_BATCH_SIZE:
+            if not dry_run:
+                collection.bulk_write(operations, ordered=False)
+            written += len(operations)
+            operations = []
+
+    if operations and not dry_run:
+        collection.bulk_write(operations, ordered=False)
+    written += len(operations)
+
+    # Rankings of entities that are no longer active belong to older generations
+    removed = 0
+    if not dry_run:
+        removed = collection.delete_many({"kind": kind, "generation": {"$lt": generation}}).deleted_count
+    print(f"{kind}: stored top-{top_k} for {written} of {len(entity_ids)} {entity_collection} against {len(ranked_ids)} {ranked_collection}, removed {removed} stale")
+    return written
+
+def recompute_recommendations(kinds, block_size=BLOCK_SIZE, top_k=MATERIALIZED_TOP_K, dry_run=False):
+    client = MongoClient(MONGODB_URL)
+    try:
+        db = client[DATABASE_NAME]
+        print(f"Connected to MongoDB database: {DATABASE_NAME}")
+        if dry_run:
+            print("Dry run: no recommendations will be written")
+            generation = 0
+        else:
+            generation = db[MATERIALIZED_RECOMMENDATIONS_COLLECTION].find_one_and_update(
+                {"kind": GENERATION_KIND, "entity_id": GENERATION_KIND},
+                {"$inc": {"generation": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )["generation"]
+            print(f"Writing generation {generation}")
+
+        started = time.perf_counter()
+        total = 0
+        for kind in kinds:
+            total += recompute_kind(db, kind, generation, block_size, top_k, dry_run)
+        print(f"\nStored {total} rankings in {time.perf_counter() - started:.1f}s")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the top-k recommendations of every active candidate, job and project")
+    parser.add_argument("--kinds", nargs="+", choices=list(MATERIALIZED_KINDS), default=list(MATERIALIZED_KINDS), help="Recommendation kinds to recompute")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="Entities scored per matrix product")
+    parser.add_argument("--top-k", type=int, default=MATERIALIZED_TOP_K, help="Matches stored per entity")
+    parser.add_argument("--dry-run", action="store_true", help="Score everything but write nothing")
+    args = parser.parse_args()
+
+    recompute_recommendations(args.kinds, args.block_size, args.top_k, args.dry_run)
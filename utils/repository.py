@@ -0,0 +1,135 @@
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from pydantic import BaseModel
+
+from utils.database import Database, USERS_COLLECTION, JOBS_COLLECTION, PROJECTS_COLLECTION, CANDIDATES_COLLECTION, EMPLOYERS_COLLECTION
+from utils.models import Candidate, Employer, Job, Project, User
+
+# What a read is for decides which fields it fetches:
+# - list: listings and search results, the fields of the response model
+# - summary: the few fields shown next to applications, saved jobs and
+#   stored recommendations, or checked for ownership
+# - detail: one document for a handler, everything but _id and the embedding
+# - auth: the current user's identity and role
+# - credentials: the identity plus the password hash, for logging in
+# - scoring: ids and the stored vector, for ranking in-process
+# - index: the whole document, for write paths that feed the resident indexes
+LIST_VIEW = "list"
+SUMMARY_VIEW = "summary"
+DETAIL_VIEW = "detail"
+AUTH_VIEW = "auth"
+CREDENTIALS_VIEW = "credentials"
+SCORING_VIEW = "scoring"
+INDEX_VIEW = "index"
+
+# Fetched in $in batches when documents are looked up by id
+FIND_BY_IDS_BATCH_SIZE = 1000
+
+
+def fields_projection(fields: Iterable[str]) -> Dict[str, int]:
+    """Inclusion projection of some fields, without MongoDB's _id"""
+    projection = {field: 1 for field in fields}
+    projection["_id"] = 0
+    return projection
+
+
+def model_projection(model: Type[BaseModel], *extra: str) -> Dict[str, int]:
+    """Inclusion projection of a response model's fields (and ``extra`` ones)"""
+    return fields_projection([*model.model_fields, *extra])
+
+
+# Used for any collection and view not listed below
+DETAIL_PROJECTION = {"_id": 0, "embedding": 0}
+SCORING_PROJECTION = fields_projection(["id", "embedding"])
+
+VIEW_PROJECTIONS: Dict[str, Dict[str, Dict[str, int]]] = {
+    LIST_VIEW: {
+        JOBS_COLLECTION: model_projection(Job),
+        PROJECTS_COLLECTION: model_projection(Project),
+        CANDIDATES_COLLECTION: model_projection(Candidate),
+        EMPLOYERS_COLLECTION: model_projection(Employer),
+    },
+    SUMMARY_VIEW: {
+        JOBS_COLLECTION: fields_projection(["id", "title", "company", "location", "is_active", "employer_id"]),
+        PROJECTS_COLLECTION: fields_projection(["id", "title", "company", "status", "project_type", "is_active", "employer_id"]),
+        CANDIDATES_COLLECTION: fields_projection(["id", "full_name", "skills", "location", "experience"]),
+    },
+    DETAIL_VIEW: {},
+    AUTH_VIEW: {
+        USERS_COLLECTION: model_projection(User),
+    },
+    CREDENTIALS_VIEW: {
+        USERS_COLLECTION: model_projection(User, "password"),
+    },
+}
+
+
+class Repository:
+    """Reads of the request handlers, each fetching only what its view needs.
+
+    Embeddings are several kilobytes per document, far more than the rest
+    of it, so no read path fetches them: only the ``scoring`` view returns
+    vectors (with nothing but the ids), and the ``index`` view returns
+    whole documents for the write paths that refresh the resident indexes.
+    Writes still go through ``Database.get_collection``.
+    """
+
+    @staticmethod
+    def projection(collection_name: str, view: str) -> Optional[Dict[str, int]]:
+        if view == INDEX_VIEW:
+            return None
+        if view == SCORING_VIEW:
+            return SCORING_PROJECTION
+        if view not in VIEW_PROJECTIONS:
+            raise ValueError(f"Unknown view '{view}'. Available: {', '.join([*VIEW_PROJECTIONS, SCORING_VIEW, INDEX_VIEW])}")
+        return VIEW_PROJECTIONS[view].get(collection_name, DETAIL_PROJECTION)
+
+    @classmethod
+    async def find_one(cls, collection_name: str, query: Dict[str, Any], view: str = DETAIL_VIEW) -> Optional[Dict[str, Any]]:
+        return await Database.get_collection(collection_name).find_one(query, cls.projection(collection_name, view))
+
+    @classmethod
+    async def find(cls, collection_name: str, query: Dict[str, Any], view: str = LIST_VIEW,
+                   limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        cursor = Database.get_collection(collection_name).find(query, cls.projection(collection_name, view))
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=limit)
+
+    @classmethod
+    async def text_search(cls, collection_name: str, query_text: str, query: Dict[str, Any], view: str = LIST_VIEW,
+                          limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Documents matching a query and any term of ``query_text``, best MongoDB text score first.
+
+        Runs on the collection's text index (``TEXT_INDEX_FIELDS`` in
+        utils/database.py), so only matching documents are read.
+        """
+        projection = dict(cls.projection(collection_name, view) or {}, text_score={"$meta": "textScore"})
+        cursor = Database.get_collection(collection_name).find({**query, "$text": {"$search": query_text}}, projection)
+        cursor = cursor.sort([("text_score", {"$meta": "textScore"})])
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        docs = await cursor.to_list(length=limit)
+        for doc in docs:
+            doc.pop("text_score", None)
+        return docs
+
+    @classmethod
+    async def find_by_ids(cls, collection_name: str, ids: Iterable[str], view: str = SUMMARY_VIEW) -> Dict[str, Dict[str, Any]]:
+        """Documents by id, in as few queries as possible instead of one per id"""
+        ids = list(dict.fromkeys(doc_id for doc_id in ids if doc_id))
+        docs = {}
+        for start in range(0, len(ids), FIND_BY_IDS_BATCH_SIZE):
+            for doc in await cls.find(collection_name, {"id": {"$in": ids[start:start + FIND_BY_IDS_BATCH_SIZE]}}, view):
+                docs[doc["id"]] = doc
+        return docs
+
+    @classmethod
+    async def exists(cls, collection_name: str, query: Dict[str, Any]) -> bool:
+        return await Database.get_collection(collection_name).find_one(query, {"_id": 1}) is not None
+
+    @classmethod
+    async def vector(cls, collection_name: str, doc_id: str) -> Optional[Any]:
+        """A document's stored embedding, as stored (list or packed bytes)"""
+        doc = await cls.find_one(collection_name, {"id": doc_id}, SCORING_VIEW)
+        return doc.get("embedding") if doc else None
@@ -0,0 +1,123 @@
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from utils.skills import required_skill_ids, skill_overlap
+
+# Documents kept by the vector recall stage for feature re-ranking
+RERANK_RECALL_SIZE = int(os.getenv("RERANK_RECALL_SIZE", "500"))
+
+# Weights of the re-ranking features. They are normalized to sum to 1 so
+# re-ranked scores stay on the 0-100 scale; with every weight but
+# "similarity" set to 0, matches are ranked by the recall score alone.
+RERANK_WEIGHTS = {
+    "similarity": float(os.getenv("RERANK_WEIGHT_SIMILARITY", "0.7")),
+    "skills": float(os.getenv("RERANK_WEIGHT_SKILLS", "0.15")),
+    "location": float(os.getenv("RERANK_WEIGHT_LOCATION", "0.05")),
+    "recency": float(os.getenv("RERANK_WEIGHT_RECENCY", "0.05")),
+    "preferences": float(os.getenv("RERANK_WEIGHT_PREFERENCES", "0.05")),
+}
+# Age in days at which the recency feature of a ranked document has halved
+RERANK_RECENCY_HALF_LIFE_DAYS = float(os.getenv("RERANK_RECENCY_HALF_LIFE_DAYS", "30"))
+
+# Features that cannot be compared for a pair (a job without requirements,
+# a candidate without a location) score this, neither helping nor hurting
+NEUTRAL = 0.5
+
+UNSPECIFIED_LOCATION = "location not specified"
+
+
+def _text(value: Any) -> str:
+    return " ".join(str(value or "").split()).lower()
+
+
+def skill_ratio(job_info: Dict[str, Any], candidate_info: Dict[str, Any], overlap: Optional[int] = None) -> float:
+    """Fraction of the job's required skills the candidate has"""
+    if overlap is None:
+        overlap, required = skill_overlap(job_info, candidate_info)
+    else:
+        required = len(required_skill_ids(job_info))
+    if not required:
+        return NEUTRAL
+    return min(1.0, overlap / required)
+
+
+def location_match(job_info: Dict[str, Any], candidate_info: Dict[str, Any]) -> float:
+    """1 if the job is where the candidate is or wants to work (or remote and they work remotely)"""
+    job_location = _text(job_info.get("location"))
+    preferences = candidate_info.get("job_preferences") or {}
+    locations = {_text(location) for location in preferences.get("preferred_locations") or []}
+    candidate_location = _text(candidate_info.get("location"))
+    if candidate_location and candidate_location != UNSPECIFIED_LOCATION:
+        locations.add(candidate_location)
+    if not job_location or not locations:
+        return NEUTRAL
+    if job_location in locations:
+        return 1.0
+    if "remote" in job_location and preferences.get("remote_work"):
+        return 1.0
+    return 0.0
+
+
+def preference_match(job_info: Dict[str, Any], candidate_info: Dict[str, Any]) -> float:
+    """1 if the job's type or title names one of the candidate's preferred job types"""
+    job_types = [_text(job_type) for job_type in (candidate_info.get("job_preferences") or {}).get("job_types") or []]
+    job_types = [job_type for job_type in job_types if job_type]
+    if not job_types:
+        return NEUTRAL
+    described = " ".join(_text(job_info.get(field)) for field in ("job_type", "project_type", "title"))
+    return 1.0 if any(job_type in described for job_type in job_types) else 0.0
+
+
+def age_days(doc: Dict[str, Any], now: datetime) -> float:
+    """Days since a candidate was last active or a job or project was posted; NaN if unknown"""
+    timestamp = doc.get("last_active") or doc.get("created_at")
+    if not isinstance(timestamp, datetime):
+        return np.nan
+    return max(0.0, (now - timestamp).total_seconds() / 86400)
+
+
+def match_features(jobs: Sequence[Dict[str, Any]], candidates: Sequence[Dict[str, Any]], similarity: np.ndarray,
+                   ranked_is_job: bool, overlap: Optional[np.ndarray] = None, now: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+    """Feature columns, each in [0, 1], of aligned (job, candidate) pairs.
+
+    ``similarity`` is the recall score (0-100) of each pair; ``overlap``
+    optionally carries skill overlap counts already known from the skill
+    index. Recency is measured on the ranked side of each pair. Features
+    with a weight of 0 are not computed.
+    """
+    now = now or datetime.utcnow()
+    features = {"similarity": np.clip(np.asarray(similarity, dtype=np.float32) / 100.0, 0.0, 1.0)}
+    if RERANK_WEIGHTS["skills"]:
+        features["skills"] = np.array([
+            skill_ratio(job, candidate, None if overlap is None else int(overlap[i]))
+            for i, (job, candidate) in enumerate(zip(jobs, candidates))
+        ], dtype=np.float32)
+    if RERANK_WEIGHTS["location"]:
+        features["location"] = np.array([location_match(job, candidate) for job, candidate in zip(jobs, candidates)], dtype=np.float32)
+    if RERANK_WEIGHTS["recency"]:
+        ages = np.array([age_days(doc, now) for doc in (jobs if ranked_is_job else candidates)], dtype=np.float32)
+        features["recency"] = np.where(np.isnan(ages), NEUTRAL, 0.5 ** (ages / RERANK_RECENCY_HALF_LIFE_DAYS)).astype(np.float32)
+    if RERANK_WEIGHTS["preferences"]:
+        features["preferences"] = np.array([preference_match(job, candidate) for job, candidate in zip(jobs, candidates)], dtype=np.float32)
+    return features
+
+
+def rerank_scores(jobs: Sequence[Dict[str, Any]], candidates: Sequence[Dict[str, Any]], similarity: np.ndarray,
+                  ranked_is_job: bool, overlap: Optional[np.ndarray] = None, now: Optional[datetime] = None) -> np.ndarray:
+    """Final 0-100 scores of recalled pairs: the weighted sum of their features.
+
+    Meant for the survivors of the recall stage only; the whole pool is
+    never feature-scored.
+    """
+    similarity = np.asarray(similarity, dtype=np.float32)
+    total = sum(RERANK_WEIGHTS.values())
+    if not len(similarity) or total <= 0 or total == RERANK_WEIGHTS["similarity"]:
+        return similarity.copy()
+    features = match_features(jobs, candidates, similarity, ranked_is_job, overlap, now)
+    scores = np.zeros(len(similarity), dtype=np.float32)
+    for name, values in features.items():
+        scores += (RERANK_WEIGHTS[name] / total) * values
+    return scores * 100.0
@@ -0,0 +1,94 @@
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.vector_codec import decode_embedding
+
+# Rank offset of reciprocal-rank fusion; larger values flatten the weight of top ranks
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def normalize_vector(vector: Any) -> Optional[np.ndarray]:
+    """Decode a list or stored embedding into a unit-length float32 vector, or None"""
+    array = decode_embedding(vector)
+    if array is None:
+        return None
+    norm = float(np.linalg.norm(array))
+    if norm == 0:
+        return None
+    return (array / norm).astype(np.float32, copy=False)
+
+
+def stack_embeddings(docs: List[Dict[str, Any]], dimensions: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Stack the documents' embeddings into one pre-normalized float32 matrix.
+
+    Returns ``(matrix, has_vector)``; rows for documents without a usable
+    embedding of the right dimension are zero and flagged False in the mask.
+    """
+    matrix = np.zeros((len(docs), dimensions), dtype=np.float32)
+    has_vector = np.zeros(len(docs), dtype=bool)
+    for i, doc in enumerate(docs):
+        vector = normalize_vector(doc.get("embedding"))
+        if vector is not None and vector.shape[0] == dimensions:
+            matrix[i] = vector
+            has_vector[i] = True
+    return matrix, has_vector
+
+
+def cosine_scores(query_vector: Any, docs: List[Dict[str, Any]]) -> np.ndarray:
+    """Score every document against one query with a single matrix-vector product.
+
+    Scores are cosine similarity scaled to 0-100; documents lacking a vector
+    (or every document, if the query has none) get NaN so callers can apply
+    the keyword fallback to exactly those rows.
+    """
+    query = normalize_vector(query_vector)
+    if query is None or not docs:
+        return np.full(len(docs), np.nan, dtype=np.float32)
+
+    matrix, has_vector = stack_embeddings(docs, query.shape[0])
+    scores = (matrix @ query) * 100.0
+    scores[~has_vector] = np.nan
+    return scores
+
+
+def select_top_k(scores: np.ndarray, limit: Optional[int] = None, offset: int = 0, min_score: Optional[float] = None) -> np.ndarray:
+    """Row indices of one page of the best scores, in descending score order.
+
+    Only the ``offset + limit`` best rows are found, with ``np.argpartition``,
+    and only those are sorted; NaN scores are never selected. Without a
+    limit every remaining row is returned.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    eligible = ~np.isnan(scores)
+    if min_score is not None:
+        eligible &= scores >= min_score
+    rows = np.flatnonzero(eligible)
+
+    if limit is not None:
+        k = offset + limit
+        if k <= 0:
+            return rows[:0]
+        if k < rows.shape[0]:
+            rows = rows[np.argpartition(-scores[rows], k - 1)[:k]]
+
+    # Stable sort on the candidate rows keeps ties in document order
+    rows = rows[np.argsort(-scores[rows], kind="stable")]
+    if limit is None:
+        return rows[offset:]
+    return rows[offset:offset + limit]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[np.ndarray], size: int, limit: Optional[int] = None, k: int = RRF_K) -> np.ndarray:
+    """Fuse several rankings of the same rows into one.
+
+    Each ranking is an array of row indices, best first; every row scores
+    the sum of ``1 / (k + rank)`` over the rankings it appears in. Returns
+    the fused row indices, best first.
+    """
+    fused = np.full(size, np.nan, dtype=np.float32)
+    for ranking in rankings:
+        contribution = 1.0 / (k + np.arange(1, len(ranking) + 1, dtype=np.float32))
+        fused[ranking] = np.nan_to_num(fused[ranking]) + contribution
+    return select_top_k(fused, limit)
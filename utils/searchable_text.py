@@ -0,0 +1,16 @@
+from typing import Any, Dict
+
+
+def build_job_text(job_data: Dict[str, Any]) -> str:
+    """Build the searchable text that is embedded for a job"""
+    return f"{job_data.get('title', '')} {job_data.get('company', '')} {job_data.get('description', '')} {' '.join(job_data.get('requirements', []))} {job_data.get('location', '')}"
+
+def build_project_text(project_data: Dict[str, Any]) -> str:
+    """Build the searchable text that is embedded for a project"""
+    return f"{project_data.get('title', '')} {project_data.get('company', '')} {project_data.get('description', '')} {' '.join(project_data.get('requirements', []))} {' '.join(project_data.get('skills_required', []))} {project_data.get('project_type', '')} {project_data.get('location', '')}"
+
+def build_candidate_text(candidate_data: Dict[str, Any]) -> str:
+    """Build the searchable text that is embedded for a candidate"""
+    # Combine relevant candidate fields into a searchable text
+    skills_text = ' '.join(candidate_data.get('skills', []))
+    return f"{candidate_data.get('full_name', '')} {skills_text} {candidate_data.get('experience', '')} {candidate_data.get('education', '')} {candidate_data.get('location', '')} {candidate_data.get('bio', '')}"
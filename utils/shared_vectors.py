@@ -0,0 +1,136 @@
+import fcntl
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Share the resident vector matrices between the worker processes of one
+# host: one process publishes them to files, the others map those files
+VECTOR_INDEX_SHARED = os.getenv("VECTOR_INDEX_SHARED", "false").lower() == "true"
+# Where generations are published; /dev/shm keeps them in shared memory
+VECTOR_SHARED_DIR = os.getenv(
+    "VECTOR_SHARED_DIR",
+    "/dev/shm/lamma_vectors" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "lamma_vectors")
+)
+# How often the publisher publishes changed matrices and the other workers
+# look for a new generation
+VECTOR_SHARED_REFRESH_SECONDS = int(os.getenv("VECTOR_SHARED_REFRESH_SECONDS", "30"))
+# Spare rows published after the last document, so workers can add
+# documents without copying the matrix (they stay sparse until written)
+VECTOR_SHARED_HEADROOM = float(os.getenv("VECTOR_SHARED_HEADROOM", "0.1"))
+# Vectors a worker wrote up to this long before a generation was taken are
+# still written back over it, since they reach the publisher through
+# change streams with some delay
+VECTOR_SHARED_LAG_SECONDS = int(os.getenv("VECTOR_SHARED_LAG_SECONDS", "10"))
+# How long a worker waits at startup for a first generation before it
+# loads the vectors itself
+VECTOR_SHARED_WAIT_SECONDS = int(os.getenv("VECTOR_SHARED_WAIT_SECONDS", "120"))
+
+
+def _write_json(path: str, data: Any):
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+class SharedVectorStore:
+    """Generations of the resident vector matrices in files shared by worker processes.
+
+    A generation of a collection is its matrix as a ``.npy`` file, the
+    document id of each row (None for dead rows) and which rows have a
+    vector. ``{collection}.json`` names the current generation and is
+    replaced atomically, after the files it points to are complete, so
+    readers never see a partial generation. Workers map the matrix
+    copy-on-write: pages stay shared in the page cache (or ``/dev/shm``)
+    until a worker writes a row, which copies only that page.
+
+    One process holds ``publisher.lock`` and is the only one publishing;
+    the lock is released when it exits, so another worker can take over.
+    """
+    lock_file = None
+
+    @classmethod
+    def acquire_publisher(cls) -> bool:
+        if cls.lock_file is not None:
+            return True
+        os.makedirs(VECTOR_SHARED_DIR, exist_ok=True)
+        lock_file = open(os.path.join(VECTOR_SHARED_DIR, "publisher.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        cls.lock_file = lock_file
+        return True
+
+    @classmethod
+    def release_publisher(cls):
+        if cls.lock_file is not None:
+            cls.lock_file.close()
+            cls.lock_file = None
+
+    @staticmethod
+    def _path(name: str) -> str:
+        return os.path.join(VECTOR_SHARED_DIR, name)
+
+    @classmethod
+    def manifest(cls, collection_name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(cls._path(f"{collection_name}.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @classmethod
+    def publish(cls, collection_name: str, layout: str, ids: List[Optional[str]], has_vector: np.ndarray,
+                matrix: np.ndarray, as_of: datetime) -> Dict[str, Any]:
+        """Write the first ``len(ids)`` rows of ``matrix`` as a new generation and make it current"""
+        previous = cls.manifest(collection_name)
+        generation = (previous["generation"] if previous else 0) + 1
+        rows = len(ids)
+        capacity = rows + max(1, int(rows * VECTOR_SHARED_HEADROOM))
+        prefix = f"{collection_name}.{generation}"
+        os.makedirs(VECTOR_SHARED_DIR, exist_ok=True)
+
+        target = np.lib.format.open_memmap(cls._path(prefix + ".npy.tmp"), mode="w+", dtype=np.float32, shape=(capacity, matrix.shape[1]))
+        target[:rows] = matrix[:rows]
+        target.flush()
+        del target
+        os.replace(cls._path(prefix + ".npy.tmp"), cls._path(prefix + ".npy"))
+        np.save(cls._path(prefix + ".has_vector.npy"), np.asarray(has_vector[:rows], dtype=bool))
+        _write_json(cls._path(prefix + ".ids.json"), ids)
+
+        manifest = {
+            "collection": collection_name,
+            "generation": generation,
+            "layout": layout,
+            "rows": rows,
+            "capacity": capacity,
+            "dimensions": int(matrix.shape[1]),
+            "as_of": as_of.isoformat(),
+            "prefix": prefix,
+        }
+        _write_json(cls._path(f"{collection_name}.json"), manifest)
+
+        # Keep the previous generation for workers still switching to this one
+        for file_name in os.listdir(VECTOR_SHARED_DIR):
+            parts = file_name.split(".")
+            if parts[0] == collection_name and len(parts) > 2 and parts[1].isdigit() and int(parts[1]) < generation - 1:
+                try:
+                    os.remove(cls._path(file_name))
+                except OSError:
+                    pass
+        return manifest
+
+    @classmethod
+    def attach(cls, manifest: Dict[str, Any]) -> Tuple[List[Optional[str]], np.ndarray, np.ndarray]:
+        """Row ids, has-vector flags and the copy-on-write mapped matrix of a generation"""
+        prefix = manifest["prefix"]
+        with open(cls._path(prefix + ".ids.json")) as f:
+            ids = json.load(f)
+        has_vector = np.load(cls._path(prefix + ".has_vector.npy"))
+        matrix = np.load(cls._path(prefix + ".npy"), mmap_mode="c")
+        return ids, has_vector, matrix
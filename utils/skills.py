@@ -0,0 +1,216 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from utils.database import Database, SKILLS_COLLECTION, JOBS_COLLECTION, PROJECTS_COLLECTION, CANDIDATES_COLLECTION
+
+# Field holding the skills of each collection's documents; jobs and projects
+# list the skills they require, candidates the skills they have
+SKILL_FIELDS = {
+    JOBS_COLLECTION: "requirements",
+    PROJECTS_COLLECTION: "skills_required",
+    CANDIDATES_COLLECTION: "skills",
+}
+
+# Document of the skills collection holding the next free id
+SEQUENCE_ID = "_sequence"
+
+# Documents updated per bulk write when legacy documents get their skill ids
+BACKFILL_BATCH_SIZE = 500
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_skill(skill: Any) -> str:
+    """Canonical form of a skill name: trimmed, lowercased, single-spaced"""
+    return _whitespace.sub(" ", str(skill)).strip().lower()
+
+
+def common_skill_count(skill_ids: np.ndarray, other_ids: np.ndarray) -> int:
+    """Number of skills two sorted id arrays have in common"""
+    if len(skill_ids) == 0 or len(other_ids) == 0:
+        return 0
+    return int(np.intersect1d(skill_ids, other_ids, assume_unique=True).size)
+
+
+def _as_list(skills: Any) -> List[Any]:
+    if isinstance(skills, str):
+        return [skills]
+    return list(skills or [])
+
+
+def skill_names(skills: Any) -> Set[str]:
+    """Normalized names of a document's skills"""
+    return {name for name in map(normalize_skill, _as_list(skills)) if name}
+
+
+def required_skill_names(job_info: Dict[str, Any]) -> List[str]:
+    """Skills a job (or a project converted with ``project_as_job``) requires, as written"""
+    return job_info.get("requirements") or job_info.get("required_skills") or job_info.get("skills_required") or []
+
+
+def split_skills(skills: Iterable[Any], other_skills: Any) -> Tuple[List[str], List[str]]:
+    """Split skill names into those also in ``other_skills`` and those missing.
+
+    Compared by normalized name, so the result does not depend on which
+    ids this worker's vocabulary has seen. Names keep their original
+    spelling, with duplicates (after normalization) dropped.
+    """
+    others = skill_names(other_skills)
+    matched, missing, seen = [], [], set()
+    for skill in _as_list(skills):
+        name = normalize_skill(skill)
+        if not name or name in seen:
+            continue
+        seen.add(name)
+        (matched if name in others else missing).append(skill)
+    return matched, missing
+
+
+def skill_overlap(job_info: Dict[str, Any], candidate_info: Dict[str, Any]) -> Tuple[int, int]:
+    """(matched, required) skill counts of a job and a candidate.
+
+    Intersects the stored ``skill_ids`` when both documents have them and
+    compares names otherwise, never ids resolved by this worker alone.
+    """
+    if job_info.get("skill_ids") is not None and candidate_info.get("skill_ids") is not None:
+        required = np.asarray(job_info["skill_ids"], dtype=np.int32)
+        return common_skill_count(required, np.asarray(candidate_info["skill_ids"], dtype=np.int32)), len(required)
+    required_names = skill_names(required_skill_names(job_info))
+    return len(required_names & skill_names(candidate_info.get("skills"))), len(required_names)
+
+
+class SkillVocabulary:
+    """Shared vocabulary mapping normalized skill names to integer ids.
+
+    Ids are assigned at write time and persisted in the ``skills``
+    collection, so every worker resolves a name to the same id. Documents
+    store their skills as a sorted ``skill_ids`` array next to the original
+    names, which lets skill overlap be computed by intersecting integer
+    arrays instead of rebuilding string sets for every comparison.
+    """
+    ids: Dict[str, int] = {}
+
+    @classmethod
+    def collection(cls):
+        return Database.get_collection(SKILLS_COLLECTION)
+
+    @classmethod
+    async def start(cls):
+        await cls.load()
+        for collection_name in SKILL_FIELDS:
+            await cls.backfill(collection_name)
+
+    @classmethod
+    async def load(cls):
+        cls.ids = {}
+        async for doc in cls.collection().find({"name": {"$exists": True}}, {"_id": 0, "name": 1, "id": 1}):
+            cls.ids[doc["name"]] = doc["id"]
+        print(f"Loaded {len(cls.ids)} skills into the vocabulary")
+
+    @classmethod
+    def lookup(cls, skills: Optional[Iterable[Any]]) -> np.ndarray:
+        """Sorted ids of the given skill names without assigning new ones.
+
+        Names missing from the vocabulary get negative placeholder ids, so
+        they still count towards the number of skills but never match; call
+        ``resolve`` first to pick up ids assigned by other workers.
+        """
+        ids, unknown = set(), {}
+        for skill in skills or []:
+            name = normalize_skill(skill)
+            if not name:
+                continue
+            if name in cls.ids:
+                ids.add(cls.ids[name])
+            else:
+                ids.add(unknown.setdefault(name, -1 - len(unknown)))
+        return np.array(sorted(ids), dtype=np.int32)
+
+    @classmethod
+    async def resolve(cls, skills: Optional[Iterable[Any]]):
+        """Load the ids of skills this worker has not seen, which other workers may have added"""
+        names = skill_names(skills) - cls.ids.keys()
+        if not names:
+            return
+        async for doc in cls.collection().find({"name": {"$in": sorted(names)}}, {"_id": 0, "name": 1, "id": 1}):
+            cls.ids[doc["name"]] = doc["id"]
+
+    @classmethod
+    async def ensure(cls, skills: Optional[Iterable[Any]]) -> List[int]:
+        """Sorted ids of the given skill names, assigning ids to new ones"""
+        ids = set()
+        for skill in skills or []:
+            name = normalize_skill(skill)
+            if not name:
+                continue
+            if name not in cls.ids:
+                await cls._assign(name)
+            ids.add(cls.ids[name])
+        return sorted(ids)
+
+    @classmethod
+    async def _assign(cls, name: str):
+        collection = cls.collection()
+        # Another worker may have added the skill since the vocabulary was loaded
+        existing = await collection.find_one({"name": name})
+        if existing is None:
+            sequence = await collection.find_one_and_update(
+                {"_id": SEQUENCE_ID},
+                {"$inc": {"next_id": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            try:
+                await collection.insert_one({"name": name, "id": sequence["next_id"] - 1})
+            except DuplicateKeyError:
+                pass
+            existing = await collection.find_one({"name": name})
+        cls.ids[name] = existing["id"]
+
+    @classmethod
+    async def skill_fields(cls, collection_name: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """``skill_ids`` to store with a document, if its skills are part of the write"""
+        field = SKILL_FIELDS.get(collection_name)
+        if field is None or field not in doc:
+            return {}
+        skills = doc[field]
+        if isinstance(skills, str):
+            skills = [skills]
+        return {"skill_ids": await cls.ensure(skills)}
+
+    @classmethod
+    async def backfill(cls, collection_name: str):
+        """Give documents written before the vocabulary existed their skill ids"""
+        field = SKILL_FIELDS[collection_name]
+        collection = Database.get_collection(collection_name)
+        updated = 0
+        operations = []
+        async for doc in collection.find({"skill_ids": {"$exists": False}}, {"_id": 1, field: 1}):
+            skill_ids = await cls.ensure(_as_list(doc.get(field)))
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"skill_ids": skill_ids}}))
+            if len(operations) >= BACKFILL_BATCH_SIZE:
+                await collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+        if updated:
+            print(f"Stored skill ids for {updated} {collection_name}")
+
+
+def required_skill_ids(job_info: Dict[str, Any]) -> np.ndarray:
+    """Skill ids a job (or a project converted with ``project_as_job``) requires"""
+    if job_info.get("skill_ids") is not None:
+        return np.asarray(job_info["skill_ids"], dtype=np.int32)
+    return SkillVocabulary.lookup(required_skill_names(job_info))
+
+
+def candidate_skill_ids(candidate_info: Dict[str, Any]) -> np.ndarray:
+    if candidate_info.get("skill_ids") is not None:
+        return np.asarray(candidate_info["skill_ids"], dtype=np.int32)
+    return SkillVocabulary.lookup(candidate_info.get("skills"))
@@ -0,0 +1,51 @@
+import json
+from typing import Any, AsyncIterator, Iterable, List, Optional, Union
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+# Formats the recommendation and search endpoints can stream their results in
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def validate_stream(stream: Optional[str]):
+    if stream is not None and stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"stream must be one of: {', '.join(STREAM_MEDIA_TYPES)}")
+
+
+async def stream_lines(results: Iterable[Any], stream: str) -> AsyncIterator[str]:
+    """Encode results one at a time, skipping None.
+
+    NDJSON puts each result on its own line; Server-Sent Events send each
+    result as a ``data`` event and close with an ``end`` event so clients
+    can tell a complete stream from a dropped connection.
+    """
+    for result in results:
+        if result is None:
+            continue
+        body = json.dumps(jsonable_encoder(result))
+        yield f"data: {body}\n\n" if stream == "sse" else f"{body}\n"
+    if stream == "sse":
+        yield "event: end\ndata: {}\n\n"
+
+
+def respond(results: Iterable[Any], stream: Optional[str]) -> Union[List[Any], StreamingResponse]:
+    """Return results as a list, or stream them in the requested format.
+
+    ``results`` may be a lazy generator: when streaming, each result is
+    built and sent before the next one is started, so the first result
+    reaches the client without waiting for the rest of the page. Background
+    tasks of the request still run once the stream is complete.
+    """
+    if stream is None:
+        return [result for result in results if result is not None]
+    return StreamingResponse(
+        stream_lines(results, stream),
+        media_type=STREAM_MEDIA_TYPES[stream],
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,82 @@
+import struct
+
+import numpy as np
+import pytest
+from bson.binary import Binary, USER_DEFINED_SUBTYPE
+
+from utils.vector_codec import decode_embedding, embedding_format, encode_embedding
+
+RANGE = np.arange(8, dtype=np.float32)
+GAUSSIAN = np.random.default_rng(0).standard_normal(3072).astype(np.float32)
+
+
+def test_float_is_stored_as_a_list():
+    stored = encode_embedding(RANGE, "float")
+    assert stored == RANGE.tolist()
+    assert embedding_format(stored) == "float"
+    np.testing.assert_array_equal(decode_embedding(stored), RANGE)
+
+
+@pytest.mark.parametrize("storage_format, tag, header_size, item_size", [
+    ("float16", 1, 4, 2),
+    ("int8", 2, 8, 1),
+])
+def test_packed_header_and_alignment(storage_format, tag, header_size, item_size):
+    stored = encode_embedding(GAUSSIAN, storage_format)
+    assert isinstance(stored, Binary) and stored.subtype == USER_DEFINED_SUBTYPE
+    assert embedding_format(stored) == storage_format
+    assert stored[0] == tag and stored[1:4] == b"\x00\x00\x00"
+    # The components start on a 4-byte boundary so they can be read in place
+    assert len(stored) == header_size + len(GAUSSIAN) * item_size
+
+
+def test_int8_scale_maps_the_largest_component_to_127():
+    stored = encode_embedding(RANGE, "int8")
+    (scale,) = struct.unpack_from("<f", stored, 4)
+    assert scale == pytest.approx(7 / 127)
+    quantized = np.frombuffer(stored, dtype=np.int8, offset=8)
+    assert quantized.max() == 127
+    np.testing.assert_array_equal(quantized, np.rint(RANGE / np.float32(scale)))
+
+
+@pytest.mark.parametrize("vector", [RANGE, GAUSSIAN, -GAUSSIAN * 1e-3])
+def test_int8_round_trip_is_within_half_a_step(vector):
+    decoded = decode_embedding(encode_embedding(vector, "int8"))
+    assert decoded.dtype == np.float32 and decoded.shape == vector.shape
+    half_step = np.abs(vector).max() / 127 / 2
+    assert np.abs(decoded - vector).max() <= half_step * (1 + 1e-6)
+
+
+def test_int8_error_on_a_range():
+    decoded = decode_embedding(encode_embedding(RANGE, "int8"))
+    assert np.abs(decoded - RANGE).max() == pytest.approx(0.0236, abs=1e-4)
+
+
+@pytest.mark.parametrize("vector", [RANGE, GAUSSIAN])
+def test_float16_round_trip_is_within_its_precision(vector):
+    decoded = decode_embedding(encode_embedding(vector, "float16"))
+    assert decoded.dtype == np.float32 and decoded.shape == vector.shape
+    # float16 keeps 11 significant bits
+    assert np.all(np.abs(decoded - vector) <= np.abs(vector) * 2 ** -11 + 1e-7)
+
+
+def test_small_integers_survive_float16_exactly():
+    np.testing.assert_array_equal(decode_embedding(encode_embedding(RANGE, "float16")), RANGE)
+
+
+@pytest.mark.parametrize("storage_format", ["float", "float16", "int8"])
+def test_missing_embeddings(storage_format):
+    assert encode_embedding([], storage_format) == []
+    assert decode_embedding(encode_embedding([], storage_format)) is None
+    assert decode_embedding(None) is None
+    assert embedding_format([]) is None
+
+
+def test_zero_vector_round_trips_as_int8():
+    zeros = np.zeros(8, dtype=np.float32)
+    np.testing.assert_array_equal(decode_embedding(encode_embedding(zeros, "int8")), zeros)
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        encode_embedding(RANGE, "bfloat16")
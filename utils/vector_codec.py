@@ -0,0 +1,85 @@
+import os
+import struct
+from typing import Any, List, Optional, Union
+
+import numpy as np
+from bson.binary import Binary, USER_DEFINED_SUBTYPE
+
+# How embeddings are written to MongoDB: "float" (BSON array of doubles, required
+# by Atlas $vectorSearch), "float16" (2 bytes per dimension) or "int8" (1 byte
+# per dimension plus a per-vector scale)
+EMBEDDING_STORAGE_FORMAT = os.getenv("EMBEDDING_STORAGE_FORMAT", "float").lower()
+
+STORAGE_FORMATS = ("float", "float16", "int8")
+
+# Packed layout: 4-byte header (format tag + padding) so the payload stays aligned,
+# then for int8 a float32 scale, then the components
+_HEADER = struct.Struct("<B3x")
+_SCALE = struct.Struct("<f")
+_FLOAT16_TAG = 1
+_INT8_TAG = 2
+
+
+def encode_embedding(vector: Union[List[float], np.ndarray], storage_format: Optional[str] = None) -> Any:
+    """Convert a vector into its stored representation.
+
+    Returns a plain list for the "float" format and a BSON Binary otherwise.
+    Empty vectors are stored as [] so "missing embedding" checks keep working.
+    """
+    storage_format = (storage_format or EMBEDDING_STORAGE_FORMAT).lower()
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown embedding storage format '{storage_format}'. Use one of: {', '.join(STORAGE_FORMATS)}")
+
+    if vector is None or len(vector) == 0:
+        return []
+
+    if storage_format == "float":
+        return vector.tolist() if isinstance(vector, np.ndarray) else list(vector)
+
+    array = np.asarray(vector, dtype=np.float32)
+    if storage_format == "float16":
+        payload = _HEADER.pack(_FLOAT16_TAG) + array.astype(np.float16).tobytes()
+    else:
+        max_abs = float(np.max(np.abs(array)))
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        quantized = np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+        payload = _HEADER.pack(_INT8_TAG) + _SCALE.pack(scale) + quantized.tobytes()
+    return Binary(payload, USER_DEFINED_SUBTYPE)
+
+
+def is_packed(value: Any) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview))
+
+
+def decode_embedding(value: Any) -> Optional[np.ndarray]:
+    """Decode a stored embedding into a float32 array, or None if it is missing.
+
+    Packed vectors are read with ``np.frombuffer`` directly over the BSON
+    payload; only the final float32 conversion allocates.
+    """
+    if value is None:
+        return None
+    if is_packed(value):
+        if len(value) <= _HEADER.size:
+            return None
+        (tag,) = _HEADER.unpack_from(value, 0)
+        if tag == _FLOAT16_TAG:
+            return np.frombuffer(value, dtype=np.float16, offset=_HEADER.size).astype(np.float32)
+        if tag == _INT8_TAG:
+            (scale,) = _SCALE.unpack_from(value, _HEADER.size)
+            quantized = np.frombuffer(value, dtype=np.int8, offset=_HEADER.size + _SCALE.size)
+            return quantized.astype(np.float32) * np.float32(scale)
+        raise ValueError(f"Unknown packed embedding tag {tag}")
+    if len(value) == 0:
+        return None
+    return np.asarray(value, dtype=np.float32)
+
+
+def embedding_format(value: Any) -> Optional[str]:
+    """Report which storage format a stored embedding uses"""
+    if value is None or len(value) == 0:
+        return None
+    if not is_packed(value):
+        return "float"
+    (tag,) = _HEADER.unpack_from(value, 0)
+    return {_FLOAT16_TAG: "float16", _INT8_TAG: "int8"}.get(tag)
@@ -0,0 +1,649 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.database import Database, JOBS_COLLECTION, PROJECTS_COLLECTION, CANDIDATES_COLLECTION
+from utils.embedding_queue import EmbeddingQueue, TEXT_BUILDERS
+from utils.lexical_index import BM25Index
+from utils.scoring import normalize_vector
+from utils.shared_vectors import (
+    SharedVectorStore, VECTOR_INDEX_SHARED, VECTOR_SHARED_LAG_SECONDS, VECTOR_SHARED_REFRESH_SECONDS, VECTOR_SHARED_WAIT_SECONDS
+)
+
+# Starting number of rows allocated per collection; the matrix doubles when full
+VECTOR_INDEX_INITIAL_CAPACITY = int(os.getenv("VECTOR_INDEX_INITIAL_CAPACITY", "1024"))
+# Rebuild the matrix once this fraction of rows are tombstones
+VECTOR_INDEX_COMPACT_RATIO = float(os.getenv("VECTOR_INDEX_COMPACT_RATIO", "0.5"))
+# Follow MongoDB change streams so writes made by other workers reach this one
+# (requires a replica set, e.g. Atlas)
+VECTOR_INDEX_CHANGE_STREAMS = os.getenv("VECTOR_INDEX_CHANGE_STREAMS", "false").lower() == "true"
+
+# Which documents of each collection can be recommended; mirrors the queries
+# the recommendation endpoints used to run against MongoDB
+INDEXED_COLLECTIONS: Dict[str, Dict[str, Any]] = {
+    JOBS_COLLECTION: {"is_active": True},
+    PROJECTS_COLLECTION: {"is_active": True, "status": "open"},
+    CANDIDATES_COLLECTION: {"is_active": True, "profile_completed": True},
+}
+
+
+class VectorIndex:
+    """Exact in-memory vector index over one collection.
+
+    Vectors live in one contiguous, pre-normalized float32 matrix with a row
+    per document; ``id_to_row`` maps document ids to rows. Removed documents
+    leave a tombstone (their row is marked dead) until enough accumulate to
+    compact the matrix. Each row also keeps the document itself, minus its
+    embedding, so recommendations can be served without reading MongoDB.
+
+    An inverted index over the documents' ``skill_ids`` (skill id -> set of
+    rows) answers skill overlap questions for every document at once, by
+    adding up the posting lists of the query's skills, and a BM25 index
+    over the same rows serves lexical search.
+    """
+
+    def __init__(self, collection_name: str, query: Dict[str, Any], capacity: int = VECTOR_INDEX_INITIAL_CAPACITY):
+        self.collection_name = collection_name
+        self.query = query
+        self.dimensions: Optional[int] = None
+        self.text_builder = TEXT_BUILDERS.get(collection_name)
+        # Bumped on every vector write or removal, to tell when to publish
+        self.version = 0
+        # Set once the matrix is a shared generation (see attach)
+        self.shared_generation: Optional[int] = None
+        self.shared_size = 0
+        # When this process last wrote each vector since attaching
+        self.local_writes: Dict[str, datetime] = {}
+        self._allocate(max(capacity, 1))
+
+    def _allocate(self, capacity: int):
+        self.matrix = np.zeros((capacity, self.dimensions or 0), dtype=np.float32)
+        self.has_vector = np.zeros(capacity, dtype=bool)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.skill_counts = np.zeros(capacity, dtype=np.int32)
+        self.postings: Dict[int, Set[int]] = {}
+        self.lexical = BM25Index(capacity)
+        self.docs: List[Optional[Dict[str, Any]]] = []
+        self.id_to_row: Dict[str, int] = {}
+        # MongoDB _id -> document id, so change stream deletes can be resolved
+        self.object_ids: Dict[Any, str] = {}
+        self.size = 0
+        self.tombstones = 0
+        # Identifies the row layout; rows keep their place until the next compaction
+        self.layout = uuid.uuid4().hex
+
+    def __len__(self) -> int:
+        return len(self.id_to_row)
+
+    def matches(self, doc: Dict[str, Any]) -> bool:
+        return all(doc.get(field) == value for field, value in self.query.items())
+
+    def _grow(self):
+        capacity = self.matrix.shape[0] * 2
+        matrix = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        self.matrix = matrix
+        self.has_vector = np.concatenate([self.has_vector, np.zeros(capacity - self.has_vector.shape[0], dtype=bool)])
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - self.alive.shape[0], dtype=bool)])
+        self.skill_counts = np.concatenate([self.skill_counts, np.zeros(capacity - self.skill_counts.shape[0], dtype=np.int32)])
+        self.lexical.grow(capacity)
+
+    def _write_vector(self, row: int, vector: Any):
+        self.version += 1
+        if self.shared_generation is not None and self.docs[row] is not None:
+            self.local_writes[self.docs[row]["id"]] = datetime.utcnow()
+        normalized = normalize_vector(vector)
+        if normalized is None:
+            self.has_vector[row] = False
+            return
+        if self.dimensions is None:
+            # The first vector fixes the dimension of the matrix
+            self.dimensions = normalized.shape[0]
+            self.matrix = np.zeros((self.matrix.shape[0], self.dimensions), dtype=np.float32)
+        if normalized.shape[0] != self.dimensions:
+            print(f"Ignoring {normalized.shape[0]}-dimensional vector in {self.dimensions}-dimensional {self.collection_name} index")
+            self.has_vector[row] = False
+            return
+        self.matrix[row] = normalized
+        self.has_vector[row] = True
+
+    def _index_skills(self, row: int, skill_ids: List[int]):
+        for skill_id in skill_ids:
+            self.postings.setdefault(skill_id, set()).add(row)
+        self.skill_counts[row] = len(skill_ids)
+
+    def _index_text(self, row: int, doc: Dict[str, Any]):
+        if self.text_builder is not None:
+            self.lexical.add(row, self.text_builder(doc))
+
+    def _unindex_skills(self, row: int):
+        doc = self.docs[row]
+        for skill_id in (doc or {}).get("skill_ids") or []:
+            rows = self.postings.get(skill_id)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self.postings[skill_id]
+        self.skill_counts[row] = 0
+
+    def upsert(self, doc: Dict[str, Any]):
+        """Add or replace a document; documents that no longer qualify are removed"""
+        doc_id = doc.get("id")
+        if not doc_id:
+            return
+        if not self.matches(doc):
+            self.remove(doc_id)
+            return
+
+        row = self.id_to_row.get(doc_id)
+        if row is None:
+            if self.size == self.matrix.shape[0]:
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.docs.append(None)
+            self.id_to_row[doc_id] = row
+            self.alive[row] = True
+
+        self._unindex_skills(row)
+        self.docs[row] = {key: value for key, value in doc.items() if key not in ("_id", "embedding")}
+        self._index_skills(row, doc.get("skill_ids") or [])
+        self._index_text(row, doc)
+        if VECTOR_INDEX_CHANGE_STREAMS and "_id" in doc:
+            self.object_ids[doc["_id"]] = doc_id
+        self._write_vector(row, doc.get("embedding"))
+
+    def set_vector(self, doc_id: str, vector: Any):
+        """Replace the vector of an indexed document (used when the embedding queue finishes)"""
+        row = self.id_to_row.get(doc_id)
+        if row is not None:
+            self._write_vector(row, vector)
+
+    def remove(self, doc_id: str):
+        row = self.id_to_row.pop(doc_id, None)
+        if row is None:
+            return
+        self.version += 1
+        self.alive[row] = False
+        self.has_vector[row] = False
+        self._unindex_skills(row)
+        self.lexical.remove(row)
+        self.docs[row] = None
+        self.tombstones += 1
+        if self.tombstones > VECTOR_INDEX_COMPACT_RATIO * self.size:
+            self.compact()
+
+    def remove_object_id(self, object_id: Any):
+        doc_id = self.object_ids.pop(object_id, None)
+        if doc_id:
+            self.remove(doc_id)
+
+    def remove_matching(self, field: str, value: Any) -> List[str]:
+        doc_ids = [doc["id"] for doc in self.docs if doc is not None and doc.get(field) == value]
+        for doc_id in doc_ids:
+            self.remove(doc_id)
+        return doc_ids
+
+    def compact(self):
+        """Drop tombstoned rows so the matrix is contiguous again"""
+        rows = np.flatnonzero(self.alive[:self.size])
+        matrix, has_vector, docs = self.matrix[rows], self.has_vector[rows], [self.docs[row] for row in rows]
+        object_ids = {object_id: doc_id for object_id, doc_id in self.object_ids.items() if doc_id in self.id_to_row}
+        self._allocate(max(VECTOR_INDEX_INITIAL_CAPACITY, 2 * len(rows)))
+        if len(rows):
+            self.matrix[:len(rows)] = matrix
+        self.has_vector[:len(rows)] = has_vector
+        self.alive[:len(rows)] = True
+        self.docs = docs
+        self.size = len(rows)
+        for row, doc in enumerate(docs):
+            self.id_to_row[doc["id"]] = row
+            self._index_skills(row, doc.get("skill_ids") or [])
+            self._index_text(row, doc)
+        self.object_ids = object_ids
+
+    def _place(self, row: int, doc: Dict[str, Any]):
+        self.docs[row] = doc
+        self.id_to_row[doc["id"]] = row
+        self.alive[row] = True
+        self._index_skills(row, doc.get("skill_ids") or [])
+        self._index_text(row, doc)
+
+    def _release(self, row: int) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """Empty a row, returning its document and vector"""
+        doc = self.docs[row]
+        vector = self.matrix[row].copy() if self.has_vector[row] else None
+        if doc is not None:
+            self.id_to_row.pop(doc["id"], None)
+            self._unindex_skills(row)
+            self.lexical.remove(row)
+            self.docs[row] = None
+        self.alive[row] = False
+        self.has_vector[row] = False
+        return doc, vector
+
+    def _resize(self, capacity: int):
+        """Fit the per-row arrays to a new matrix capacity"""
+        for name, dtype in (("has_vector", bool), ("alive", bool), ("skill_counts", np.int32)):
+            array = getattr(self, name)[:capacity]
+            setattr(self, name, np.concatenate([array, np.zeros(capacity - len(array), dtype=dtype)]))
+        self.lexical.lengths = self.lexical.lengths[:capacity]
+        self.lexical.grow(capacity)
+
+    def attach(self, manifest: Dict[str, Any], ids: List[Optional[str]], has_vector: np.ndarray, matrix: np.ndarray):
+        """Switch to a published generation of the matrix, shared with other processes.
+
+        ``ids`` names the document of each published row. If the generation
+        has this index's row layout, the rows attached last time keep their
+        place and only later rows are moved; otherwise every document is
+        re-placed. Which documents are live stays this process's own:
+        documents the generation lacks are appended after its rows, and
+        vectors written here after the generation was taken (less the
+        change stream lag) are written back over the shared rows.
+        """
+        as_of = datetime.fromisoformat(manifest["as_of"]) - timedelta(seconds=VECTOR_SHARED_LAG_SECONDS)
+        recent = {doc_id: self.vector(doc_id) for doc_id, written in self.local_writes.items() if written > as_of}
+        keep = min(self.shared_size, len(ids), self.size) if manifest["layout"] == self.layout else 0
+        moved = {}
+        for row in range(keep, self.size):
+            doc, vector = self._release(row)
+            if doc is not None:
+                moved[doc["id"]] = (doc, vector)
+        self.docs = self.docs[:keep]
+        self.size = keep
+        self._resize(matrix.shape[0])
+        self.matrix = matrix
+        self.dimensions = matrix.shape[1]
+        self.has_vector[:keep] = self.alive[:keep] & has_vector[:keep]
+
+        for row in range(keep, len(ids)):
+            doc_id = ids[row]
+            self.docs.append(None)
+            self.size += 1
+            placed = moved.pop(doc_id, None) if doc_id else None
+            if placed is None and doc_id in self.id_to_row:
+                # Re-added elsewhere in the generation's layout
+                placed = self._release(self.id_to_row[doc_id])
+            if placed is not None:
+                self._place(row, placed[0])
+                self.has_vector[row] = bool(has_vector[row])
+
+        for doc, vector in moved.values():
+            if self.size == self.matrix.shape[0]:
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.docs.append(None)
+            self._place(row, doc)
+            if vector is not None:
+                self._write_vector(row, vector)
+        for doc_id, vector in recent.items():
+            row = self.id_to_row.get(doc_id)
+            if row is not None and vector is not None:
+                self._write_vector(row, vector)
+
+        self.tombstones = self.size - len(self.id_to_row)
+        self.local_writes = {doc_id: written for doc_id, written in self.local_writes.items() if written > as_of}
+        self.layout = manifest["layout"]
+        self.shared_size = len(ids)
+        self.shared_generation = manifest["generation"]
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        row = self.id_to_row.get(doc_id)
+        return self.docs[row] if row is not None else None
+
+    def vector(self, doc_id: str) -> Optional[np.ndarray]:
+        """The normalized vector of an indexed document, if it has one"""
+        row = self.id_to_row.get(doc_id)
+        if row is None or not self.has_vector[row]:
+            return None
+        return self.matrix[row].copy()
+
+    def documents(self) -> List[Dict[str, Any]]:
+        return [doc for doc in self.docs if doc is not None]
+
+    def live_rows(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Rows of the live documents, in the order ``search`` returns them"""
+        rows = np.flatnonzero(self.alive[:self.size])
+        return rows if mask is None else rows[mask]
+
+    def overlap_counts(self, skill_ids: Any, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """How many of the given skills each live document has, aligned with ``search``.
+
+        Each posting list holds a row at most once, so the counts are built
+        by incrementing the rows of every posting list of the query.
+        """
+        counts = np.zeros(self.size, dtype=np.int32)
+        for skill_id in skill_ids:
+            rows = self.postings.get(int(skill_id))
+            if rows:
+                counts[np.fromiter(rows, dtype=np.int64, count=len(rows))] += 1
+        return counts[self.live_rows(mask)]
+
+    def document_skill_counts(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Number of skills of each live document, aligned with ``search``"""
+        return self.skill_counts[self.live_rows(mask)]
+
+    def filter_mask(self, filter_query: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Boolean mask over the live documents for filters beyond the index's own query"""
+        extra = {field: value for field, value in (filter_query or {}).items() if self.query.get(field) != value}
+        if not extra:
+            return None
+        return np.array(
+            [all(self.docs[row].get(field) == value for field, value in extra.items()) for row in self.live_rows()],
+            dtype=bool
+        )
+
+    def lexical_search(self, query: str, mask: Optional[np.ndarray] = None) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """BM25 scores of the live documents for a text query, aligned with ``search``.
+
+        Documents that contain none of the query terms score NaN, so they
+        are never selected.
+        """
+        rows = self.live_rows(mask)
+        docs = [self.docs[row] for row in rows]
+        scores = self.lexical.scores(query, self.size)[rows]
+        scores[scores == 0] = np.nan
+        return docs, scores
+
+    def search(self, query_vector: Any, mask: Optional[np.ndarray] = None) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Score every live document against the query in one pass over the matrix.
+
+        Returns the documents and their cosine scores scaled to 0-100, with
+        NaN for documents that have no usable vector (or for all of them if
+        the query has none), matching ``utils.scoring.cosine_scores``. A
+        boolean mask over the live documents (e.g. from a skill pre-filter)
+        restricts scoring to the documents it selects.
+        """
+        rows = self.live_rows(mask)
+        docs = [self.docs[row] for row in rows]
+        query = normalize_vector(query_vector)
+        if query is None or self.dimensions is None or query.shape[0] != self.dimensions:
+            return docs, np.full(len(rows), np.nan, dtype=np.float32)
+
+        if mask is None:
+            scores = (self.matrix[:self.size] @ query)[rows] * 100.0
+        else:
+            # Only the selected rows are multiplied
+            scores = (self.matrix[rows] @ query) * 100.0
+        scores[~self.has_vector[rows]] = np.nan
+        return docs, scores
+
+    def search_batch(self, query_vectors: List[Any]) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Score every live document against several queries with one matrix-matrix product.
+
+        Returns the documents and a (documents x queries) array of scores,
+        each column matching what ``search`` returns for that query.
+        """
+        rows = self.live_rows()
+        docs = [self.docs[row] for row in rows]
+        scores = np.full((len(rows), len(query_vectors)), np.nan, dtype=np.float32)
+        queries = [normalize_vector(vector) for vector in query_vectors]
+        columns = [i for i, query in enumerate(queries) if query is not None and query.shape[0] == self.dimensions]
+        if not columns or self.dimensions is None:
+            return docs, scores
+
+        queries = np.stack([queries[i] for i in columns], axis=1)
+        scores[:, columns] = (self.matrix[:self.size] @ queries)[rows] * 100.0
+        scores[~self.has_vector[rows]] = np.nan
+        return docs, scores
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self),
+            "with_vectors": int(np.count_nonzero(self.has_vector[:self.size])),
+            "tombstones": self.tombstones,
+            "distinct_skills": len(self.postings),
+            "lexical_terms": len(self.lexical.postings),
+            "capacity": self.matrix.shape[0],
+            "dimensions": self.dimensions,
+            "matrix_bytes": int(self.matrix.nbytes),
+            "shared_generation": self.shared_generation,
+        }
+
+
+class VectorIndexes:
+    """Resident vector indexes for the recommendable collections.
+
+    Loaded once at startup, then kept in sync by the write handlers, by the
+    embedding queue as vectors are filled in, and optionally by MongoDB
+    change streams for writes made by other processes.
+    """
+    indexes: Dict[str, VectorIndex] = {}
+    watchers: List[asyncio.Task] = []
+    # Called with (collection_name, doc_id, vector) when a document's indexed
+    # vector changes; the vector is None once the document has none or is removed
+    listeners: List[Callable[[str, str, Optional[np.ndarray]], None]] = []
+    # Called with the collection name after its index was reloaded from MongoDB
+    reload_listeners: List[Callable[[str], None]] = []
+    # With VECTOR_INDEX_SHARED: whether this process publishes the matrices,
+    # the index version it last published, and the publish/attach task
+    publisher = False
+    published: Dict[str, int] = {}
+    sharer: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def start(cls):
+        cls.indexes = {name: VectorIndex(name, query) for name, query in INDEXED_COLLECTIONS.items()}
+        if VECTOR_INDEX_SHARED:
+            await cls._start_shared()
+        else:
+            for name in cls.indexes:
+                await cls.load(name)
+        EmbeddingQueue.add_listener(cls.set_vector)
+        if VECTOR_INDEX_CHANGE_STREAMS:
+            cls.watchers = [asyncio.create_task(cls._watch(name)) for name in cls.indexes]
+
+    @classmethod
+    async def stop(cls):
+        tasks = cls.watchers + ([cls.sharer] if cls.sharer else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        cls.watchers = []
+        cls.sharer = None
+        SharedVectorStore.release_publisher()
+        cls.publisher = False
+
+    @classmethod
+    async def _start_shared(cls):
+        """Start from the shared generations, publishing them if no other worker does"""
+        if not VECTOR_INDEX_CHANGE_STREAMS:
+            print("VECTOR_INDEX_SHARED without VECTOR_INDEX_CHANGE_STREAMS: workers will not see each other's writes")
+        cls.publisher = SharedVectorStore.acquire_publisher()
+        for name in cls.indexes:
+            manifest = SharedVectorStore.manifest(name) if cls.publisher else await cls._wait_for_manifest(name)
+            if manifest is None:
+                await cls.load(name)
+            else:
+                await cls.load_attached(name, manifest)
+            if cls.publisher:
+                await cls.publish(name)
+        cls.sharer = asyncio.create_task(cls._share())
+
+    @classmethod
+    async def _wait_for_manifest(cls, collection_name: str) -> Optional[Dict[str, Any]]:
+        for _ in range(max(VECTOR_SHARED_WAIT_SECONDS, 1)):
+            manifest = SharedVectorStore.manifest(collection_name)
+            if manifest is not None:
+                return manifest
+            await asyncio.sleep(1)
+        print(f"No shared {collection_name} vectors after {VECTOR_SHARED_WAIT_SECONDS}s; loading them in this worker")
+        return None
+
+    @classmethod
+    async def load_attached(cls, collection_name: str, manifest: Dict[str, Any]):
+        """Load the documents without their embeddings and take the vectors from a shared generation.
+
+        Only vectors the generation does not have, or that changed after it
+        was taken, are read from MongoDB.
+        """
+        index = cls.indexes[collection_name]
+        index.__init__(collection_name, index.query)
+        collection = Database.get_collection(collection_name)
+        async for doc in collection.find(index.query, {"embedding": 0}):
+            index.upsert(doc)
+        cls.attach(collection_name, manifest)
+
+        as_of = datetime.fromisoformat(manifest["as_of"]) - timedelta(seconds=VECTOR_SHARED_LAG_SECONDS)
+        with_embedding = {**index.query, "embedding": {"$ne": None}}
+        caught_up = 0
+        async for doc in collection.find({**with_embedding, "embedding_updated_at": {"$gt": as_of}}):
+            index.upsert(doc)
+            caught_up += 1
+        missing = [doc["id"] for doc in index.documents() if index.vector(doc["id"]) is None]
+        for start in range(0, len(missing), 5000):
+            async for doc in collection.find({**with_embedding, "id": {"$in": missing[start:start + 5000]}}):
+                index.upsert(doc)
+                caught_up += 1
+        print(f"Attached {len(index)} {collection_name} to shared generation {manifest['generation']} ({caught_up} vectors read from MongoDB)")
+
+    @classmethod
+    def attach(cls, collection_name: str, manifest: Dict[str, Any]):
+        index = cls.indexes[collection_name]
+        if index.dimensions is not None and manifest["dimensions"] != index.dimensions:
+            print(f"Not attaching {manifest['dimensions']}-dimensional shared {collection_name} vectors to a {index.dimensions}-dimensional index")
+            return
+        ids, has_vector, matrix = SharedVectorStore.attach(manifest)
+        index.attach(manifest, ids, has_vector, matrix)
+
+    @classmethod
+    async def publish(cls, collection_name: str):
+        """Publish the matrix as a new shared generation, then use the published copy here too"""
+        index = cls.indexes[collection_name]
+        if index.dimensions is None:
+            return
+        version = index.version
+        ids = [doc["id"] if doc is not None else None for doc in index.docs[:index.size]]
+        has_vector = index.has_vector[:index.size] & index.alive[:index.size]
+        # Rows written while the copy runs are newer than as_of and written back by attach
+        manifest = await asyncio.to_thread(
+            SharedVectorStore.publish, collection_name, index.layout, ids, has_vector, index.matrix, datetime.utcnow()
+        )
+        cls.published[collection_name] = version
+        cls.attach(collection_name, manifest)
+
+    @classmethod
+    async def _share(cls):
+        while True:
+            await asyncio.sleep(VECTOR_SHARED_REFRESH_SECONDS)
+            if not cls.publisher:
+                # Take over from a publisher that exited
+                cls.publisher = SharedVectorStore.acquire_publisher()
+            for name, index in cls.indexes.items():
+                try:
+                    if cls.publisher:
+                        if index.version != cls.published.get(name):
+                            await cls.publish(name)
+                    else:
+                        manifest = SharedVectorStore.manifest(name)
+                        if manifest is not None and manifest["generation"] != index.shared_generation:
+                            cls.attach(name, manifest)
+                except Exception as e:
+                    print(f"Error sharing the {name} vectors: {e}")
+
+    @classmethod
+    async def load(cls, collection_name: str):
+        index = cls.indexes[collection_name]
+        index.__init__(collection_name, index.query)
+        cursor = Database.get_collection(collection_name).find(index.query)
+        async for doc in cursor:
+            index.upsert(doc)
+        print(f"Loaded {len(index)} {collection_name} into the vector index")
+
+    @classmethod
+    def get(cls, collection_name: str) -> VectorIndex:
+        return cls.indexes[collection_name]
+
+    @classmethod
+    def add_listener(cls, listener: Callable[[str, str, Optional[np.ndarray]], None],
+                     reload_listener: Optional[Callable[[str], None]] = None):
+        if listener not in cls.listeners:
+            cls.listeners.append(listener)
+        if reload_listener is not None and reload_listener not in cls.reload_listeners:
+            cls.reload_listeners.append(reload_listener)
+
+    @classmethod
+    def _emit(cls, collection_name: str, doc_id: str, vector: Optional[np.ndarray]):
+        for listener in cls.listeners:
+            try:
+                listener(collection_name, doc_id, vector)
+            except Exception as e:
+                print(f"Error in vector index listener for {collection_name}/{doc_id}: {e}")
+
+    @classmethod
+    def _notify(cls, collection_name: str, doc_id: Optional[str], before: Optional[np.ndarray]):
+        """Tell the listeners about a document whose vector was ``before`` prior to a write, if it changed"""
+        if not cls.listeners or not doc_id:
+            return
+        after = cls.indexes[collection_name].vector(doc_id)
+        if before is None and after is None:
+            return
+        if before is not None and after is not None and np.array_equal(before, after):
+            return
+        cls._emit(collection_name, doc_id, after)
+
+    @classmethod
+    def upsert(cls, collection_name: str, doc: Optional[Dict[str, Any]]):
+        index = cls.indexes.get(collection_name)
+        if index is not None and doc:
+            before = index.vector(doc.get("id")) if cls.listeners else None
+            index.upsert(doc)
+            cls._notify(collection_name, doc.get("id"), before)
+
+    @classmethod
+    def remove(cls, collection_name: str, doc_id: str):
+        index = cls.indexes.get(collection_name)
+        if index is not None:
+            before = index.vector(doc_id) if cls.listeners else None
+            index.remove(doc_id)
+            cls._notify(collection_name, doc_id, before)
+
+    @classmethod
+    def remove_matching(cls, collection_name: str, field: str, value: Any) -> List[str]:
+        index = cls.indexes.get(collection_name)
+        if index is None:
+            return []
+        doc_ids = index.remove_matching(field, value)
+        for doc_id in doc_ids if cls.listeners else []:
+            cls._emit(collection_name, doc_id, None)
+        return doc_ids
+
+    @classmethod
+    def set_vector(cls, collection_name: str, doc_id: str, vector: List[float]):
+        index = cls.indexes.get(collection_name)
+        if index is not None:
+            before = index.vector(doc_id) if cls.listeners else None
+            index.set_vector(doc_id, vector)
+            cls._notify(collection_name, doc_id, before)
+
+    @classmethod
+    async def _watch(cls, collection_name: str):
+        index = cls.indexes[collection_name]
+        while True:
+            try:
+                async with Database.get_collection(collection_name).watch(full_document="updateLookup") as stream:
+                    async for change in stream:
+                        if change["operationType"] == "delete":
+                            doc_id = index.object_ids.get(change["documentKey"]["_id"])
+                            index.remove_object_id(change["documentKey"]["_id"])
+                            if doc_id and cls.listeners:
+                                cls._emit(collection_name, doc_id, None)
+                        elif change.get("fullDocument"):
+                            cls.upsert(collection_name, change["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Change stream for {collection_name} stopped ({e}); reloading the index")
+                await asyncio.sleep(5)
+                await cls.load(collection_name)
+                for listener in cls.reload_listeners:
+                    listener(collection_name)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {name: index.stats() for name, index in cls.indexes.items()}
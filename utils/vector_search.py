@@ -0,0 +1,174 @@
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.ann_index import AnnIndexes
+from utils.atlas_vector_search import vector_search_pipeline
+from utils.database import Database
+from utils.repository import Repository, LIST_VIEW, SCORING_VIEW
+from utils.scoring import cosine_scores, normalize_vector, select_top_k
+from utils.vector_index import VectorIndexes
+from utils.vector_search_double import VectorSearchDouble
+
+# Where the search endpoints run vector search: "atlas" ($vectorSearch on
+# MongoDB Atlas), "local" (exact nearest-neighbour search in-process) or
+# "faiss" (approximate search over the FAISS indexes, see utils/ann_index.py)
+VECTOR_SEARCH_BACKEND = os.getenv("VECTOR_SEARCH_BACKEND", "atlas").lower()
+# Neighbours fetched per requested result when a filter narrows the
+# resident index, before the filter is applied; doubled until enough pass
+ANN_FILTER_OVERFETCH = int(os.getenv("ANN_FILTER_OVERFETCH", "4"))
+# Answer $vectorSearch pipelines in-process instead of on Atlas, for running offline
+VECTOR_SEARCH_DOUBLE = os.getenv("VECTOR_SEARCH_DOUBLE", "false").lower() == "true"
+# How long a collection's estimated size is reused when sizing numCandidates
+COLLECTION_COUNT_TTL_SECONDS = float(os.getenv("COLLECTION_COUNT_TTL_SECONDS", "60"))
+
+
+def search_score(cosine: float) -> float:
+    """Atlas vectorSearchScore of a cosine similarity, so both backends score alike"""
+    return (1 + cosine) / 2
+
+
+class VectorSearchBackend:
+    """Interface shared by the vector search backends.
+
+    ``search`` returns up to ``top_k`` documents matching ``filter_query``,
+    nearest first, without ``_id`` or embedding and with their similarity
+    as ``score`` on the Atlas ``vectorSearchScore`` scale (0-1).
+    """
+    name = "base"
+
+    async def search(self, collection_name: str, query_vector: List[float], top_k: int,
+                     filter_query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class AtlasVectorSearch(VectorSearchBackend):
+    """Vector search with a $vectorSearch aggregation on MongoDB Atlas"""
+    name = "atlas"
+    # collection name -> (estimated document count, time it was read)
+    counts: Dict[str, Tuple[int, float]] = {}
+
+    @classmethod
+    async def collection_count(cls, collection_name: str) -> int:
+        """Estimated size of a collection, read from the server at most every COLLECTION_COUNT_TTL_SECONDS"""
+        cached = cls.counts.get(collection_name)
+        now = time.monotonic()
+        if cached is None or now - cached[1] >= COLLECTION_COUNT_TTL_SECONDS:
+            cached = (await Database.get_collection(collection_name).estimated_document_count(), now)
+            cls.counts[collection_name] = cached
+        return cached[0]
+
+    async def filter_selectivity(self, collection_name: str, filter_query: Optional[Dict[str, Any]]) -> float:
+        """Estimated fraction of a collection's documents passing a search filter.
+
+        Counted from the resident index, whose documents already match its
+        own query, against the collection's estimated size (cached, so
+        searches do not wait on an extra server round-trip).
+        """
+        index = VectorIndexes.indexes.get(collection_name)
+        if index is None or not len(index):
+            return 1.0
+        total = await self.collection_count(collection_name)
+        mask = index.filter_mask(filter_query)
+        matching = len(index) if mask is None else int(np.count_nonzero(mask))
+        return min(1.0, max(matching, 1) / total) if total else 1.0
+
+    async def search(self, collection_name: str, query_vector: List[float], top_k: int,
+                     filter_query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        collection = Database.get_collection(collection_name)
+        if VECTOR_SEARCH_DOUBLE:
+            collection = VectorSearchDouble(collection)
+        selectivity = await self.filter_selectivity(collection_name, filter_query)
+        pipeline = vector_search_pipeline(collection_name, query_vector, top_k, filter_query, selectivity)
+        return await collection.aggregate(pipeline).to_list(length=top_k)
+
+
+class LocalVectorSearch(VectorSearchBackend):
+    """Exact nearest-neighbour search in-process, for MongoDB without Atlas Search.
+
+    Searches that the resident vector index can answer (its documents are
+    a superset of the filter's, and the filter is plain equality) are one
+    matrix-vector product over the index. Anything else reads the matching
+    documents' ids and embeddings from MongoDB, scores them in one batch
+    and then fetches only the documents returned.
+    """
+    name = "local"
+
+    @staticmethod
+    def covers(index_query: Dict[str, Any], filter_query: Optional[Dict[str, Any]]) -> bool:
+        filter_query = filter_query or {}
+        return (
+            all(field in filter_query and filter_query[field] == value for field, value in index_query.items())
+            and not any(field.startswith("$") or isinstance(value, dict) for field, value in filter_query.items())
+        )
+
+    async def search(self, collection_name: str, query_vector: List[float], top_k: int,
+                     filter_query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        index = VectorIndexes.indexes.get(collection_name)
+        if index is not None and self.covers(index.query, filter_query):
+            docs, scores = index.search(query_vector, index.filter_mask(filter_query))
+        else:
+            # Only ids and vectors are read to score; the winners are fetched afterwards
+            vectors = await Repository.find(collection_name, filter_query or {}, SCORING_VIEW)
+            scores = cosine_scores(query_vector, vectors)
+            rows = select_top_k(scores, top_k)
+            found = await Repository.find_by_ids(collection_name, [vectors[row]["id"] for row in rows], LIST_VIEW)
+            return [
+                dict(found[vectors[row]["id"]], score=search_score(float(scores[row]) / 100.0))
+                for row in rows if vectors[row]["id"] in found
+            ]
+        return [dict(docs[row], score=search_score(float(scores[row]) / 100.0)) for row in select_top_k(scores, top_k)]
+
+
+class FaissVectorSearch(VectorSearchBackend):
+    """Approximate nearest-neighbour search over the FAISS indexes in utils/ann_index.py.
+
+    Needs ``ANN_INDEX_ENABLED=true``. Neighbours are re-scored exactly
+    against the resident index's vectors (IVF-PQ distances are
+    approximate) and returned as its documents; conditions beyond the
+    index's own query are applied to the neighbours, fetching more until
+    ``top_k`` pass. Searches the resident index cannot answer, or made
+    before the FAISS index is up, are served by the local exact search.
+    """
+    name = "faiss"
+
+    async def search(self, collection_name: str, query_vector: List[float], top_k: int,
+                     filter_query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        index = VectorIndexes.indexes.get(collection_name)
+        ann = AnnIndexes.get(collection_name)
+        if index is None or ann is None or not LocalVectorSearch.covers(index.query, filter_query):
+            return await LocalVectorSearch().search(collection_name, query_vector, top_k, filter_query)
+
+        query = normalize_vector(query_vector)
+        if query is None:
+            return []
+        conditions = {field: value for field, value in (filter_query or {}).items() if field not in index.query}
+        fetch = top_k * ANN_FILTER_OVERFETCH if conditions else top_k
+        while True:
+            doc_ids, _ = ann.search(query, fetch)
+            results = []
+            for doc_id in doc_ids:
+                doc, vector = index.get(doc_id), index.vector(doc_id)
+                if doc is not None and vector is not None and all(doc.get(field) == value for field, value in conditions.items()):
+                    results.append(dict(doc, score=search_score(float(vector @ query))))
+            if len(results) >= top_k or fetch >= len(ann):
+                results.sort(key=lambda doc: doc["score"], reverse=True)
+                return results[:top_k]
+            fetch *= 2
+
+
+VECTOR_SEARCH_BACKENDS = {
+    AtlasVectorSearch.name: AtlasVectorSearch,
+    LocalVectorSearch.name: LocalVectorSearch,
+    FaissVectorSearch.name: FaissVectorSearch,
+}
+
+
+def create_backend(name: str) -> VectorSearchBackend:
+    """Instantiate a registered vector search backend by name"""
+    backend_class = VECTOR_SEARCH_BACKENDS.get((name or "").lower())
+    if backend_class is None:
+        raise ValueError(f"Unknown vector search backend '{name}'. Available: {', '.join(VECTOR_SEARCH_BACKENDS)}")
+    return backend_class()
@@ -0,0 +1,194 @@
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pymongo.errors import OperationFailure
+
+from utils.atlas_vector_search import FILTER_OPERATORS, VECTOR_SEARCH_MAX_CANDIDATES
+from utils.create_vector_indexes import vector_index_definition, vector_index_name
+
+
+def _values(doc: Dict[str, Any], path: str) -> List[Any]:
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return [None]
+        value = value.get(part)
+    return value if isinstance(value, list) else [value]
+
+
+def _compare(operator: str, actual: Any, operand: Any) -> bool:
+    try:
+        if operator == "$eq":
+            return actual == operand
+        if operator == "$ne":
+            return actual != operand
+        if operator == "$in":
+            return actual in operand
+        if operator == "$nin":
+            return actual not in operand
+        if actual is None:
+            return False
+        if operator == "$gt":
+            return actual > operand
+        if operator == "$gte":
+            return actual >= operand
+        if operator == "$lt":
+            return actual < operand
+        if operator == "$lte":
+            return actual <= operand
+        if operator == "$exists":
+            return (actual is not None) == bool(operand)
+        if operator == "$regex":
+            return isinstance(actual, str) and re.search(operand, actual) is not None
+    except TypeError:
+        return False
+    raise OperationFailure(f"Operator {operator} is not supported by the vector search double")
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """Evaluate the subset of MQL used by pre-filters and $match stages against a document"""
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(operator.startswith("$") for operator in condition):
+            values = _values(doc, key)
+            for operator, operand in condition.items():
+                # Negations hold only if no element of an array field matches
+                if operator in ("$ne", "$nin"):
+                    if not all(_compare(operator, value, operand) for value in values):
+                        return False
+                elif not any(_compare(operator, value, operand) for value in values):
+                    return False
+        elif not any(value == condition for value in _values(doc, key)):
+            return False
+    return True
+
+
+class VectorSearchDouble:
+    """Offline stand-in for Atlas Vector Search over a motor collection.
+
+    Answers aggregation pipelines that start with ``$vectorSearch`` the way
+    Atlas does, so the search code runs without an Atlas cluster: the stage
+    is checked against the index definition from
+    ``utils/create_vector_indexes.py`` (index name, vector path and size,
+    filter fields, numCandidates bounds), the pre-filter is applied before
+    scoring, only array embeddings are searchable, and ``vectorSearchScore``
+    is the cosine similarity mapped to 0-1. Exact search stands in for the
+    approximate one. The following ``$match``, ``$limit``, ``$addFields``
+    and ``$project`` stages are applied in memory.
+
+    Enabled for the search endpoints with ``VECTOR_SEARCH_DOUBLE=true``.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+        self.definition = vector_index_definition(self.name)
+
+    def _check(self, search: Dict[str, Any]):
+        if search.get("index") != vector_index_name(self.name):
+            raise OperationFailure(f"Index '{search.get('index')}' does not exist on {self.name}")
+        vector_fields = [field for field in self.definition["fields"] if field["type"] == "vector"]
+        vector_field = next((field for field in vector_fields if field["path"] == search.get("path")), None)
+        if vector_field is None:
+            raise OperationFailure(f"Path '{search.get('path')}' needs to be indexed as vector")
+        if len(search["queryVector"]) != vector_field["numDimensions"]:
+            raise OperationFailure(f"queryVector must have {vector_field['numDimensions']} dimensions, got {len(search['queryVector'])}")
+        limit, candidates = search.get("limit"), search.get("numCandidates")
+        if not isinstance(limit, int) or not isinstance(candidates, int) or not 0 < limit <= candidates <= VECTOR_SEARCH_MAX_CANDIDATES:
+            raise OperationFailure(f"numCandidates must be between limit and {VECTOR_SEARCH_MAX_CANDIDATES}, got limit {limit} and numCandidates {candidates}")
+        filter_paths = {field["path"] for field in self.definition["fields"] if field["type"] == "filter"}
+        self._check_filter(search.get("filter") or {}, filter_paths)
+
+    def _check_filter(self, query: Dict[str, Any], filter_paths):
+        for key, condition in query.items():
+            if key in ("$and", "$or"):
+                for clause in condition:
+                    self._check_filter(clause, filter_paths)
+                continue
+            if key not in filter_paths:
+                raise OperationFailure(f"Path '{key}' needs to be indexed as filter")
+            if isinstance(condition, dict) and not set(condition) <= FILTER_OPERATORS:
+                raise OperationFailure(f"Unsupported filter operators on '{key}': {sorted(set(condition) - FILTER_OPERATORS)}")
+
+    @staticmethod
+    def _indexed(value: Any, dimensions: int) -> bool:
+        # Atlas only indexes BSON arrays of numbers of the indexed size;
+        # packed float16/int8 Binary embeddings (utils/vector_codec.py) are
+        # skipped, never decoded
+        return isinstance(value, list) and len(value) == dimensions
+
+    async def _vector_search(self, search: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self._check(search)
+        prefilter = search.get("filter") or {}
+        docs = [
+            doc for doc in await self.collection.find({}).to_list(length=None)
+            if self._indexed(doc.get(search["path"]), len(search["queryVector"])) and matches(doc, prefilter)
+        ]
+        if not docs:
+            return []
+        matrix = np.array([doc[search["path"]] for doc in docs], dtype=np.float32)
+        query = np.asarray(search["queryVector"], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        cosine = np.divide(matrix @ query, norms, out=np.zeros(len(docs), dtype=np.float32), where=norms > 0)
+        order = np.argsort(-cosine, kind="stable")[:search["numCandidates"]][:search["limit"]]
+        return [dict(docs[row], _vector_search_score=float((1 + cosine[row]) / 2)) for row in order]
+
+    def _project(self, doc: Dict[str, Any], projection: Dict[str, Any]) -> Dict[str, Any]:
+        excluded = {field for field, value in projection.items() if value in (0, False)}
+        included = {field: value for field, value in projection.items() if field not in excluded}
+        if included and excluded - {"_id"}:
+            raise OperationFailure("Cannot do exclusion and inclusion in the same $project")
+        if not included:
+            return {key: value for key, value in doc.items() if key not in excluded}
+        projected = {} if "_id" in excluded else {"_id": doc.get("_id")}
+        for field, value in included.items():
+            projected[field] = doc.get(field) if value in (1, True) else self._expression(doc, value)
+        return projected
+
+    def _expression(self, doc: Dict[str, Any], value: Any) -> Any:
+        if value == {"$meta": "vectorSearchScore"}:
+            return doc.get("_vector_search_score")
+        if isinstance(value, str) and value.startswith("$"):
+            return doc.get(value[1:])
+        return value
+
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> "_Cursor":
+        return _Cursor(self, pipeline)
+
+    async def run(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not pipeline or "$vectorSearch" not in pipeline[0]:
+            raise OperationFailure("$vectorSearch must be the first stage of the pipeline")
+        docs = await self._vector_search(pipeline[0]["$vectorSearch"])
+        for stage in pipeline[1:]:
+            (name, argument), = stage.items()
+            if name == "$vectorSearch":
+                raise OperationFailure("$vectorSearch is only valid as the first stage in a pipeline")
+            if name == "$match":
+                docs = [doc for doc in docs if matches(doc, argument)]
+            elif name == "$limit":
+                docs = docs[:argument]
+            elif name in ("$addFields", "$set"):
+                docs = [dict(doc, **{field: self._expression(doc, value) for field, value in argument.items()}) for doc in docs]
+            elif name == "$project":
+                docs = [self._project(doc, argument) for doc in docs]
+            else:
+                raise OperationFailure(f"Stage {name} is not supported by the vector search double")
+        return [{key: value for key, value in doc.items() if key != "_vector_search_score"} for doc in docs]
+
+
+class _Cursor:
+    """The part of a motor aggregation cursor the search code uses"""
+
+    def __init__(self, double: VectorSearchDouble, pipeline: List[Dict[str, Any]]):
+        self.double = double
+        self.pipeline = pipeline
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = await self.double.run(self.pipeline)
+        return docs if length is None else docs[:length]